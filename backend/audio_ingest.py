@@ -0,0 +1,232 @@
+"""
+Ingesta de audio en streaming: bytes comprimidos → ffmpeg → PCM de 16 kHz en memoria.
+
+En lugar de guardar la subida en un archivo temporal y que Whisper vuelva a
+decodificarla desde disco, los bytes se van escribiendo en la entrada de un
+proceso ffmpeg a medida que llegan y su salida (PCM mono int16, la mitad de
+memoria que el float32 de Whisper) se acumula en un `PCMBuffer`. El
+transcriptor puede pedir fragmentos del buffer mientras la subida continúa
+(`stream_segments`) y empezar a transcribir antes de que termine.
+
+Formatos: cualquier contenedor que ffmpeg pueda leer de un pipe (WAV, MP3,
+OGG/Opus, FLAC, WebM...). Los MP4/M4A con el índice (`moov`) al final no se
+pueden decodificar en streaming; ffmpeg falla y el error llega al buffer.
+"""
+
+import hashlib
+import shutil
+import subprocess
+import threading
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from audio_segmentation import SAMPLE_RATE, has_voice, next_cut
+
+
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
+
+# Bytes por muestra del PCM que escribe ffmpeg (s16le)
+SAMPLE_BYTES = 2
+
+
+class IngestError(Exception):
+    """ffmpeg no pudo decodificar el audio recibido."""
+
+
+class PCMBuffer:
+    """
+    PCM mono int16 que crece mientras se decodifica, con espera por muestras.
+
+    Los lectores obtienen copias float32 (`samples`) y pueden esperar a que
+    haya N muestras o a que la decodificación termine (`wait_for`).
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._data = bytearray()
+        self._condition = threading.Condition()
+        self.finished = False
+        self.error: Optional[str] = None
+
+    def write(self, pcm: bytes):
+        with self._condition:
+            self._data.extend(pcm)
+            self._condition.notify_all()
+
+    def close(self, error: Optional[str] = None):
+        with self._condition:
+            self.finished = True
+            self.error = error
+            self._condition.notify_all()
+
+    @property
+    def length(self) -> int:
+        """Muestras completas recibidas."""
+        with self._condition:
+            return len(self._data) // SAMPLE_BYTES
+
+    @property
+    def seconds(self) -> float:
+        return self.length / self.sample_rate
+
+    def wait_for(self, samples: int, timeout: Optional[float] = None) -> bool:
+        """Espera a tener `samples` muestras o a que termine; False si vence el timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.finished or len(self._data) // SAMPLE_BYTES >= samples, timeout
+            )
+
+    def samples(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Copia float32 en [-1, 1] de las muestras [start, end)."""
+        with self._condition:
+            total = len(self._data) // SAMPLE_BYTES
+            end = total if end is None else min(end, total)
+            start = min(start, end)
+            # La vista se libera antes de soltar el lock: un bytearray exportado no puede crecer
+            with memoryview(self._data) as view:
+                pcm = np.frombuffer(view[start * SAMPLE_BYTES:end * SAMPLE_BYTES], dtype=np.int16)
+                return pcm.astype(np.float32) / 32768.0
+
+
+class StreamDecoder:
+    """
+    Proceso ffmpeg alimentado por `feed()` que vuelca PCM en un PCMBuffer.
+
+    También calcula el SHA-256 y el tamaño de los bytes recibidos (para la
+    caché de transcripciones) sin guardarlos; `input_complete` se activa
+    cuando ya no llegarán más bytes (`finish()` o `abort()`).
+    """
+
+    def __init__(self, buffer: Optional[PCMBuffer] = None, read_size: int = 64 * 1024):
+        if not FFMPEG_AVAILABLE:
+            raise IngestError("ffmpeg no está instalado")
+        self.buffer = buffer or PCMBuffer()
+        self.sha256 = hashlib.sha256()
+        self.bytes_received = 0
+        self.input_complete = threading.Event()
+        self.aborted = False
+        self._read_size = read_size
+        self._process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", str(self.buffer.sample_rate), "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._stderr = b""
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        self._errors = threading.Thread(target=self._read_errors, daemon=True)
+        self._errors.start()
+
+    def _read(self):
+        stdout = self._process.stdout
+        while True:
+            pcm = stdout.read1(self._read_size) if hasattr(stdout, "read1") else stdout.read(self._read_size)
+            if not pcm:
+                break
+            self.buffer.write(pcm)
+        returncode = self._process.wait()
+        self._errors.join()
+        error = None
+        if returncode != 0:
+            error = self._stderr.decode("utf-8", "replace").strip() or f"ffmpeg terminó con código {returncode}"
+        self.buffer.close(error)
+
+    def _read_errors(self):
+        self._stderr = self._process.stderr.read()[-4000:]
+
+    def feed(self, data: bytes):
+        """Envía bytes comprimidos a ffmpeg (bloquea si ffmpeg va por detrás)."""
+        if not data:
+            return
+        self.sha256.update(data)
+        self.bytes_received += len(data)
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            # ffmpeg ya terminó (formato no reconocido): el motivo llega al buffer
+            pass
+
+    def finish(self):
+        """Fin de los datos: ffmpeg vacía su salida y el buffer queda cerrado."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.input_complete.set()
+
+    def abort(self):
+        self.aborted = True
+        self._process.kill()
+        self.finish()
+
+    def wait(self, timeout: Optional[float] = None):
+        self._reader.join(timeout)
+        if self.buffer.error:
+            raise IngestError(self.buffer.error)
+
+    @property
+    def audio_hash(self) -> str:
+        return self.sha256.hexdigest()
+
+
+def decode_stream(chunks: Iterable[bytes]) -> StreamDecoder:
+    """
+    Decodifica un iterable de bytes (p.ej. el cuerpo de una request leído por
+    bloques) en un hilo propio; el buffer se llena mientras se sigue leyendo.
+    """
+    decoder = StreamDecoder()
+
+    def pump():
+        try:
+            for chunk in chunks:
+                decoder.feed(chunk)
+        except Exception as e:
+            print(f"❌ Error recibiendo audio: {e}")
+            decoder.abort()
+            return
+        decoder.finish()
+
+    threading.Thread(target=pump, daemon=True).start()
+    return decoder
+
+
+def read_chunks(stream, size: int = 256 * 1024) -> Iterator[bytes]:
+    """Bloques de un objeto file-like hasta EOF."""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def stream_segments(buffer: PCMBuffer, target_seconds: float = 120, max_seconds: float = 240,
+                    poll_seconds: float = 0.5) -> Iterator[Optional[Tuple[int, int]]]:
+    """
+    Fragmentos (inicio, fin) en muestras de un buffer que aún se está llenando,
+    cortados en silencios con el criterio de plan_segments.
+
+    Cada fragmento se entrega en cuanto hay audio suficiente para decidir su
+    corte (`max_seconds` por delante). Mientras espera entrega None cada
+    `poll_seconds` para que el consumidor pueda atender otras cosas. Los
+    fragmentos sin voz se omiten.
+    """
+    rate = buffer.sample_rate
+    window = int(max_seconds * rate) + 1
+    start = 0
+    while True:
+        if not buffer.wait_for(start + window, poll_seconds):
+            yield None
+            continue
+        if buffer.error:
+            raise IngestError(buffer.error)
+        available = buffer.length
+        if buffer.finished and available - start <= max_seconds * rate:
+            if available > start and has_voice(buffer.samples(start, available), rate):
+                yield start, available
+            return
+        audio = buffer.samples(start, start + window)
+        end = start + next_cut(audio, rate, target_seconds, max_seconds)
+        if has_voice(audio[:end - start], rate):
+            yield start, end
+        start = end
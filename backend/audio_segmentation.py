@@ -0,0 +1,151 @@
+"""
+Segmentación de grabaciones largas en silencios (VAD por energía, CPU).
+
+Whisper decodifica una grabación en ventanas de 30 s una detrás de otra; para
+repartir una entrevista de 2 horas entre varios núcleos se corta el audio en
+fragmentos de ~`target_seconds` por los silencios (nunca a mitad de una
+palabra), se transcriben en paralelo y se recolocan los timestamps.
+
+El detector trabaja sobre PCM mono float32 a 16 kHz (lo que devuelve
+`whisper.load_audio`): energía por trama de 30 ms frente a un umbral
+adaptativo sobre el ruido de fondo, con "hangover" para no cortar en pausas
+breves entre palabras.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+SAMPLE_RATE = 16000
+
+
+def frame_energy_db(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30) -> np.ndarray:
+    """Energía RMS en dB de cada trama de `frame_ms`."""
+    frame = int(sample_rate * frame_ms / 1000)
+    frames = len(audio) // frame
+    if frames == 0:
+        return np.zeros(0)
+    windows = audio[:frames * frame].astype(np.float32).reshape(frames, frame)
+    rms = np.sqrt(np.mean(windows ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def voiced_frames(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                  margin_db: float = 12.0, hangover_ms: int = 200) -> np.ndarray:
+    """
+    Máscara de tramas con voz: energía por encima del ruido de fondo
+    (percentil 1) + `margin_db` (o del punto medio entre ruido y voz, si el
+    rango dinámico es menor), extendida `hangover_ms` hacia delante y atrás.
+    """
+    energy = frame_energy_db(audio, sample_rate, frame_ms)
+    if energy.size == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor, speech_level = np.percentile(energy, [1, 95])
+    threshold = min(noise_floor + margin_db, (noise_floor + speech_level) / 2)
+    # Silencio digital (-200 dB) no debe bajar el umbral hasta el ruido de cuantización
+    threshold = min(max(threshold, -50.0), speech_level - 6)
+    voiced = energy > threshold
+
+    hangover = max(0, int(hangover_ms / frame_ms))
+    if hangover and voiced.any():
+        kernel = np.ones(2 * hangover + 1)
+        voiced = np.convolve(voiced.astype(float), kernel, mode="same") > 0
+    return voiced
+
+
+def silence_runs(voiced: np.ndarray, min_frames: int) -> List[Tuple[int, int]]:
+    """Rachas de tramas sin voz de al menos `min_frames` como (inicio, fin) en tramas."""
+    padded = np.concatenate([[True], voiced, [True]]).astype(int)
+    changes = np.diff(padded)
+    starts = np.flatnonzero(changes == -1)
+    ends = np.flatnonzero(changes == 1)
+    return [(int(s), int(e)) for s, e in zip(starts, ends) if e - s >= min_frames]
+
+
+def plan_segments(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, target_seconds: float = 120,
+                  max_seconds: float = 240, min_silence_ms: int = 400,
+                  frame_ms: int = 30, floor_db: float = -50.0) -> List[Tuple[int, int]]:
+    """
+    Fragmentos (inicio, fin) en muestras cortados en silencios.
+
+    Cada corte se hace en el centro del silencio (de al menos
+    `min_silence_ms`) más cercano a `target_seconds`, entre `target_seconds / 2`
+    y `max_seconds` desde el inicio del fragmento; sin silencios en ese tramo
+    se corta en `max_seconds`. Los fragmentos sin voz (o que no superan
+    `floor_db`, como el silencio digital) se descartan, igual que en has_voice.
+    """
+    total = len(audio)
+    frame = int(sample_rate * frame_ms / 1000)
+    energy = frame_energy_db(audio, sample_rate, frame_ms)
+    voiced = voiced_frames(audio, sample_rate, frame_ms)
+    if total == 0 or not voiced.any():
+        return []
+
+    runs = silence_runs(voiced, max(1, int(min_silence_ms / frame_ms)))
+    # Punto de corte (muestra) y longitud de cada silencio
+    cuts = [((s + e) // 2 * frame, e - s) for s, e in runs]
+
+    segments = []
+    start = 0
+    while total - start > max_seconds * sample_rate:
+        end = _choose_cut(cuts, start, sample_rate, target_seconds, max_seconds)
+        segments.append((start, end))
+        start = end
+    segments.append((start, total))
+
+    def has_voice(segment):
+        first, last = segment[0] // frame, -(-segment[1] // frame)
+        loud = energy[first:last]
+        return bool(loud.size and loud.max() > floor_db and voiced[first:last].any())
+
+    return [segment for segment in segments if has_voice(segment)]
+
+
+def _choose_cut(cuts: List[Tuple[int, int]], start: int, sample_rate: int,
+                target_seconds: float, max_seconds: float) -> int:
+    """Silencio (muestra, longitud) más cercano a `target_seconds` desde `start`; si no hay, `max_seconds`."""
+    low = start + int(target_seconds / 2 * sample_rate)
+    high = start + int(max_seconds * sample_rate)
+    candidates = [(-abs(cut - start - target_seconds * sample_rate), length, cut)
+                  for cut, length in cuts if low <= cut <= high]
+    return max(candidates)[2] if candidates else high
+
+
+def next_cut(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, target_seconds: float = 120,
+             max_seconds: float = 240, min_silence_ms: int = 400, frame_ms: int = 30) -> int:
+    """
+    Primer punto de corte (en muestras) de `audio` con el criterio de
+    plan_segments, mirando solo los primeros `max_seconds`: sirve para cortar
+    una grabación que todavía se está recibiendo.
+    """
+    window = audio[:int(max_seconds * sample_rate) + 1]
+    frame = int(sample_rate * frame_ms / 1000)
+    voiced = voiced_frames(window, sample_rate, frame_ms)
+    runs = silence_runs(voiced, max(1, int(min_silence_ms / frame_ms))) if voiced.any() else []
+    cuts = [((s + e) // 2 * frame, e - s) for s, e in runs]
+    return _choose_cut(cuts, 0, sample_rate, target_seconds, max_seconds)
+
+
+def has_voice(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, floor_db: float = -50.0) -> bool:
+    """¿Hay voz en un fragmento suelto? (el umbral adaptativo solo no distingue un fragmento todo silencio)"""
+    energy = frame_energy_db(audio, sample_rate)
+    return bool(energy.size and energy.max() > floor_db and voiced_frames(audio, sample_rate).any())
+
+
+def offset_segments(segments: List[dict], offset_seconds: float, first_id: int = 0) -> List[dict]:
+    """Copia de los segmentos de Whisper con timestamps absolutos (y palabras, si las hay) e ids consecutivos."""
+    shifted = []
+    for i, segment in enumerate(segments):
+        segment = dict(segment)
+        segment["id"] = first_id + i
+        segment["start"] = round(segment["start"] + offset_seconds, 3)
+        segment["end"] = round(segment["end"] + offset_seconds, 3)
+        if segment.get("words"):
+            segment["words"] = [
+                {**word, "start": round(word["start"] + offset_seconds, 3),
+                 "end": round(word["end"] + offset_seconds, 3)}
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
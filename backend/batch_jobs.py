@@ -0,0 +1,155 @@
+"""
+Envío de análisis en modo "batch job" del proveedor.
+
+- Anthropic: Message Batches API (`client.messages.batches`)
+- OpenAI: Batch API (archivo JSONL + `client.batches`, endpoint /v1/chat/completions)
+
+Pensado para ejecuciones offline (noche, estudios grandes): límites de
+throughput más altos y menor coste por token que las llamadas síncronas.
+El estado del job (id, participantes, estado) se persiste en un archivo JSON
+para poder reanudar el polling tras un reinicio sin volver a enviar nada.
+"""
+
+import io
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Callable
+
+
+OPENAI_BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def submit_batch(client, use_claude: bool, requests: List[Dict[str, Any]]) -> str:
+    """
+    Envía todas las requests como un único batch job.
+
+    Args:
+        client: Cliente Anthropic u OpenAI (sync)
+        use_claude: True para Anthropic, False para OpenAI
+        requests: Requests ya en formato del proveedor (ver `service.build_batch_request`)
+
+    Returns:
+        ID del batch job
+    """
+    if use_claude:
+        batch = client.messages.batches.create(requests=requests)
+        return batch.id
+
+    payload = "\n".join(json.dumps(r, ensure_ascii=False) for r in requests).encode("utf-8")
+    input_file = client.files.create(file=("phenomflow_batch.jsonl", io.BytesIO(payload)), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def get_batch_status(client, use_claude: bool, batch_id: str) -> Dict[str, Any]:
+    """
+    Consulta el estado del batch job.
+
+    Returns:
+        {"done": bool, "status": str, "counts": dict}
+    """
+    if use_claude:
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "done": batch.processing_status == "ended",
+            "status": batch.processing_status,
+            "counts": {
+                "processing": counts.processing,
+                "succeeded": counts.succeeded,
+                "errored": counts.errored,
+                "canceled": counts.canceled,
+                "expired": counts.expired
+            }
+        }
+
+    batch = client.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    return {
+        "done": batch.status in OPENAI_BATCH_TERMINAL_STATUSES,
+        "status": batch.status,
+        "counts": {
+            "total": counts.total if counts else 0,
+            "completed": counts.completed if counts else 0,
+            "failed": counts.failed if counts else 0
+        }
+    }
+
+
+def iter_batch_results(client, use_claude: bool, batch_id: str) -> Iterator[Tuple[str, Any, Optional[str]]]:
+    """
+    Recorre los resultados del batch a medida que se descargan.
+
+    Yields:
+        (custom_id, payload, error): payload es el `Message` de Anthropic o el
+        body JSON de la chat completion de OpenAI; error es None si tuvo éxito.
+    """
+    if use_claude:
+        for entry in client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, entry.result.message, None
+            else:
+                error = getattr(entry.result, "error", None)
+                yield entry.custom_id, None, f"{entry.result.type}: {error}"
+        return
+
+    batch = client.batches.retrieve(batch_id)
+
+    for file_id in [batch.output_file_id, batch.error_file_id]:
+        if not file_id:
+            continue
+        content = client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            if entry.get("error") or response.get("status_code") != 200:
+                yield entry["custom_id"], None, str(entry.get("error") or response.get("body"))
+            else:
+                yield entry["custom_id"], response["body"], None
+
+
+def wait_for_batch(client, use_claude: bool, batch_id: str,
+                   poll_interval: float = 30, max_poll_interval: float = 600,
+                   on_status: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Hace polling del batch con backoff exponencial (x1.5) hasta que termine.
+    """
+    interval = poll_interval
+
+    while True:
+        status = get_batch_status(client, use_claude, batch_id)
+        if on_status:
+            on_status(status)
+        if status["done"]:
+            return status
+
+        time.sleep(interval)
+        interval = min(interval * 1.5, max_poll_interval)
+
+
+# =============================================================================
+# PERSISTENCIA DEL ESTADO DEL JOB
+# =============================================================================
+
+def load_job_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_job_state(path: str, state: Dict[str, Any]):
+    """Escritura atómica del estado (no dejar un JSON a medias si el proceso muere)."""
+    state["updated_at"] = datetime.now().isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,298 @@
+"""
+Análisis por fragmentos (chunks) de transcripciones largas.
+
+Las entrevistas micro-fenomenológicas de 90+ minutos no caben en una sola
+respuesta de 16k tokens: el JSON se trunca y falla el parseo. Aquí se divide
+la transcripción en fragmentos por turnos de habla (con solapamiento), y se
+fusionan los análisis parciales en un único resultado de Fase 1.
+"""
+
+import re
+import json
+from typing import Dict, Any, List
+
+from document_parser import identify_interview_structure
+
+
+# Fin de frase: puntuación, comillas o paréntesis de cierre opcionales y espacio
+SENTENCE_END = re.compile(r"[.!?…][\"'»”)\]]*\s+")
+# Etiqueta de hablante al inicio de un turno ("P1: ", "Entrevistador: ")
+SPEAKER_LABEL = re.compile(r"^([^\s:][^\n:]{0,39}):[ \t]+")
+
+
+def split_transcript_into_chunks(text: str, max_chars: int = 40000, overlap_turns: int = 2) -> List[str]:
+    """
+    Divide la transcripción en fragmentos de como máximo `max_chars` caracteres,
+    cortando entre turnos de habla.
+
+    Los turnos se detectan con `document_parser.identify_interview_structure`;
+    si el formato no se reconoce, cada línea no vacía cuenta como un turno.
+    Un turno que por sí solo supera `max_chars` (monólogos, diarización
+    fallida) se parte en párrafos o frases (ver `split_long_turn`).
+    Cada fragmento repite los últimos `overlap_turns` turnos del anterior para
+    no perder el contexto de las preguntas del entrevistador, siempre que
+    quepan junto al turno nuevo.
+
+    Returns:
+        Lista de fragmentos de texto (uno solo si la transcripción ya cabe)
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    raw_lines = text.split("\n")
+    lines = [
+        {"line_number": i + 1, "content": line}
+        for i, line in enumerate(raw_lines) if line.strip()
+    ]
+
+    structure = identify_interview_structure(text, lines)
+    turn_starts = [turn["line_number"] for turn in structure["dialogue_turns"]]
+
+    if turn_starts:
+        # Cada turno abarca desde su línea hasta la línea anterior al siguiente turno
+        # (las líneas previas al primer turno forman un bloque de cabecera)
+        boundaries = sorted(set([1] + turn_starts)) + [len(raw_lines) + 1]
+        turns = [
+            "\n".join(raw_lines[start - 1:end - 1]).strip()
+            for start, end in zip(boundaries, boundaries[1:])
+        ]
+        turns = [t for t in turns if t]
+    else:
+        turns = [line["content"] for line in lines]
+
+    turns = [piece for turn in turns for piece in split_long_turn(turn, max_chars)]
+
+    chunks = []
+    current: List[str] = []
+    current_len = 0
+    new_in_current = 0
+
+    for turn in turns:
+        if current and new_in_current and current_len + len(turn) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = current[-overlap_turns:] if overlap_turns > 0 else []
+            current_len = sum(len(t) + 1 for t in current)
+            new_in_current = 0
+            # El solapamiento se reduce si no deja sitio al turno nuevo
+            while current and current_len + len(turn) + 1 > max_chars:
+                current_len -= len(current.pop(0)) + 1
+
+        current.append(turn)
+        current_len += len(turn) + 1
+        new_in_current += 1
+
+    if new_in_current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+def split_long_turn(turn: str, max_chars: int) -> List[str]:
+    """
+    Parte un turno de más de `max_chars` caracteres en trozos que caben,
+    cortando por orden de preferencia en un salto de párrafo (si deja al
+    menos medio trozo), en un fin de frase, en un espacio o, como último
+    recurso, a `max_chars`. Los trozos siguientes repiten la etiqueta de
+    hablante del turno ("P1: ") para que el análisis sepa quién habla.
+    """
+    if len(turn) <= max_chars:
+        return [turn]
+
+    match = SPEAKER_LABEL.match(turn)
+    label = f"{match.group(1)}: " if match and len(match.group(0)) < max_chars // 4 else ""
+
+    pieces = []
+    rest = turn
+    prefix = ""
+    while len(prefix) + len(rest) > max_chars:
+        limit = max_chars - len(prefix)
+        cut = _cut_point(rest, limit)
+        pieces.append(prefix + rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+        prefix = label
+    if rest:
+        pieces.append(prefix + rest)
+    return pieces
+
+
+def _cut_point(text: str, limit: int) -> int:
+    window = text[:limit + 1]
+    paragraph = window.rfind("\n")
+    if paragraph >= limit // 2:
+        return paragraph + 1
+    sentence_ends = [m.end() for m in SENTENCE_END.finditer(window) if m.end() <= limit]
+    if sentence_ends:
+        return sentence_ends[-1]
+    space = max(window.rfind(" "), window.rfind("\t"), paragraph)
+    if space > 0:
+        return space + 1
+    return limit
+
+
+def merge_chunk_analyses(analyses: List[Dict[str, Any]], participant_id: str) -> Dict[str, Any]:
+    """
+    Fusiona los análisis de Fase 1 de cada fragmento en un único resultado.
+
+    - phase1_codes.codes: concatenados y deduplicados por (code, verbatim)
+    - dimensional_statistics: recalculadas desde los códigos ya deduplicados
+      (sumar las de cada fragmento contaría dos veces lo que cae en el solapamiento)
+    - phenomenon_nucleus: núcleos de cada fragmento, sin repetir
+    - markdown_table: una única cabecera y las filas de todos los fragmentos
+    - resto de claves: listas concatenadas, dicts fusionados, escalares del primer fragmento
+    """
+    valid = [a for a in analyses if "error" not in a]
+    errors = [
+        {"chunk": i + 1, "error": a.get("error")}
+        for i, a in enumerate(analyses) if "error" in a
+    ]
+
+    if not valid:
+        return {
+            "participant_id": participant_id,
+            "error": "All chunks failed",
+            "chunking": {"chunks": len(analyses), "errors": errors}
+        }
+
+    merged: Dict[str, Any] = {}
+    for analysis in valid:
+        for key, value in analysis.items():
+            if key in ("phase1_codes", "dimensional_statistics", "phenomenon_nucleus", "markdown_table"):
+                continue
+            merged[key] = _deep_merge(merged[key], value) if key in merged else value
+
+    # Códigos deduplicados por (code, verbatim)
+    codes = []
+    seen = set()
+    for analysis in valid:
+        for code in (analysis.get("phase1_codes") or {}).get("codes", []):
+            key = (code.get("code"), code.get("verbatim")) if isinstance(code, dict) else (code, None)
+            if key not in seen:
+                seen.add(key)
+                codes.append(code)
+    if any("phase1_codes" in a for a in valid):
+        merged["phase1_codes"] = {**valid[0].get("phase1_codes", {}), "codes": codes}
+
+    # Estadísticas dimensionales
+    chunk_stats = [a.get("dimensional_statistics") or {} for a in valid]
+    if any(chunk_stats):
+        merged["dimensional_statistics"] = _merge_stats(chunk_stats, codes)
+
+    # Núcleo fenomenológico
+    nuclei = []
+    for analysis in valid:
+        nucleus = analysis.get("phenomenon_nucleus")
+        if nucleus and nucleus not in nuclei:
+            nuclei.append(nucleus)
+    if nuclei:
+        merged["phenomenon_nucleus"] = "\n\n".join(nuclei)
+
+    # Tabla markdown: cabecera del primer fragmento + filas de todos
+    tables = [a["markdown_table"] for a in valid if isinstance(a.get("markdown_table"), str)]
+    if tables:
+        merged["markdown_table"] = _merge_markdown_tables(tables)
+
+    merged["participant_id"] = participant_id
+    merged["chunking"] = {"chunks": len(analyses), "errors": errors}
+    return merged
+
+
+def _deep_merge(target: Any, source: Any) -> Any:
+    if isinstance(target, dict) and isinstance(source, dict):
+        result = dict(target)
+        for key, value in source.items():
+            result[key] = _deep_merge(result[key], value) if key in result else value
+        return result
+
+    if isinstance(target, list) and isinstance(source, list):
+        seen = {json.dumps(item, sort_keys=True, ensure_ascii=False) for item in target}
+        result = list(target)
+        for item in source:
+            marker = json.dumps(item, sort_keys=True, ensure_ascii=False)
+            if marker not in seen:
+                seen.add(marker)
+                result.append(item)
+        return result
+
+    return target if target not in (None, "", [], {}) else source
+
+
+def _merge_stats(chunk_stats: List[Dict[str, Any]], codes: List[Any]) -> Dict[str, Any]:
+    """
+    Estadísticas por dimensión del análisis fusionado.
+
+    Los recuentos (`total_codes`, `unique_codes`, `percentage`) se recalculan
+    desde los códigos deduplicados; de las estadísticas de cada fragmento solo
+    se conservan los campos descriptivos (no numéricos), que no se pueden
+    recalcular. Si los códigos no indican su dimensión, cada valor numérico
+    es el máximo entre fragmentos (cota inferior, sin contar el solapamiento dos veces).
+    """
+    coded = [c for c in codes if isinstance(c, dict) and c.get("dimension")]
+    if not coded:
+        result: Dict[str, Any] = {}
+        for stats in chunk_stats:
+            result = _max_stats(result, stats)
+        return result
+
+    result = {}
+    for stats in chunk_stats:
+        result = _deep_merge(result, _descriptive(stats))
+
+    counts: Dict[str, int] = {}
+    labels: Dict[str, set] = {}
+    for code in coded:
+        dimension = str(code["dimension"])
+        counts[dimension] = counts.get(dimension, 0) + 1
+        labels.setdefault(dimension, set()).add(str(code.get("code")))
+
+    for dimension in sorted(set(result) | set(counts)):
+        entry = result.get(dimension)
+        entry = dict(entry) if isinstance(entry, dict) else {}
+        entry["total_codes"] = counts.get(dimension, 0)
+        entry["unique_codes"] = len(labels.get(dimension, ()))
+        entry["percentage"] = round(100 * entry["total_codes"] / len(coded), 1)
+        result[dimension] = entry
+    return result
+
+
+def _descriptive(stats: Any) -> Any:
+    """Copia sin valores numéricos."""
+    if isinstance(stats, dict):
+        return {k: _descriptive(v) for k, v in stats.items()
+                if not (isinstance(v, (int, float)) and not isinstance(v, bool))}
+    return stats
+
+
+def _max_stats(target: Dict[str, Any], source: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(target)
+    for key, value in source.items():
+        if key not in result:
+            result[key] = value
+        elif isinstance(value, dict) and isinstance(result[key], dict):
+            result[key] = _max_stats(result[key], value)
+        elif isinstance(value, (int, float)) and isinstance(result[key], (int, float)) \
+                and not isinstance(value, bool):
+            result[key] = max(result[key], value)
+    return result
+
+
+def _merge_markdown_tables(tables: List[str]) -> str:
+    header: List[str] = []
+    rows: List[str] = []
+    seen = set()
+
+    for table in tables:
+        lines = [l for l in table.split("\n") if l.strip()]
+        # Cabecera = primera fila + separador (|---|---|)
+        if len(lines) >= 2 and set(lines[1].replace("|", "").strip()) <= set("-: "):
+            table_header, body = lines[:2], lines[2:]
+        else:
+            table_header, body = [], lines
+
+        if not header:
+            header = table_header
+        for row in body:
+            if row not in seen:
+                seen.add(row)
+                rows.append(row)
+
+    return "\n".join(header + rows)
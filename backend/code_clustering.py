@@ -0,0 +1,203 @@
+"""
+Clustering local de códigos de Fase 1 para pre-construir el codebook cross-case.
+
+Antes de la síntesis, todos los códigos de `phase1_codes` (etiqueta,
+dimensión, descripción y verbatim) se vectorizan con TF-IDF de n-gramas de
+caracteres (matrices dispersas de SciPy) y se agrupan por dimensión con
+clustering jerárquico de enlace medio sobre la distancia coseno. Así
+`2.6.1 Cabeza` y `cabeza-flotante-ligera` quedan juntos aunque los
+participantes los hayan nombrado distinto.
+
+El resultado es un codebook candidato compacto (etiqueta representativa,
+variantes, frecuencia, participantes y un ejemplo por cluster) que el LLM
+refina en lugar de fusionar listas crudas.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+
+
+# Peso de cada campo en el vector de un código
+FIELD_WEIGHTS = {"code": 2.0, "description": 1.0, "verbatim": 0.5}
+NO_DIMENSION = "Sin dimensión"
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    # Numeraciones del protocolo ("2.6.1") y separadores no aportan similitud
+    text = re.sub(r"\d+(\.\d+)*", " ", text)
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (3, 5)) -> List[str]:
+    """N-gramas de caracteres por palabra (con bordes), como `char_wb` de scikit-learn."""
+    grams = []
+    low, high = ngram_range
+    for word in _normalize(text).split():
+        padded = f" {word} "
+        for n in range(low, high + 1):
+            if len(padded) < n:
+                break
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def collect_codes(analyses: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aplicaciones de código de todos los análisis, con su participante."""
+    items = []
+    for i, analysis in enumerate(analyses):
+        if "error" in analysis:
+            continue
+        pid = str(analysis.get("participant_id", f"#{i + 1}"))
+        codes = (analysis.get("phase1_codes") or {}).get("codes")
+        if codes is None:
+            codes = analysis.get("codes", [])
+        for code in codes:
+            if isinstance(code, dict) and code.get("code"):
+                items.append({
+                    "participant_id": pid,
+                    "code": str(code["code"]).strip(),
+                    "dimension": str(code.get("dimension") or NO_DIMENSION).strip(),
+                    "description": str(code.get("description") or ""),
+                    "verbatim": str(code.get("verbatim") or "")
+                })
+    return items
+
+
+def tfidf_matrix(items: Sequence[Dict[str, Any]], ngram_range: Tuple[int, int] = (3, 5),
+                 weights: Dict[str, float] = FIELD_WEIGHTS) -> sparse.csr_matrix:
+    """
+    Matriz (códigos × n-gramas) TF-IDF normalizada L2.
+
+    TF sublineal (1 + log tf) e IDF suavizado, por campo; los campos se
+    combinan con `weights` compartiendo vocabulario.
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, cols, values = [], [], []
+    for row, item in enumerate(items):
+        for field, weight in weights.items():
+            counts = Counter(char_ngrams(item.get(field, ""), ngram_range))
+            for gram, count in counts.items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+                values.append(weight * (1.0 + np.log(count)))
+
+    shape = (len(items), len(vocabulary))
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=shape, dtype=np.float64)
+    matrix.sum_duplicates()
+    if matrix.nnz == 0:
+        return matrix
+
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def cluster_rows(matrix: sparse.csr_matrix, threshold: float = 0.35) -> np.ndarray:
+    """
+    Etiquetas de cluster (0..k-1) por enlace medio sobre la distancia coseno:
+    dos grupos se fusionan mientras su similitud media sea >= `threshold`.
+    """
+    n = matrix.shape[0]
+    if n <= 1:
+        return np.zeros(n, dtype=int)
+    similarity = (matrix @ matrix.T).toarray()
+    distance = np.clip(1 - similarity, 0, 2)
+    np.fill_diagonal(distance, 0)
+    tree = linkage(squareform(distance, checks=False), method="average")
+    return fcluster(tree, t=1 - threshold, criterion="distance") - 1
+
+
+def _dimension_key(dimension: str) -> str:
+    return _normalize(dimension) or _normalize(NO_DIMENSION)
+
+
+def build_candidate_codebook(analyses: Sequence[Dict[str, Any]], threshold: float = 0.35,
+                             ngram_range: Tuple[int, int] = (3, 5), max_variants: int = 5) -> Dict[str, Any]:
+    """
+    Codebook candidato: por dimensión, clusters de códigos similares con
+    etiqueta representativa (el código más central), variantes, frecuencia,
+    participantes y un verbatim de ejemplo.
+    """
+    items = collect_codes(analyses)
+    matrix = tfidf_matrix(items, ngram_range)
+
+    by_dimension: Dict[str, List[int]] = {}
+    names: Dict[str, Counter] = {}
+    for i, item in enumerate(items):
+        key = _dimension_key(item["dimension"])
+        by_dimension.setdefault(key, []).append(i)
+        names.setdefault(key, Counter())[item["dimension"]] += 1
+
+    dimensions: Dict[str, List[Dict[str, Any]]] = {}
+    next_id = 1
+    for key, indices in by_dimension.items():
+        sub = matrix[indices]
+        labels = cluster_rows(sub, threshold)
+        clusters = []
+        for label in np.unique(labels):
+            members = [indices[i] for i in np.flatnonzero(labels == label)]
+            local = np.flatnonzero(labels == label)
+            block = (sub[local] @ sub[local].T).toarray()
+            centrality = block.mean(axis=1)
+            representative = items[members[int(np.argmax(centrality))]]
+            variants = Counter(items[m]["code"] for m in members)
+            participants = []
+            for m in members:
+                if items[m]["participant_id"] not in participants:
+                    participants.append(items[m]["participant_id"])
+            clusters.append({
+                "label": representative["code"],
+                "variants": [code for code, _ in variants.most_common(max_variants)],
+                "frequency": len(members),
+                "participants": participants,
+                "example": representative["verbatim"][:200],
+                "cohesion": round(float(block.mean()), 3)
+            })
+        clusters.sort(key=lambda c: (-len(c["participants"]), -c["frequency"], c["label"]))
+        for cluster in clusters:
+            cluster["cluster_id"] = f"K{next_id}"
+            next_id += 1
+        dimensions[names[key].most_common(1)[0][0]] = clusters
+
+    distinct = len({(_dimension_key(i["dimension"]), i["code"].lower()) for i in items})
+    return {
+        "dimensions": dimensions,
+        "stats": {
+            "applications": len(items),
+            "distinct_codes": distinct,
+            "clusters": next_id - 1,
+            "participants": len({i["participant_id"] for i in items}),
+            "threshold": threshold
+        }
+    }
+
+
+def compact_candidate_codebook(candidate: Dict[str, Any], max_variants: int = 3,
+                               example_chars: int = 120) -> Dict[str, Any]:
+    """Versión para el prompt de síntesis: sin cohesión y con variantes y ejemplo recortados."""
+    return {
+        dimension: [
+            {
+                "id": cluster["cluster_id"],
+                "label": cluster["label"],
+                "variants": cluster["variants"][:max_variants],
+                "n": cluster["frequency"],
+                "participants": cluster["participants"],
+                "example": cluster["example"][:example_chars]
+            }
+            for cluster in clusters
+        ]
+        for dimension, clusters in candidate["dimensions"].items()
+    }
@@ -0,0 +1,163 @@
+"""
+Caché persistente en disco (SQLite) direccionada por contenido.
+
+Se usa delante de `call_llm` para no pagar dos veces por el mismo prompt:
+la clave es un hash SHA-256 de todos los parámetros que determinan la
+respuesta (proveedor, modelo, system message, prompt, temperatura, ...).
+
+Características:
+- Evicción LRU cuando el tamaño total supera `max_bytes`
+- TTL por entrada (las entradas expiradas cuentan como miss y se borran)
+- Contadores de hits/misses para el proceso actual
+- Seguro entre threads y procesos (una conexión SQLite por operación, modo WAL)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+
+def make_cache_key(**parts: Any) -> str:
+    """
+    Genera una clave estable a partir de los parámetros de la llamada.
+
+    Los parámetros se serializan como JSON con claves ordenadas, de modo que
+    el orden de los kwargs no afecta a la clave.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Caché clave → bytes respaldada por un archivo SQLite.
+
+    Args:
+        path: Ruta del archivo SQLite (se crea el directorio si no existe)
+        max_bytes: Tamaño máximo total de los valores almacenados
+        default_ttl: TTL en segundos por defecto (None = sin expiración)
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024,
+                 default_ttl: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Devuelve el valor almacenado o None si no existe o expiró."""
+        now = time.time()
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._count(hit=False)
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(hit=False)
+                return None
+
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+        self._count(hit=True)
+        return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Guarda un valor y aplica la evicción LRU si se supera `max_bytes`."""
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+
+        size = len(value)
+        if size > self.max_bytes:
+            return  # Nunca cabría: no desalojar toda la caché por una entrada
+
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl else None
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, now, now, expires_at)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Desalojar las entradas menos usadas recientemente hasta volver bajo el límite
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché (contadores del proceso + tamaño en disco)."""
+        with self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes
+        }
@@ -3,6 +3,15 @@ from pypdf import PdfReader
 from docx import Document
 import re
 
+try:
+    from telemetry import span
+except ImportError:
+    from contextlib import contextmanager
+
+    @contextmanager
+    def span(name, **attributes):
+        yield {"attributes": dict(attributes)}
+
 def parse_pdf(file_path: str) -> Dict[str, Any]:
     """Extract text from PDF with line numbers"""
     reader = PdfReader(file_path)
@@ -118,15 +127,17 @@ def process_document(file_path: str, file_type: str) -> Dict[str, Any]:
     Main function to process uploaded document
     """
     # Parse document
-    if file_type == "pdf":
-        parsed = parse_pdf(file_path)
-    elif file_type in ["docx", "doc"]:
-        parsed = parse_docx(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {file_type}")
+    with span("document.parse", file_type=file_type):
+        if file_type == "pdf":
+            parsed = parse_pdf(file_path)
+        elif file_type in ["docx", "doc"]:
+            parsed = parse_docx(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
     
     # Identify structure
-    structure = identify_interview_structure(parsed["text"], parsed["lines"])
+    with span("document.structure", lines=parsed["total_lines"]):
+        structure = identify_interview_structure(parsed["text"], parsed["lines"])
     
     return {
         "raw_text": parsed["text"],
@@ -0,0 +1,106 @@
+"""
+Utilidades para la síntesis cross-case jerárquica (map-reduce).
+
+Con decenas o cientos de entrevistas no cabe todo en un único prompt de
+síntesis. El esquema es:
+
+    map:    participantes → shards acotados por tokens → síntesis parcial por shard
+    reduce: síntesis parciales → grupos acotados por tokens → síntesis fusionada
+            (uno o más niveles hasta quedar una sola)
+
+Aquí viven las piezas deterministas (reparto en shards, compactación para
+el reduce, procedencia); las llamadas al LLM están en `service.py`.
+"""
+
+from typing import Any, Callable, Dict, List, Sequence
+
+
+def pack_by_budget(sizes: Sequence[int], budget: int) -> List[List[int]]:
+    """
+    Reparte elementos (por índice, en orden) en grupos cuya suma de tamaños
+    no supera `budget`. Un elemento más grande que el presupuesto va solo.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, size in enumerate(sizes):
+        if current and used + size > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_groups(items: Sequence[Any], size_of: Callable[[Any], int], budget: int,
+                  max_fan_in: int = 8) -> List[List[int]]:
+    """
+    Agrupa las síntesis de un nivel para el siguiente reduce. Garantiza
+    progreso: cada grupo tiene al menos 2 elementos (salvo un último sobrante)
+    y como mucho `max_fan_in`.
+    """
+    groups = []
+    for group in pack_by_budget([size_of(item) for item in items], budget):
+        for start in range(0, len(group), max_fan_in):
+            groups.append(group[start:start + max_fan_in])
+
+    if len(groups) >= len(items):
+        # Ningún par cabe en el presupuesto: fusionar de dos en dos igualmente
+        groups = [list(range(i, min(i + 2, len(items)))) for i in range(0, len(items), 2)]
+    return groups
+
+
+def trim_evidence(node: Any, max_evidence: int = 2) -> Any:
+    """Copia de una síntesis con como mucho `max_evidence` citas por código (para el reduce)."""
+    if isinstance(node, dict):
+        result = {}
+        for key, value in node.items():
+            if key in ("evidence", "quotes", "verbatims") and isinstance(value, list):
+                result[key] = value[:max_evidence]
+            else:
+                result[key] = trim_evidence(value, max_evidence)
+        return result
+    if isinstance(node, list):
+        return [trim_evidence(item, max_evidence) for item in node]
+    return node
+
+
+def referenced_participants(node: Any) -> List[str]:
+    """Participantes citados en cualquier lista "participants" de una síntesis."""
+    found: List[str] = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if key == "participants" and isinstance(child, list):
+                    for pid in child:
+                        if isinstance(pid, str) and pid not in found:
+                            found.append(pid)
+                else:
+                    walk(child)
+        elif isinstance(value, list):
+            for child in value:
+                walk(child)
+
+    walk(node)
+    return found
+
+
+def build_provenance(shards: List[List[str]], levels: int, final: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Procedencia de una síntesis jerárquica: qué participantes fueron a cada
+    shard, cuántos niveles de reduce hubo y qué participantes no aparecen
+    referenciados en el resultado final.
+    """
+    all_participants = [pid for shard in shards for pid in shard]
+    # La lista "participants" de primer nivel es la del estudio, no una referencia
+    referenced = set(referenced_participants({k: v for k, v in final.items() if k != "participants"}))
+    return {
+        "mode": "hierarchical",
+        "shards": [{"shard": i + 1, "participants": shard} for i, shard in enumerate(shards)],
+        "participant_shard": {pid: i + 1 for i, shard in enumerate(shards) for pid in shard},
+        "reduce_levels": levels,
+        "unreferenced_participants": [pid for pid in all_participants if pid not in referenced]
+    }
@@ -0,0 +1,328 @@
+"""
+Cola de jobs persistente (SQLite) para los endpoints de larga duración.
+
+Un POST encola el trabajo y devuelve un id al instante; un pool de threads
+lo ejecuta fuera del request HTTP y `GET /jobs/<id>` devuelve estado,
+progreso y resultado. Estados:
+
+    queued → running → succeeded | failed | cancelled
+
+- Cancelación: un job en cola se cancela al instante; uno en ejecución se
+  marca y el handler se detiene en su siguiente punto de control
+  (`job.progress()` / `job.check_cancelled()`); su resultado se descarta.
+- Recuperación: cada worker renueva un heartbeat de sus jobs en curso. Un
+  job "running" cuyo heartbeat caducó (proceso muerto, reinicio del
+  servidor) vuelve a la cola hasta `max_attempts` intentos.
+
+El archivo SQLite puede compartirse entre procesos (Flask, FastAPI, scripts):
+cada cola solo reclama los tipos de job que tiene registrados.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+JOB_TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+class JobCancelled(Exception):
+    """Lanzada en un punto de control cuando se pidió cancelar el job."""
+
+
+class JobContext:
+    """Lo que recibe un handler para informar progreso y comprobar cancelación."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Actualiza el progreso (0-1) y actúa como punto de control de cancelación."""
+        self.queue._update(self.job_id, progress=max(0.0, min(1.0, fraction)), message=message)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.queue._cancel_requested(self.job_id):
+            raise JobCancelled(self.job_id)
+
+
+class JobQueue:
+    """
+    Args:
+        path: Archivo SQLite de la cola
+        workers: Threads que ejecutan jobs en este proceso
+        lease_seconds: Un job "running" sin heartbeat durante este tiempo se considera huérfano
+        max_attempts: Intentos máximos (un job huérfano vuelve a la cola si no los agotó)
+        poll_interval: Espera entre consultas cuando la cola está vacía (segundos)
+    """
+
+    def __init__(self, path: str, workers: int = 2, lease_seconds: float = 60,
+                 max_attempts: int = 3, poll_interval: float = 1.0):
+        self.path = path
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Callable[[Dict[str, Any], JobContext], Any]] = {}
+        self._running: set = set()
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any], JobContext], Any]):
+        """Registra el handler de un tipo de job: handler(payload, job) -> resultado JSON-serializable."""
+        self.handlers[kind] = handler
+
+    # ------------------------------------------------------------------ API
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Encola un job y devuelve su id."""
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de job desconocido: {kind}")
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado, progreso y (si terminó) resultado o error de un job."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, result, error, progress, message, attempts, "
+                "cancel_requested, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        (job_id, kind, status, result, error, progress, message, attempts,
+         cancel_requested, created_at, started_at, finished_at) = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "progress": progress,
+            "message": message,
+            "attempts": attempts,
+            "cancel_requested": bool(cancel_requested),
+            "created_at": _iso(created_at),
+            "started_at": _iso(started_at),
+            "finished_at": _iso(finished_at),
+            "result": json.loads(result) if result is not None else None,
+            "error": error
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancela un job: inmediato si está en cola, cooperativo si está en
+        ejecución. Devuelve el estado resultante (None si no existe).
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, cancel_requested = 1 "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, "running_here": len(self._running), "counts": counts}
+
+    # -------------------------------------------------------------- workers
+
+    def start(self):
+        """Recupera jobs huérfanos y arranca los workers y el heartbeat (idempotente)."""
+        if self._threads:
+            return
+        self.recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def recover(self) -> int:
+        """
+        Devuelve a la cola los jobs "running" cuyo heartbeat caducó; los que
+        agotaron `max_attempts` pasan a "failed". Devuelve cuántos se recuperaron.
+        """
+        now = time.time()
+        expired = now - self.lease_seconds
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND cancel_requested = 1",
+                (now, expired)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, "
+                "error = 'Interrumpido (reinicio del servidor) y sin intentos restantes' "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (now, expired, self.max_attempts)
+            )
+            recovered = conn.execute(
+                "UPDATE jobs SET status = 'queued', message = 'Recuperado tras interrupción' "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (expired,)
+            ).rowcount
+            conn.execute("COMMIT")
+        if recovered:
+            print(f"♻️ {recovered} jobs interrumpidos devueltos a la cola")
+            self._wakeup.set()
+        return recovered
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        kinds = list(self.handlers)
+        if not kinds:
+            return None
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT id, kind, payload FROM jobs WHERE status = 'queued' "
+                f"AND kind IN ({','.join('?' * len(kinds))}) ORDER BY created_at LIMIT 1",
+                kinds
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                "heartbeat_at = ?, progress = 0 WHERE id = ?",
+                (now, now, row[0])
+            )
+            conn.execute("COMMIT")
+            return {"id": row[0], "kind": row[1], "payload": json.loads(row[2])}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _worker_loop(self):
+        last_recover = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_recover > self.lease_seconds:
+                self.recover()
+                last_recover = time.monotonic()
+
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        with self._running_lock:
+            self._running.add(job_id)
+        context = JobContext(self, job_id)
+        print(f"⚙️ Job {job_id[:8]} ({job['kind']}) iniciado")
+        try:
+            result = self.handlers[job["kind"]](job["payload"], context)
+            context.check_cancelled()
+            self._finish(job_id, "succeeded", result=result)
+            print(f"✅ Job {job_id[:8]} completado")
+        except JobCancelled:
+            self._finish(job_id, "cancelled")
+            print(f"🛑 Job {job_id[:8]} cancelado")
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job_id, "failed", error=str(e))
+            print(f"❌ Job {job_id[:8]} falló: {e}")
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time(), status, job_id)
+            )
+
+    def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running)
+            if running:
+                with self._connect() as conn:
+                    conn.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+                                     [(time.time(), job_id) for job_id in running])
+
+    def _update(self, job_id: str, **fields):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments}, heartbeat_at = ? WHERE id = ?",
+                         (*fields.values(), time.time(), job_id))
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
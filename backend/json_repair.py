@@ -0,0 +1,110 @@
+"""
+Recuperación tolerante de JSON truncado.
+
+Cuando una respuesta del LLM se corta (por `max_tokens` o por un error de
+red), el JSON queda abierto a mitad de un valor. En lugar de descartar toda
+la generación, aquí se busca el último punto en el que el documento estaba
+"completo" (justo después de un elemento terminado), se descarta lo que
+viene detrás y se cierran los arrays/objetos abiertos.
+
+    {"codes": [{"code": "a"}, {"code": "b", "verb
+      → {"codes": [{"code": "a"}]}
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _cut_points(text: str) -> List[Tuple[int, str]]:
+    """
+    Posiciones donde el documento puede cortarse quedando válido tras cerrar
+    los contenedores abiertos, con la pila de contenedores en ese punto.
+    """
+    points = []
+    stack = ""
+    in_string = False
+    escape = False
+    string_is_key = False
+    expecting_key = []  # por cada nivel: ¿el próximo string es una clave?
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if not string_is_key:
+                    points.append((i + 1, stack))
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == "{" and expecting_key[-1]
+            if string_is_key:
+                expecting_key[-1] = False
+        elif ch in "{[":
+            stack += ch
+            expecting_key.append(ch == "{")
+            points.append((i + 1, stack))
+        elif ch in "}]":
+            if not stack:
+                break
+            stack = stack[:-1]
+            expecting_key.pop()
+            points.append((i + 1, stack))
+            if not stack:
+                break  # Documento completo
+        elif ch == ",":
+            # Lo anterior a la coma es un valor completo (incluye números y literales)
+            points.append((i, stack))
+            if stack and stack[-1] == "{":
+                expecting_key[-1] = True
+
+    return points
+
+
+def _inside_array_element(stack: str) -> bool:
+    """¿Hay un objeto abierto dentro de un array abierto?"""
+    first_array = stack.find("[")
+    return first_array >= 0 and "{" in stack[first_array:]
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Intenta recuperar el mayor prefijo válido de un JSON truncado.
+
+    Todo lo anterior al primer `{` o `[` (preamble, bloque ```json) se ignora.
+    Los objetos a medias dentro de arrays se descartan enteros; los objetos
+    sueltos conservan las claves completas.
+
+    Returns:
+        El valor recuperado o None si no hay nada aprovechable
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    text = text[min(starts):]
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    for pos, stack in reversed(_cut_points(text)):
+        if _inside_array_element(stack):
+            continue  # Un elemento de array a medias (p.ej. un código sin verbatim) se descarta
+        candidate = text[:pos].rstrip()
+        if candidate.endswith(":"):
+            continue
+        candidate += "".join(_CLOSERS[c] for c in reversed(stack))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+
+    return None
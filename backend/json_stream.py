@@ -0,0 +1,150 @@
+"""
+Parser JSON incremental para respuestas LLM en streaming.
+
+El LLM genera el JSON de la Fase 1 token a token; este parser recibe los
+fragmentos a medida que llegan y emite cada valor de interés en cuanto está
+completo, sin esperar al final del documento. Por ejemplo, con los targets
+
+    ("phase1_codes", "codes", "*")   → cada código de la lista
+    ("phenomenon_nucleus",)          → el núcleo fenomenológico
+    ("dimensional_statistics",)      → las estadísticas dimensionales
+
+se puede empujar cada código al frontend en segundos en lugar de minutos.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+Path = Tuple[Any, ...]
+
+
+class IncrementalJSONParser:
+    """
+    Escáner carácter a carácter que sigue la ruta (claves/índices) del valor
+    actual y emite los valores completos cuyos paths coinciden con `targets`.
+
+    `"*"` en un target coincide con cualquier índice de array o clave.
+    Todo lo anterior al primer `{` (preamble, bloque ```json) se ignora.
+    """
+
+    def __init__(self, targets: Sequence[Sequence[Any]]):
+        self.targets = [tuple(t) for t in targets]
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.stack: List[Dict[str, Any]] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.string_is_key = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Añade un fragmento de texto y devuelve los eventos completados:
+        [{"path": (...), "value": ...}, ...]
+        """
+        self.buffer += chunk
+        events = []
+
+        while self.pos < len(self.buffer) and not self.finished:
+            i = self.pos
+            ch = self.buffer[i]
+            self.pos += 1
+
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._open("obj", i)
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._close_string(i, events)
+                continue
+
+            if ch == '"':
+                top = self.stack[-1]
+                self.in_string = True
+                self.string_start = i
+                self.string_is_key = top["type"] == "obj" and top["expecting_key"]
+            elif ch == "{":
+                self._open("obj", i)
+            elif ch == "[":
+                self._open("arr", i)
+            elif ch in "}]":
+                self._close_container(i, events)
+            elif ch == ",":
+                top = self.stack[-1]
+                if top["type"] == "obj":
+                    top["expecting_key"] = True
+                else:
+                    top["index"] += 1
+
+        return events
+
+    # -------------------------------------------------------------------------
+
+    def _current_path(self) -> Path:
+        if not self.stack:
+            return ()
+        top = self.stack[-1]
+        if top["type"] == "obj":
+            return top["path"] + (top["key"],)
+        return top["path"] + (top["index"],)
+
+    def _open(self, kind: str, i: int):
+        self.stack.append({
+            "type": kind,
+            "start": i,
+            "path": self._current_path(),
+            "key": None,
+            "index": 0,
+            "expecting_key": kind == "obj"
+        })
+
+    def _close_string(self, i: int, events: List[Dict[str, Any]]):
+        raw = self.buffer[self.string_start:i + 1]
+        top = self.stack[-1]
+
+        if self.string_is_key:
+            top["key"] = json.loads(raw)
+            top["expecting_key"] = False
+            return
+
+        self._emit(self._current_path(), raw, events)
+
+    def _close_container(self, i: int, events: List[Dict[str, Any]]):
+        frame = self.stack.pop()
+        self._emit(frame["path"], self.buffer[frame["start"]:i + 1], events)
+        if not self.stack:
+            self.finished = True
+
+    def _matches(self, path: Path) -> bool:
+        for target in self.targets:
+            if len(target) != len(path):
+                continue
+            if all(t == "*" or t == p for t, p in zip(target, path)):
+                return True
+        return False
+
+    def _emit(self, path: Path, raw: str, events: List[Dict[str, Any]]):
+        if not self._matches(path):
+            return
+        try:
+            events.append({"path": path, "value": json.loads(raw)})
+        except json.JSONDecodeError:
+            pass
+
+    def document_text(self) -> Optional[str]:
+        """Texto del documento JSON completo (desde el primer `{`) una vez terminado."""
+        if not self.finished:
+            return None
+        start = self.buffer.index("{")
+        return self.buffer[start:self.pos]
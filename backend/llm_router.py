@@ -0,0 +1,203 @@
+"""
+Router multi-proveedor con hedged requests.
+
+Cada proveedor (Anthropic, OpenAI, u otro modelo del mismo proveedor) lleva
+un histograma de latencias por tipo de llamada. Cuando una llamada tarda más
+que el percentil p95 de su proveedor, se lanza un duplicado ("hedge") contra
+el siguiente proveedor; la primera respuesta gana y la otra se cancela.
+La llamada cancelada deja en su histograma una muestra censurada (lo que
+llevaba esperando, una cota inferior de su latencia real): si no, un
+proveedor lento solo registraría las veces que gana y su p95 quedaría
+sesgado a la baja. Si el primario falla antes de lanzar el hedge, el secundario actúa de failover.
+
+El router no sabe nada de prompts ni de SDKs: recibe una corrutina
+`fn(provider)` que hace la llamada completa contra ese proveedor.
+"""
+
+import math
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets logarítmicos (de `min_seconds` a
+    `max_seconds`). Los cuantiles se interpolan dentro del bucket.
+    """
+
+    def __init__(self, min_seconds: float = 0.05, max_seconds: float = 1800.0, buckets: int = 80):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.growth = (max_seconds / min_seconds) ** (1.0 / buckets)
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.min_seconds:
+            return 0
+        index = int(math.log(seconds / self.min_seconds, self.growth)) + 1
+        return min(index, len(self.counts) - 1)
+
+    def _upper_bound(self, index: int) -> float:
+        return self.min_seconds * (self.growth ** index)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[self._bucket(seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for index, n in enumerate(self.counts):
+                if seen + n >= target and n:
+                    lower = self._upper_bound(index - 1) if index else 0.0
+                    upper = self._upper_bound(index)
+                    return lower + (upper - lower) * (target - seen) / n
+                seen += n
+            return self.max_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "p50": _round(self.quantile(0.50)),
+            "p95": _round(self.quantile(0.95)),
+            "p99": _round(self.quantile(0.99))
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+class HedgedRouter:
+    """
+    Args:
+        providers: Proveedores en orden de preferencia (el primero es el primario)
+        hedge_quantile: Cuantil de latencia del primario a partir del cual se lanza el hedge
+        min_samples: Muestras mínimas antes de fiarse del cuantil
+        cold_start_delay: Espera antes del hedge mientras no hay muestras suficientes
+            (None = no hacer hedge hasta tener histograma)
+        routing: "fixed" (orden de `providers`) o "latency" (primario = menor p50)
+    """
+
+    def __init__(self, providers: List[str], hedge_quantile: float = 0.95, min_samples: int = 10,
+                 cold_start_delay: Optional[float] = None, routing: str = "fixed"):
+        self.providers = list(providers)
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.cold_start_delay = cold_start_delay
+        self.routing = routing
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def histogram(self, provider: str, key: Optional[str] = None) -> LatencyHistogram:
+        name = f"{provider}:{key}" if key else provider
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram()
+            return self.histograms[name]
+
+    def order(self, key: Optional[str] = None) -> List[str]:
+        """Proveedores en el orden en que se intentarán para este tipo de llamada."""
+        if self.routing != "latency":
+            return list(self.providers)
+
+        medians = {}
+        for provider in self.providers:
+            hist = self.histogram(provider, key)
+            if hist.count < self.min_samples:
+                return list(self.providers)  # Sin datos de todos, se respeta la preferencia
+            medians[provider] = hist.quantile(0.5)
+        return sorted(self.providers, key=medians.get)
+
+    def hedge_delay(self, provider: str, key: Optional[str] = None) -> Optional[float]:
+        hist = self.histogram(provider, key)
+        if hist.count < self.min_samples:
+            return self.cold_start_delay
+        return hist.quantile(self.hedge_quantile)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    async def run(self, fn: Callable[[str], Awaitable[Any]], key: Optional[str] = None) -> Any:
+        """
+        Ejecuta `fn(provider)` contra el primario y, si supera su p95 (o falla),
+        contra el siguiente proveedor. Devuelve el primer resultado correcto y
+        cancela la llamada perdedora.
+        """
+        self._count("requests")
+        providers = self.order(key)
+        tasks: Dict[asyncio.Future, tuple] = {}
+
+        def launch(provider: str):
+            tasks[asyncio.ensure_future(fn(provider))] = (provider, time.monotonic())
+
+        launch(providers[0])
+        backups = providers[1:]
+        pending = set(tasks)
+        errors = []
+        hedged = False
+        answered = False
+
+        try:
+            delay = self.hedge_delay(providers[0], key) if backups else None
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    hedged = True
+                    self._count("hedged")
+                    launch(backups.pop(0))
+                pending = set(tasks)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider, started = tasks[task]
+                    if task.exception() is None:
+                        self.histogram(provider, key).record(time.monotonic() - started)
+                        if hedged and provider != providers[0]:
+                            self._count("hedge_wins")
+                        answered = True
+                        return task.result()
+                    errors.append(task.exception())
+
+                if not pending and backups:
+                    self._count("failovers")
+                    launch(backups.pop(0))
+                    pending = {t for t in tasks if not t.done()}
+        finally:
+            # Cancela la llamada perdedora (o todas si el propio router fue cancelado)
+            losers = [t for t in tasks if not t.done()]
+            now = time.monotonic()
+            for loser in losers:
+                if answered:
+                    provider, started = tasks[loser]
+                    self.histogram(provider, key).record(now - started)
+                loser.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+
+        self._count("errors")
+        raise errors[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = dict(self.histograms)
+            stats = dict(self.stats)
+        return {
+            "providers": self.providers,
+            "routing": self.routing,
+            "stats": stats,
+            "latency": {name: hist.snapshot() for name, hist in histograms.items()}
+        }
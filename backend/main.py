@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine, Base
 from models import Analysis
@@ -6,6 +7,8 @@ from service import analyze_text, perform_comparative_analysis, analyze_with_pip
 from qdpx_parser import extract_codes_from_qdpx
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from job_queue import JobQueue
+import os
 
 Base.metadata.create_all(bind=engine)
 
@@ -47,31 +50,79 @@ def get_db():
     finally:
         db.close()
 
+# Cola de jobs compartida con service.py (mismo SQLite); los tipos llevan el prefijo
+# "fastapi." para que cada servidor solo ejecute los suyos
+job_queue = JobQueue(
+    path=os.getenv("JOBS_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "jobs.db")),
+    workers=int(os.getenv("JOBS_WORKERS", "2")),
+    lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", "120")),
+    max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+)
+
+def enqueue_job(kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    job_id = job_queue.submit(f"fastapi.{kind}", payload)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"})
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to PhenomFlow API. Use /analyze to perform analysis."}
 
 @app.post("/analyze", response_model=AnalysisResponse)
-def create_analysis(request: AnalysisRequest, db: Session = Depends(get_db)):
+def create_analysis(request: AnalysisRequest, db: Session = Depends(get_db),
+                    run_async: bool = Query(False, alias="async")):
+    if run_async:
+        return enqueue_job("analyze", {"text": request.text})
+
     # Perform analysis
     try:
         result_text = analyze_text(request.text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+    return save_analysis(db, request.text, result_text)
+
+def save_analysis(db: Session, text: str, result_text: str) -> AnalysisResponse:
     # Save to DB
-    db_analysis = Analysis(input_text=request.text, result=result_text)
+    db_analysis = Analysis(input_text=text, result=result_text)
     db.add(db_analysis)
     db.commit()
     db.refresh(db_analysis)
     
     return AnalysisResponse(id=db_analysis.id, input_text=db_analysis.input_text, result=db_analysis.result)
 
+def job_analyze(payload, job):
+    result_text = analyze_text(payload["text"])
+    db = SessionLocal()
+    try:
+        return save_analysis(db, payload["text"], result_text).dict()
+    finally:
+        db.close()
+
 @app.post("/analyze/enhanced")
-def create_enhanced_analysis(request: AnalysisRequest):
+def create_enhanced_analysis(request: AnalysisRequest, run_async: bool = Query(False, alias="async")):
     """
     Enhanced analysis with 5-phase pipeline returning structured JSON data for visualizations
     """
+    if run_async:
+        return enqueue_job("analyze_enhanced", {
+            "text": request.text,
+            "context": request.context.dict() if request.context else None,
+            "custom_codes": request.custom_codes
+        })
     try:
         result_data = analyze_with_pipeline(request.text, request.context.dict() if request.context else None, request.custom_codes)
         return result_data
@@ -157,7 +208,8 @@ from typing import List
 async def analyze_document(
     files: List[UploadFile] = File(...),
     protocol: Optional[UploadFile] = File(None),
-    context: Optional[str] = Form(None)
+    context: Optional[str] = Form(None),
+    run_async: bool = Query(False, alias="async")
 ):
     try:
         combined_text = ""
@@ -193,22 +245,7 @@ async def analyze_document(
                 file_text = content.decode("utf-8")
             
             combined_text += f"\n--- INTERVIEW: {file.filename} ---\n{file_text}\n"
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-class SynthesisRequest(BaseModel):
-    analyses: List[Dict[str, Any]]
 
-@app.post("/analyze/synthesis")
-def create_synthesis(request: SynthesisRequest):
-    """
-    Perform Cross-Case Synthesis on a list of completed analyses.
-    """
-    try:
-        result = synthesize_structure(request.analyses)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
         if not combined_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from files")
 
@@ -222,13 +259,32 @@ def create_synthesis(request: SynthesisRequest):
             except json.JSONDecodeError:
                 pass
 
+        if run_async:
+            return enqueue_job("analyze_document", {"text": combined_text, "context": context_dict})
+
         analysis_result = analyze_with_pipeline(combined_text, context_dict)
         
         return {"filename": "multi-file-analysis", "analysis": analysis_result}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class SynthesisRequest(BaseModel):
+    analyses: List[Dict[str, Any]]
+
+@app.post("/analyze/synthesis")
+def create_synthesis(request: SynthesisRequest):
+    """
+    Perform Cross-Case Synthesis on a list of completed analyses.
+    """
+    try:
+        result = synthesize_structure(request.analyses)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 
 class ComparativeRequest(BaseModel):
@@ -249,72 +305,98 @@ def get_analyses(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
 import glob
 
 @app.post("/demo/generate")
-def generate_demo_results():
+def generate_demo_results(run_async: bool = Query(False, alias="async")):
     """
     Returns aggregated results from the batch processed interviews.
     """
+    if run_async:
+        return enqueue_job("demo_generate", {})
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(base_dir)
-        
-        # 1. Load Context
-        context_path = os.path.join(project_root, "data", "demo", "context.json")
-        context_data = {}
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                context_data = json.load(f)
-
-        # 2. Load Analysis Results
-        results_dir = os.path.join(project_root, "analysis_results")
-        analysis_files = glob.glob(os.path.join(results_dir, "*.json"))
-        
-        aggregated_codes = []
-        dim_stats = {}
-        processed_count = 0
-        
-        for file_path in analysis_files:
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    
-                    # Extract codes
-                    # Structure might vary slightly, usually data['codes'] or data['phase1_codes']['codes']
-                    codes = data.get('codes', [])
-                    if not codes and 'phase1_codes' in data:
-                        codes = data['phase1_codes'].get('codes', [])
-                        
-                    # Add participant ID to codes if missing
-                    pid = os.path.basename(file_path).replace('.json', '')
-                    for code in codes:
-                        code['participant_id'] = pid
-                        
-                    aggregated_codes.extend(codes)
-                    
-                    # Aggregate stats
-                    # data['dimensional_statistics']
-                    stats = data.get('dimensional_statistics', {})
-                    for dim, stat in stats.items():
-                        if dim not in dim_stats:
-                            dim_stats[dim] = {"total_codes": 0}
-                        dim_stats[dim]["total_codes"] += stat.get("total_codes", 0)
-                        
-                    processed_count += 1
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-
-        # Construct response
-        analysis_result = {
-            "participant_id": "BATCH_DEMO",
-            "phenomenon_nucleus": f"Batch analysis of {processed_count} interviews. Detailed codes are aggregated below.",
-            "codes": aggregated_codes,
-            "dimensional_statistics": dim_stats,
-            # Add other phases if we want valid demo data for them
-            "markdown_table": f"| Metric | Value |\n|---|---|\n| Processed Interviews | {processed_count} |\n| Total Codes | {len(aggregated_codes)} |"
-        }
-        
-        return {
-            "context": context_data,
-            "analysis": analysis_result
-        }
+        return build_demo_results()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def build_demo_results(job=None):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(base_dir)
+
+    # 1. Load Context
+    context_path = os.path.join(project_root, "data", "demo", "context.json")
+    context_data = {}
+    if os.path.exists(context_path):
+        with open(context_path, 'r') as f:
+            context_data = json.load(f)
+
+    # 2. Load Analysis Results
+    results_dir = os.path.join(project_root, "analysis_results")
+    analysis_files = glob.glob(os.path.join(results_dir, "*.json"))
+
+    aggregated_codes = []
+    dim_stats = {}
+    processed_count = 0
+
+    for file_path in analysis_files:
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+
+                # Extract codes
+                # Structure might vary slightly, usually data['codes'] or data['phase1_codes']['codes']
+                codes = data.get('codes', [])
+                if not codes and 'phase1_codes' in data:
+                    codes = data['phase1_codes'].get('codes', [])
+
+                # Add participant ID to codes if missing
+                pid = os.path.basename(file_path).replace('.json', '')
+                for code in codes:
+                    code['participant_id'] = pid
+
+                aggregated_codes.extend(codes)
+
+                # Aggregate stats
+                # data['dimensional_statistics']
+                stats = data.get('dimensional_statistics', {})
+                for dim, stat in stats.items():
+                    if dim not in dim_stats:
+                        dim_stats[dim] = {"total_codes": 0}
+                    dim_stats[dim]["total_codes"] += stat.get("total_codes", 0)
+
+                processed_count += 1
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+
+    # Construct response
+    analysis_result = {
+        "participant_id": "BATCH_DEMO",
+        "phenomenon_nucleus": f"Batch analysis of {processed_count} interviews. Detailed codes are aggregated below.",
+        "codes": aggregated_codes,
+        "dimensional_statistics": dim_stats,
+        # Add other phases if we want valid demo data for them
+        "markdown_table": f"| Metric | Value |\n|---|---|\n| Processed Interviews | {processed_count} |\n| Total Codes | {len(aggregated_codes)} |"
+    }
+
+    return {
+        "context": context_data,
+        "analysis": analysis_result
+    }
+
+job_queue.register("fastapi.analyze", job_analyze)
+job_queue.register("fastapi.analyze_enhanced", lambda payload, job: analyze_with_pipeline(
+    payload["text"], payload.get("context"), payload.get("custom_codes")))
+job_queue.register("fastapi.analyze_document", lambda payload, job: {
+    "filename": "multi-file-analysis",
+    "analysis": analyze_with_pipeline(payload["text"], payload.get("context"))
+})
+job_queue.register("fastapi.demo_generate", lambda payload, job: build_demo_results(job))
+
+
+# Los workers arrancan con el servidor, no al importar el módulo: así un
+# script o test que importe `main` no reclama jobs del SQLite compartido
+@app.on_event("startup")
+def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.stop()
@@ -0,0 +1,222 @@
+"""
+Registro de modelos Whisper cargados en memoria, compartido por los threads de Flask.
+
+Mantiene varios modelos a la vez (p.ej. `base` y `small`, o el mismo tamaño
+en dos motores) con política LRU bajo un presupuesto de RAM:
+
+- Cada clave (motor, tamaño) se carga una sola vez aunque varios threads la
+  pidan a la vez; modelos distintos se cargan en paralelo.
+- Antes de cargar un modelo se expulsan los menos usados recientemente hasta
+  que quepa en `budget_bytes` y, si se conoce, hasta dejar `min_free_bytes`
+  de memoria disponible en el sistema. Los modelos en uso no se expulsan.
+- Cada modelo tiene su semáforo de inferencia con tantas plazas como llamadas
+  concurrentes admite (1 para PyTorch, una por réplica en CTranslate2): las
+  peticiones que llegan a la vez esperan en cola en lugar de competir por los
+  mismos núcleos.
+- Tras un fork (workers de transcription.py) los locks se recrean en el hijo,
+  que hereda los modelos ya cargados copy-on-write.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+def available_memory() -> Optional[int]:
+    """Memoria disponible del sistema en bytes (MemAvailable de /proc/meminfo), o None."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ModelRegistry:
+    """
+    Caché LRU de modelos cargados, thread-safe.
+
+    Args:
+        loader: loader(key, workers) -> {"model", "bytes", "slots", "scales_with_workers"}
+            `slots` son las inferencias concurrentes admitidas; si
+            `scales_with_workers`, pedir más workers que los de la carga la repite.
+        estimate: estimate(key, workers) -> bytes previstos antes de cargar
+        budget_bytes: RAM total para modelos (0 = sin límite)
+        min_free_bytes: memoria del sistema que debe quedar libre tras cargar (0 = no comprobar)
+    """
+
+    def __init__(self, loader: Callable[[Hashable, int], Dict[str, Any]],
+                 estimate: Optional[Callable[[Hashable, int], int]] = None,
+                 budget_bytes: int = 0, min_free_bytes: int = 0):
+        self.loader = loader
+        self.estimate = estimate or (lambda key, workers: 0)
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "loads": 0, "evictions": 0, "load_seconds": 0.0}
+        self._reset_locks()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        """Locks nuevos (también en el hijo tras un fork: los del padre pueden haber quedado tomados)."""
+        self._lock = threading.Lock()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        for entry in self._entries.values():
+            entry["semaphore"] = threading.BoundedSemaphore(entry["slots"])
+            entry["leases"] = 0
+
+    def configure(self, budget_bytes: Optional[int] = None, min_free_bytes: Optional[int] = None):
+        with self._lock:
+            if budget_bytes is not None:
+                self.budget_bytes = budget_bytes
+            if min_free_bytes is not None:
+                self.min_free_bytes = min_free_bytes
+            self._evict_for(0)
+
+    def _usable(self, entry: Optional[Dict[str, Any]], workers: int) -> bool:
+        return entry is not None and not (entry["scales_with_workers"] and workers > entry["workers"])
+
+    def get(self, key: Hashable, workers: int = 1) -> Any:
+        """Modelo para `key`, cargándolo si hace falta (marca la entrada como la más reciente)."""
+        return self._entry(key, workers)["model"]
+
+    def _entry(self, key: Hashable, workers: int = 1) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._usable(entry, workers):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Un lock de carga por clave: el resto de modelos sigue disponible mientras tanto
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if self._usable(entry, workers):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry
+                if entry is not None and entry["leases"] == 0:
+                    self._drop(key)
+                self._evict_for(self.estimate(key, workers))
+
+            started = time.perf_counter()
+            loaded = self.loader(key, workers)
+            elapsed = time.perf_counter() - started
+
+            entry = {
+                "model": loaded["model"],
+                "bytes": int(loaded.get("bytes") or self.estimate(key, workers)),
+                "slots": max(1, int(loaded.get("slots", 1))),
+                "scales_with_workers": bool(loaded.get("scales_with_workers", False)),
+                "workers": workers,
+                "leases": 0,
+                "loaded_at": time.time()
+            }
+            entry["semaphore"] = threading.BoundedSemaphore(entry["slots"])
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] += elapsed
+                self._evict_for(0, keep=key)
+            return entry
+
+    def _drop(self, key: Hashable):
+        self._entries.pop(key, None)
+        self._stats["evictions"] += 1
+
+    def _evict_for(self, incoming: int, keep: Optional[Hashable] = None):
+        """
+        Expulsa modelos sin uso (LRU primero, nunca `keep`) hasta que `incoming`
+        bytes quepan. Requiere self._lock.
+        """
+        def over_budget():
+            used = sum(e["bytes"] for e in self._entries.values())
+            if self.budget_bytes and used + incoming > self.budget_bytes:
+                return True
+            if self.min_free_bytes and incoming:
+                free = available_memory()
+                return free is not None and free - incoming < self.min_free_bytes
+            return False
+
+        while over_budget():
+            idle = [k for k, e in self._entries.items() if e["leases"] == 0 and k != keep]
+            if not idle:
+                break
+            key = idle[0]
+            self._drop(key)
+            print(f"♻️ Modelo Whisper expulsado de memoria: {key}")
+
+    @contextmanager
+    def lease(self, key: Hashable, workers: int = 1) -> Iterator[Any]:
+        """Modelo reservado (no se expulsa) durante el bloque, sin plaza de inferencia."""
+        entry = self._acquire_lease(key, workers)
+        try:
+            yield entry["model"]
+        finally:
+            self._release(entry)
+
+    @contextmanager
+    def use(self, key: Hashable, workers: int = 1) -> Iterator[Any]:
+        """Modelo reservado + plaza de inferencia (espera en cola si están todas ocupadas)."""
+        entry = self._acquire_lease(key, workers)
+        try:
+            with entry["semaphore"]:
+                yield entry["model"]
+        finally:
+            self._release(entry)
+
+    def _release(self, entry: Dict[str, Any]):
+        with self._lock:
+            entry["leases"] -= 1
+            # Lo que no se pudo expulsar mientras estaba en uso
+            self._evict_for(0)
+
+    def _acquire_lease(self, key: Hashable, workers: int) -> Dict[str, Any]:
+        while True:
+            entry = self._entry(key, workers)
+            with self._lock:
+                # Entre la carga y la reserva otro thread pudo expulsarla o sustituirla
+                if self._entries.get(key) is entry:
+                    entry["leases"] += 1
+                    return entry
+
+    def warm_up(self, keys: Iterator[Tuple[Hashable, int]]):
+        """Carga de antemano (p.ej. al arrancar el servidor) los modelos indicados como (clave, workers)."""
+        for key, workers in keys:
+            try:
+                self.get(key, workers)
+            except Exception as e:
+                print(f"⚠️ No se pudo precargar {key}: {e}")
+
+    def evict(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["leases"]:
+                return False
+            self._drop(key)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": [
+                    {"key": list(key) if isinstance(key, tuple) else key, "bytes": e["bytes"],
+                     "slots": e["slots"], "in_use": e["leases"]}
+                    for key, e in self._entries.items()
+                ],
+                "bytes": sum(e["bytes"] for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self._stats["hits"],
+                "loads": self._stats["loads"],
+                "evictions": self._stats["evictions"],
+                "load_seconds": round(self._stats["load_seconds"], 2)
+            }
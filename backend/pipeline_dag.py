@@ -0,0 +1,170 @@
+"""
+Ejecutor DAG con checkpoints para el pipeline completo.
+
+Cada nodo (Fase 1 por participante, síntesis, validación, body maps) guarda
+su salida en `output_dir/nodes/` junto con una clave que es el hash de sus
+entradas y de las salidas que recibió de sus dependencias. Al relanzar el
+pipeline solo se ejecutan los nodos cuya clave cambió o cuya salida falta;
+los nodos independientes se ejecutan en paralelo.
+
+Como la clave incluye las salidas reales de las dependencias, un nodo
+calculado sobre una dependencia fallida (p.ej. una Fase 1 que devolvió
+`{"error": ...}` y no se guardó) no se reutiliza cuando esa dependencia
+se ejecuta bien más adelante.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+def hash_inputs(value: Any) -> str:
+    """SHA-256 estable de un valor JSON-serializable."""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PipelineDAG:
+    """
+    Args:
+        output_dir: Directorio donde se guardan los checkpoints de cada nodo
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.nodes_dir = os.path.join(output_dir, "nodes")
+        os.makedirs(self.nodes_dir, exist_ok=True)
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.status: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: Optional[List[str]] = None,
+            inputs: Any = None, checkpoint_if: Optional[Callable[[Any], bool]] = None):
+        """
+        Registra un nodo.
+
+        Args:
+            name: Nombre único del nodo (p.ej. "phase1/P01")
+            fn: Función (sync o async) que recibe {dep: salida} y devuelve un valor JSON-serializable
+            deps: Nodos de los que depende (deben registrarse antes)
+            inputs: Entradas propias del nodo que determinan su clave (texto, prompt, modelo...)
+            checkpoint_if: Si devuelve False la salida no se guarda (se reintentará en el próximo run)
+        """
+        deps = deps or []
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Nodo '{name}' depende de '{dep}', que no está registrado")
+
+        key = hash_inputs({
+            "name": name,
+            "inputs": inputs,
+            "deps": {dep: self.nodes[dep]["key"] for dep in deps}
+        })
+        self.nodes[name] = {"fn": fn, "deps": deps, "key": key, "checkpoint_if": checkpoint_if}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.nodes_dir, re.sub(r"[^\w.-]", "_", name) + ".json")
+
+    def _load(self, name: str, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return checkpoint if checkpoint.get("key") == key else None
+
+    def _save(self, name: str, key: str, output: Any):
+        path = self._path(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "node": name,
+                "key": key,
+                "completed_at": datetime.now().isoformat(),
+                "output": output
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Ejecuta los nodos pendientes respetando dependencias.
+
+        Si un nodo falla, sus dependientes no se ejecutan, pero el resto de
+        nodos independientes termina y queda guardado; después se re-lanza
+        el primer error.
+
+        Returns:
+            {nombre: salida} de todos los nodos
+        """
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_node(name: str) -> Any:
+            node = self.nodes[name]
+            dep_outputs = {}
+            for dep in node["deps"]:
+                dep_outputs[dep] = await tasks[dep]
+
+            # Clave efectiva: entradas propias + lo que devolvieron realmente las dependencias
+            key = hash_inputs({
+                "node": node["key"],
+                "deps": {dep: hash_inputs(output) for dep, output in dep_outputs.items()}
+            })
+
+            checkpoint = self._load(name, key)
+            if checkpoint is not None:
+                self.status[name] = {"status": "cached", "key": key[:12]}
+                return checkpoint["output"]
+
+            started = time.monotonic()
+            if inspect.iscoroutinefunction(node["fn"]):
+                output = await node["fn"](dep_outputs)
+            else:
+                output = await asyncio.to_thread(node["fn"], dep_outputs)
+                if inspect.isawaitable(output):
+                    output = await output
+
+            keep = node["checkpoint_if"] is None or node["checkpoint_if"](output)
+            if keep:
+                self._save(name, key, output)
+            self.status[name] = {
+                "status": "executed" if keep else "executed_not_saved",
+                "key": key[:12],
+                "seconds": round(time.monotonic() - started, 2)
+            }
+            return output
+
+        # Los nodos se registran en orden topológico (las deps deben existir al añadir)
+        for name in self.nodes:
+            tasks[name] = asyncio.ensure_future(run_node(name))
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        outputs = {}
+        errors = []
+        for name, result in zip(tasks, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                self.status.setdefault(name, {"status": "failed", "error": str(result)})
+            else:
+                outputs[name] = result
+
+        self._write_manifest()
+        if errors:
+            raise errors[0]
+        return outputs
+
+    def _write_manifest(self):
+        path = os.path.join(self.output_dir, "pipeline_state.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "nodes": self.status},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,366 @@
+"""
+Rate limiting compartido para las llamadas LLM.
+
+Dos piezas complementarias:
+
+1. `RateLimiter`: token bucket doble (requests/min y tokens/min) cuyo estado
+   vive en un archivo SQLite, de modo que todos los threads y procesos de la
+   máquina (servidor Flask, batch scripts, workers) consumen del mismo cupo.
+   Se recalibra con las cabeceras de rate limit que devuelve el proveedor.
+
+2. `AdaptiveConcurrency`: límite de llamadas en vuelo con control AIMD
+   (additive increase / multiplicative decrease): crece +1 por cada ventana
+   de llamadas exitosas y se divide por 2 ante un 429.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+
+class RateLimiter:
+    """
+    Token bucket de requests por minuto (RPM) y tokens por minuto (TPM)
+    compartido entre procesos vía SQLite (`BEGIN IMMEDIATE` actúa como lock).
+
+    Args:
+        path: Archivo SQLite con el estado de los buckets
+        rpm: Requests por minuto permitidos (0 = sin límite)
+        tpm: Tokens por minuto permitidos (0 = sin límite hasta aprenderlo de las cabeceras)
+        name: Nombre del bucket (p.ej. proveedor), permite varios limitadores en el mismo archivo
+    """
+
+    def __init__(self, path: str, rpm: float = 0, tpm: float = 0, name: str = "default"):
+        self.path = path
+        self.name = name
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    rpm REAL NOT NULL,
+                    tpm REAL NOT NULL,
+                    requests REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (name, rpm, tpm, requests, tokens, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, rpm, tpm, rpm, tpm, time.time())
+            )
+            # La configuración explícita manda sobre la que quedó en disco
+            if rpm:
+                conn.execute("UPDATE buckets SET rpm = ? WHERE name = ?", (rpm, name))
+            if tpm:
+                conn.execute("UPDATE buckets SET tpm = ? WHERE name = ?", (tpm, name))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transaction(self, fn):
+        """Ejecuta `fn(state)` con el bucket bloqueado y el estado ya rellenado."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT rpm, tpm, requests, tokens, updated_at, blocked_until FROM buckets WHERE name = ?",
+                (self.name,)
+            ).fetchone()
+            rpm, tpm, requests, tokens, updated_at, blocked_until = row
+
+            # Rellenar proporcionalmente al tiempo transcurrido
+            now = time.time()
+            elapsed = max(0.0, now - updated_at)
+            state = {
+                "rpm": rpm,
+                "tpm": tpm,
+                "requests": min(rpm, requests + elapsed * rpm / 60.0),
+                "tokens": min(tpm, tokens + elapsed * tpm / 60.0),
+                "blocked_until": blocked_until,
+                "now": now
+            }
+
+            result = fn(state)
+
+            conn.execute(
+                "UPDATE buckets SET rpm = ?, tpm = ?, requests = ?, tokens = ?, updated_at = ?, blocked_until = ? "
+                "WHERE name = ?",
+                (state["rpm"], state["tpm"], state["requests"], state["tokens"], now,
+                 state["blocked_until"], self.name)
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Intenta reservar 1 request + `tokens` tokens.
+
+        Returns:
+            0.0 si la reserva se hizo, o los segundos a esperar antes de reintentar.
+        """
+        def _reserve(state):
+            now = state["now"]
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+
+            waits = []
+            if state["rpm"] and state["requests"] < 1:
+                waits.append((1 - state["requests"]) * 60.0 / state["rpm"])
+            if state["tpm"] and tokens:
+                needed = min(tokens, state["tpm"])  # Una request enorme no puede esperar para siempre
+                if state["tokens"] < needed:
+                    waits.append((needed - state["tokens"]) * 60.0 / state["tpm"])
+
+            if waits:
+                return max(waits)
+
+            if state["rpm"]:
+                state["requests"] -= 1
+            if state["tpm"]:
+                state["tokens"] -= tokens
+            return 0.0
+
+        return self._transaction(_reserve)
+
+    def acquire(self, tokens: int = 0):
+        """Bloquea el thread hasta obtener cupo."""
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 30))
+
+    async def acquire_async(self, tokens: int = 0):
+        """
+        Como `acquire` pero sin bloquear el event loop: la transacción SQLite
+        (que puede esperar al lock de otro proceso) va en un thread.
+        """
+        while True:
+            wait = await asyncio.to_thread(self.reserve, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 30))
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Corrige el bucket con el consumo real una vez conocida la respuesta."""
+        def _settle(state):
+            if state["tpm"]:
+                state["tokens"] = min(state["tpm"], state["tokens"] + estimated_tokens - actual_tokens)
+
+        self._transaction(_settle)
+
+    def block(self, seconds: float):
+        """Pausa a todos los clientes del bucket (p.ej. tras un 429 con retry-after)."""
+        def _block(state):
+            state["blocked_until"] = max(state["blocked_until"], state["now"] + seconds)
+
+        self._transaction(_block)
+
+    def update_from_headers(self, headers: Optional[Dict[str, str]]):
+        """
+        Recalibra el bucket con las cabeceras de rate limit de Anthropic
+        (`anthropic-ratelimit-*`) u OpenAI (`x-ratelimit-*`).
+        """
+        info = parse_rate_limit_headers(headers)
+        if not info:
+            return
+
+        def _update(state):
+            if info.get("requests_limit"):
+                state["rpm"] = info["requests_limit"]
+            if info.get("tokens_limit"):
+                state["tpm"] = info["tokens_limit"]
+            if info.get("requests_remaining") is not None:
+                state["requests"] = min(state["requests"], info["requests_remaining"])
+            if info.get("tokens_remaining") is not None and state["tpm"]:
+                state["tokens"] = min(state["tokens"], info["tokens_remaining"])
+            if info.get("retry_after"):
+                state["blocked_until"] = max(state["blocked_until"], state["now"] + info["retry_after"])
+
+        self._transaction(_update)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def _snapshot(state):
+            return {k: round(v, 2) for k, v in state.items() if k != "now"}
+
+        return self._transaction(_snapshot)
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de concurrencia AIMD para las llamadas de este proceso.
+
+    - Éxito: limit += 1 / limit  (≈ +1 por cada `limit` llamadas exitosas)
+    - 429:   limit = limit / 2   (nunca por debajo de `minimum`)
+
+    Lo comparten threads y corrutinas: las corrutinas que esperan plaza
+    registran un future en su loop y `release`/`on_success` las despiertan
+    con `call_soon_threadsafe`, igual que el Condition a los threads.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._async_waiters = []
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def _notify_all(self):
+        """Despierta a threads y corrutinas en espera. Requiere self._cond."""
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # Loop ya cerrado
+
+    def release(self):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._notify_all()
+
+    def on_rate_limit(self):
+        with self._cond:
+            self.limit = max(float(self.minimum), self.limit / 2.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "maximum": self.maximum}
+
+
+def _wake(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+# =============================================================================
+# PARSEO DE CABECERAS DE RATE LIMIT
+# =============================================================================
+
+def parse_rate_limit_headers(headers: Optional[Dict[str, str]]) -> Dict[str, float]:
+    """
+    Normaliza las cabeceras de rate limit de ambos proveedores.
+
+    Returns:
+        dict con requests_limit, requests_remaining, tokens_limit,
+        tokens_remaining y retry_after (segundos), solo las claves presentes.
+    """
+    if not headers:
+        return {}
+
+    lowered = {k.lower(): v for k, v in dict(headers).items()}
+    info = {}
+
+    mapping = {
+        "requests_limit": ["anthropic-ratelimit-requests-limit", "x-ratelimit-limit-requests"],
+        "requests_remaining": ["anthropic-ratelimit-requests-remaining", "x-ratelimit-remaining-requests"],
+        "tokens_limit": ["anthropic-ratelimit-input-tokens-limit", "anthropic-ratelimit-tokens-limit",
+                         "x-ratelimit-limit-tokens"],
+        "tokens_remaining": ["anthropic-ratelimit-input-tokens-remaining", "anthropic-ratelimit-tokens-remaining",
+                             "x-ratelimit-remaining-tokens"],
+    }
+
+    for field, names in mapping.items():
+        for name in names:
+            if name in lowered:
+                try:
+                    info[field] = float(lowered[name])
+                    break
+                except ValueError:
+                    continue
+
+    if "retry-after" in lowered:
+        try:
+            info["retry_after"] = float(lowered["retry-after"])
+        except ValueError:
+            pass
+
+    # Sin retry-after pero con el cupo agotado: esperar hasta el reset anunciado
+    if "retry_after" not in info:
+        for field, names in [
+            ("requests_remaining", ["anthropic-ratelimit-requests-reset", "x-ratelimit-reset-requests"]),
+            ("tokens_remaining", ["anthropic-ratelimit-input-tokens-reset", "anthropic-ratelimit-tokens-reset",
+                                  "x-ratelimit-reset-tokens"]),
+        ]:
+            if info.get(field) == 0:
+                resets = [parse_reset_duration(lowered[n]) for n in names if n in lowered]
+                resets = [r for r in resets if r is not None]
+                if resets:
+                    info["retry_after"] = max(info.get("retry_after", 0.0), max(resets))
+
+    return info
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """
+    Convierte un reset de rate limit a segundos desde ahora.
+
+    Acepta duraciones estilo OpenAI ("1s", "6m0s", "250ms") y
+    timestamps RFC 3339 estilo Anthropic ("2025-01-01T00:00:30Z").
+    """
+    if not value:
+        return None
+
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value.strip():
+        factors = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * factors[u] for n, u in parts)
+
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return None
@@ -0,0 +1,172 @@
+"""
+Síntesis cross-case incremental (delta).
+
+En lugar de re-sintetizar todo el estudio cuando llegan entrevistas nuevas,
+el LLM recibe la síntesis anterior compactada y solo los análisis nuevos, y
+devuelve un parche. El parche se aplica aquí de forma determinista:
+
+    {
+      "codebook_patch": [
+        {"path": ["CATEGORÍA", "Subcategoría", "Especificación"],
+         "code": "...", "participants": ["P11"], "evidence": ["..."]}
+      ],
+      "new_structures": [{"structure_id": "E4", "structure_name": "...", ...}],
+      "structure_updates": [{"structure_id": "E1", "fields": {...}}],
+      "structure_assignments": [{"participant_id": "P11", "structure_id": "E1"}],
+      "reassigned_participants": [{"participant_id": "P03", "from": "E1", "to": "E4", "reason": "..."}]
+    }
+"""
+
+import copy
+from typing import Any, Dict, List
+
+
+STRUCTURE_KEY_FIELDS = ("structure_id", "structure_name", "participants")
+
+
+def compact_synthesis(synthesis: Dict[str, Any], minimal: bool = False) -> Dict[str, Any]:
+    """
+    Versión compacta de una síntesis para el prompt incremental: se conservan
+    la jerarquía del codebook, los códigos y sus participantes, y las
+    estructuras con sus participantes; se descartan citas y evidencias.
+
+    Con `minimal`, las estructuras quedan reducidas a id, nombre y
+    participantes (sin descripciones ni demás prosa). El codebook no se
+    recorta nunca: el parche debe poder referirse a todos sus códigos.
+    """
+    if minimal:
+        def keep(key):
+            return key in STRUCTURE_KEY_FIELDS
+    else:
+        def keep(key):
+            return key not in ("evidence", "quotes", "verbatims")
+    return {
+        "codebook": _strip_evidence(synthesis.get("codebook", {})),
+        "experiential_structures": [
+            {k: v for k, v in structure.items() if keep(k)}
+            for structure in synthesis.get("experiential_structures", [])
+            if isinstance(structure, dict)
+        ]
+    }
+
+
+def _strip_evidence(node: Any) -> Any:
+    if isinstance(node, dict):
+        if "code" in node:
+            return {k: node[k] for k in ("code", "participants") if k in node}
+        return {k: _strip_evidence(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_strip_evidence(item) for item in node]
+    return node
+
+
+def synthesis_participants(synthesis: Dict[str, Any]) -> List[str]:
+    """Participantes cubiertos por una síntesis (lista explícita o los de sus estructuras)."""
+    if synthesis.get("participants"):
+        return list(synthesis["participants"])
+    seen = []
+    for structure in synthesis.get("experiential_structures", []):
+        for pid in (structure.get("participants", []) if isinstance(structure, dict) else []):
+            if pid not in seen:
+                seen.append(pid)
+    return seen
+
+
+def apply_synthesis_patch(previous: Dict[str, Any], patch: Dict[str, Any],
+                          new_participants: List[str]) -> Dict[str, Any]:
+    """
+    Aplica un parche incremental a la síntesis anterior.
+
+    Returns:
+        Nueva síntesis con "participants" actualizado y un bloque "incremental"
+        que resume el delta (códigos nuevos/ampliados, estructuras nuevas,
+        participantes asignados y participantes que cambiaron de estructura).
+    """
+    result = copy.deepcopy(previous)
+    codebook = result.setdefault("codebook", {})
+    structures = result.setdefault("experiential_structures", [])
+    summary = {
+        "new_participants": list(new_participants),
+        "new_codes": [],
+        "extended_codes": [],
+        "new_structures": [],
+        "updated_structures": [],
+        "assigned_participants": [],
+        "moved_participants": []
+    }
+
+    # Codebook
+    for entry in patch.get("codebook_patch", []):
+        if not isinstance(entry, dict) or not entry.get("code"):
+            continue
+        codes = _code_list(codebook, entry.get("path") or [])
+        existing = next((c for c in codes if isinstance(c, dict) and c.get("code") == entry["code"]), None)
+        if existing is None:
+            codes.append({k: v for k, v in entry.items() if k != "path"})
+            summary["new_codes"].append(entry["code"])
+        else:
+            existing["participants"] = _union(existing.get("participants", []), entry.get("participants", []))
+            existing["evidence"] = list(existing.get("evidence", [])) + list(entry.get("evidence", []))
+            summary["extended_codes"].append(entry["code"])
+
+    # Estructuras
+    by_id = {s.get("structure_id"): s for s in structures if isinstance(s, dict)}
+    for structure in patch.get("new_structures", []):
+        if isinstance(structure, dict) and structure.get("structure_id") not in by_id:
+            structure = {**structure, "participants": list(structure.get("participants", []))}
+            structures.append(structure)
+            by_id[structure.get("structure_id")] = structure
+            summary["new_structures"].append(structure.get("structure_id"))
+
+    for update in patch.get("structure_updates", []):
+        target = by_id.get(update.get("structure_id")) if isinstance(update, dict) else None
+        if target is not None:
+            fields = {k: v for k, v in (update.get("fields") or {}).items() if k != "participants"}
+            target.update(fields)
+            summary["updated_structures"].append(update["structure_id"])
+
+    for assignment in patch.get("structure_assignments", []):
+        target = by_id.get(assignment.get("structure_id")) if isinstance(assignment, dict) else None
+        if target is not None:
+            target["participants"] = _union(target.get("participants", []), [assignment["participant_id"]])
+            summary["assigned_participants"].append(assignment)
+
+    for move in patch.get("reassigned_participants", []):
+        if not isinstance(move, dict) or move.get("to") not in by_id:
+            continue
+        pid = move.get("participant_id")
+        source = by_id.get(move.get("from"))
+        if source is not None:
+            source["participants"] = [p for p in source.get("participants", []) if p != pid]
+        by_id[move["to"]]["participants"] = _union(by_id[move["to"]].get("participants", []), [pid])
+        summary["moved_participants"].append(move)
+
+    result["participants"] = _union(synthesis_participants(previous), new_participants)
+    result["incremental"] = summary
+    return result
+
+
+def _code_list(codebook: Dict[str, Any], path: List[str]) -> List[Any]:
+    """
+    Lista de códigos en `path` dentro del codebook jerárquico (creando los
+    niveles que falten). Si la jerarquía no es un árbol de dicts, los códigos
+    van a codebook["incremental_codes"].
+    """
+    node = codebook
+    for i, level in enumerate(path):
+        if not isinstance(node, dict):
+            return codebook.setdefault("incremental_codes", [])
+        if level not in node:
+            node[level] = [] if i == len(path) - 1 else {}
+        node = node[level]
+    if isinstance(node, list) and path:
+        return node
+    return codebook.setdefault("incremental_codes", [])
+
+
+def _union(current: List[Any], extra: List[Any]) -> List[Any]:
+    result = list(current)
+    for item in extra:
+        if item not in result:
+            result.append(item)
+    return result
@@ -0,0 +1,252 @@
+"""
+Trazas y métricas ligeras (sin dependencias externas).
+
+- `span(name, **atributos)`: context manager que mide una etapa (prompt,
+  llamada LLM, parseo JSON, body maps, transcripción, parseo de documentos).
+  Cada span alimenta el histograma `phenomflow_stage_seconds{stage=...}` y,
+  si hay una traza activa, queda registrado en ella con su span padre.
+- `start_trace()` / `finish_trace()`: traza por request (contextvars), que
+  puede volcarse a JSON con `dump_trace()`.
+- `REGISTRY`: contadores e histogramas con etiquetas, exportados en formato
+  de texto de Prometheus por `REGISTRY.render()` (endpoint `/metrics`).
+"""
+
+import os
+import json
+import time
+import uuid
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar("phenomflow_trace", default=None)
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("phenomflow_span", default=None)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.label_names), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # clave → [conteos por bucket..., suma, total]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{_format_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, inf)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge cuyo valor se calcula al exportar: fn() -> {tupla de etiquetas: valor}."""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str], fn):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.fn() or {}
+        except Exception:
+            values = {}
+        for key, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str], fn) -> Gauge:
+        return self._register(Gauge(name, documentation, labels, fn))
+
+    def render(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "phenomflow_stage_seconds", "Duración de cada etapa instrumentada con span()", ["stage", "status"]
+)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Mide una etapa. El dict que se entrega permite añadir atributos durante
+    la ejecución (`s["attributes"]["chars"] = ...`).
+    """
+    record = {
+        "name": name,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": _CURRENT_SPAN.get(),
+        "start": datetime.now().isoformat(),
+        "attributes": dict(attributes)
+    }
+    trace = _CURRENT_TRACE.get()
+    token = _CURRENT_SPAN.set(record["span_id"])
+    started = time.perf_counter()
+    record["status"] = "ok"
+    try:
+        yield record
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        record["duration_seconds"] = round(time.perf_counter() - started, 6)
+        STAGE_SECONDS.observe(record["duration_seconds"], stage=name, status=record["status"])
+        if trace is not None:
+            with trace["lock"]:
+                trace["spans"].append(record)
+
+
+def traced(name: str):
+    """Decorador equivalente a envolver la función (sync o async) en `span(name)`."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(name: str, **attributes) -> Tuple[Dict[str, Any], contextvars.Token]:
+    """Abre una traza en el contexto actual; los spans posteriores se registran en ella."""
+    trace = {
+        "trace_id": uuid.uuid4().hex,
+        "name": name,
+        "start": datetime.now().isoformat(),
+        "started": time.perf_counter(),
+        "attributes": dict(attributes),
+        "spans": [],
+        "lock": threading.Lock()
+    }
+    return trace, _CURRENT_TRACE.set(trace)
+
+
+def finish_trace(trace: Dict[str, Any], token: contextvars.Token) -> Dict[str, Any]:
+    """Cierra la traza y devuelve su versión serializable (spans ordenados por inicio)."""
+    try:
+        _CURRENT_TRACE.reset(token)
+    except ValueError:
+        # Cerrada desde otro contexto (p.ej. el final de una respuesta streaming)
+        _CURRENT_TRACE.set(None)
+    with trace["lock"]:
+        spans = sorted(trace["spans"], key=lambda s: s["start"])
+    return {
+        "trace_id": trace["trace_id"],
+        "name": trace["name"],
+        "start": trace["start"],
+        "duration_seconds": round(time.perf_counter() - trace["started"], 6),
+        "attributes": trace["attributes"],
+        "spans": spans
+    }
+
+
+def dump_trace(trace: Dict[str, Any], directory: str) -> str:
+    """Guarda la traza como JSON en `directory` (escritura atómica). Devuelve la ruta."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(directory, f"{stamp}_{trace['trace_id'][:12]}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
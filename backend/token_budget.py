@@ -0,0 +1,177 @@
+"""
+Estimación offline de tokens y presupuestos por fase.
+
+Antes de cada llamada LLM se estima el tamaño del prompt localmente (sin
+llamar a ningún tokenizer remoto) para poder dividir, recortar o rechazar
+prompts demasiado grandes antes de esperar minutos por un error.
+
+El estimador usa una razón caracteres/token por proveedor que se recalibra
+con el uso real que devuelve la API (media móvil exponencial). Cada par
+estimado/real se registra en un JSONL para poder revisar el ajuste. La
+calibración se guarda como mucho cada `save_interval` segundos y al salir
+del proceso; un fallo al escribirla nunca hace fallar la llamada.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import atexit
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+# Caracteres por token iniciales (texto en español/inglés con markdown)
+DEFAULT_CHARS_PER_TOKEN = {
+    "anthropic": 3.5,
+    "openai": 4.0
+}
+
+# Los caracteres fuera de ASCII (acentos, emojis, símbolos) suelen costar más de un token
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+class TokenBudgetExceeded(ValueError):
+    """El prompt estimado supera el presupuesto de tokens de la fase."""
+
+    def __init__(self, phase: str, estimated: int, budget: int):
+        self.phase = phase
+        self.estimated = estimated
+        self.budget = budget
+        super().__init__(
+            f"Prompt de ~{estimated} tokens supera el presupuesto de la fase '{phase}' ({budget} tokens)"
+        )
+
+
+class TokenEstimator:
+    """
+    Estimador de tokens calibrado por proveedor.
+
+    Args:
+        calibration_path: JSON con las razones calibradas (se crea si no existe)
+        log_path: JSONL donde se registran los pares estimado/real (None = no registrar)
+        smoothing: Peso de cada nueva observación en la media móvil
+        save_interval: Segundos mínimos entre escrituras de la calibración (0 = en cada llamada)
+    """
+
+    def __init__(self, calibration_path: str, log_path: Optional[str] = None, smoothing: float = 0.2,
+                 save_interval: float = 30.0):
+        self.calibration_path = calibration_path
+        self.log_path = log_path
+        self.smoothing = smoothing
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.ratios = dict(DEFAULT_CHARS_PER_TOKEN)
+
+        os.makedirs(os.path.dirname(os.path.abspath(calibration_path)), exist_ok=True)
+        if os.path.exists(calibration_path):
+            try:
+                with open(calibration_path, "r", encoding="utf-8") as f:
+                    self.ratios.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        atexit.register(self.flush)
+
+    @staticmethod
+    def weighted_length(text: str) -> float:
+        """Longitud ponderada: cada carácter no ASCII cuenta como 2."""
+        return len(text) + len(_NON_ASCII.findall(text))
+
+    def estimate(self, text: str, provider: str = "anthropic") -> int:
+        if not text:
+            return 0
+        ratio = self.ratios.get(provider, DEFAULT_CHARS_PER_TOKEN["anthropic"])
+        return int(math.ceil(self.weighted_length(text) / ratio))
+
+    def record(self, provider: str, text_length: float, estimated: int, actual: int, phase: Optional[str] = None):
+        """
+        Registra el uso real de una llamada y recalibra la razón del proveedor.
+
+        Args:
+            text_length: Longitud ponderada del texto enviado (`weighted_length`)
+            estimated: Tokens estimados antes de la llamada
+            actual: Tokens de entrada reportados por la API
+        """
+        if not actual or not text_length:
+            return
+
+        with self._lock:
+            observed = text_length / actual
+            current = self.ratios.get(provider, DEFAULT_CHARS_PER_TOKEN["anthropic"])
+            self.ratios[provider] = round((1 - self.smoothing) * current + self.smoothing * observed, 4)
+
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({
+                            "timestamp": datetime.now().isoformat(),
+                            "provider": provider,
+                            "phase": phase,
+                            "estimated": estimated,
+                            "actual": actual,
+                            "error_pct": round(100 * (estimated - actual) / actual, 1),
+                            "chars_per_token": self.ratios[provider]
+                        }) + "\n")
+                except OSError as e:
+                    print(f"⚠️ No se pudo registrar la estimación de tokens: {e}")
+
+    def flush(self):
+        """Guarda la calibración si cambió desde la última escritura."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        """Escritura atómica con un temporal único (varios procesos pueden compartir el archivo). Requiere self._lock."""
+        self._last_save = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(self.calibration_path))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token_calibration.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.ratios, f, indent=2)
+            os.replace(tmp_path, self.calibration_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la calibración de tokens: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"chars_per_token": dict(self.ratios)}
+
+
+def trim_to_budget(text: str, max_tokens: int, estimator: TokenEstimator, provider: str,
+                   keep_tail_chars: int = 1500) -> str:
+    """
+    Recorta el centro de `text` hasta que quepa en `max_tokens`, conservando
+    el principio y las instrucciones finales (últimos `keep_tail_chars` caracteres).
+    """
+    if estimator.estimate(text, provider) <= max_tokens:
+        return text
+
+    marker = "\n\n[... CONTENIDO RECORTADO POR PRESUPUESTO DE TOKENS ...]\n\n"
+    tail = text[-keep_tail_chars:]
+    head_budget = max_tokens - estimator.estimate(tail + marker, provider)
+    if head_budget <= 0:
+        return text[:max(0, int(max_tokens * estimator.ratios.get(provider, 3.5) / 2))]
+
+    # Estimación inversa aproximada y ajuste fino hacia abajo
+    head_chars = int(head_budget * estimator.ratios.get(provider, 3.5))
+    head = text[:head_chars]
+    while head and estimator.estimate(head, provider) > head_budget:
+        head = head[:int(len(head) * 0.95)]
+
+    return head + marker + tail
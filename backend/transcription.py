@@ -1,19 +1,176 @@
 """
 Módulo de transcripción de audio usando Whisper local.
+
+`transcribe_multiple(..., workers=N)` reparte los archivos entre N procesos
+creados con fork: el modelo se carga una vez en el proceso padre y los
+workers comparten sus pesos copy-on-write (los tensores no se escriben
+durante la inferencia, así que las páginas no se duplican). Cada worker usa
+`cpu_count // N` hilos de torch para no sobresuscribir los núcleos.
+
+Con `segmented="auto"|"always"`, una grabación larga se corta en silencios
+(ver audio_segmentation.py), los fragmentos se transcriben en paralelo con el
+mismo pool y los segmentos se recolocan con timestamps absolutos.
+`transcribe_audio_segments()` los entrega a medida que terminan.
+
+Con `set_transcription_cache(DiskCache(...))`, `transcribe_audio` guarda cada
+resultado (texto, segmentos e idioma, en JSON compacto comprimido) bajo el
+SHA-256 del audio + modelo + idioma + opciones de decodificación; subir de
+nuevo la misma grabación no vuelve a pasar por Whisper.
+
+El motor de inferencia (`backend="openai"` o `"ctranslate2"`, ver
+whisper_backends.py) se elige por llamada; los motores que no admiten fork
+(CTranslate2) se paralelizan con hilos en lugar de procesos.
+
+`transcribe_pcm_stream()` transcribe un PCMBuffer que todavía se está
+recibiendo (ver audio_ingest.py): cada fragmento se lanza en cuanto hay audio
+suficiente para decidir su corte, sin archivos temporales.
+
+Los modelos cargados viven en un registro LRU compartido por todos los
+threads (ver model_registry.py): varios tamaños a la vez bajo un presupuesto
+de RAM, cada uno con su cola de inferencia.
 """
 
-import whisper
+import gc
 import os
-from typing import List, Dict, Optional
+import json
+import zlib
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Dict, Optional, Union
 import tempfile
 
-# Modelo global (se carga una vez)
-_MODEL = None
-_MODEL_SIZE = "base"  # tiny, base, small, medium, large
+import numpy as np
+
+from audio_segmentation import SAMPLE_RATE, plan_segments, offset_segments
+from whisper_backends import get_backend, load_audio
+from model_registry import ModelRegistry
+from audio_ingest import PCMBuffer, StreamDecoder, stream_segments
+
+try:
+    from disk_cache import make_cache_key
+except ImportError:
+    make_cache_key = None
+
+try:
+    from telemetry import span
+except ImportError:
+    from contextlib import contextmanager
+
+    @contextmanager
+    def span(name, **attributes):
+        yield {"attributes": dict(attributes)}
+
+# Audio de la grabación que transcribe este worker forkeado (lo fija _init_pool_worker en el hijo)
+_WORKER_AUDIO = None
+
+# Caché de transcripciones (DiskCache); None = desactivada
+_TRANSCRIPTION_CACHE = None
+
+# Campos de cada segmento que se conservan en la caché (sin tokens ni métricas de decodificación)
+CACHED_SEGMENT_FIELDS = ("id", "start", "end", "text", "words")
+
+
+def set_transcription_cache(cache) -> None:
+    """Activa (o desactiva con None) la caché de transcripciones."""
+    global _TRANSCRIPTION_CACHE
+    _TRANSCRIPTION_CACHE = cache
+
+
+def audio_sha256(audio_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 del contenido del archivo de audio (leído por bloques)."""
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def transcription_cache_key(audio_hash: str, model_size: str, language: str,
+                            backend: Optional[str] = None, **options) -> str:
+    """Clave de caché: contenido del audio + modelo + motor + idioma + opciones de decodificación."""
+    engine = get_backend(backend)
+    return make_cache_key(kind="transcription", audio=audio_hash, model_size=model_size,
+                          language=language, backend=engine.name, **engine.cache_options(), **options)
+
+
+def encode_transcription(result: Dict) -> bytes:
+    """Formato compacto para la caché: JSON sin espacios, segmentos reducidos, zlib."""
+    payload = {
+        "text": result["text"],
+        "language": result.get("language"),
+        "segments": [
+            {k: segment[k] for k in CACHED_SEGMENT_FIELDS if k in segment}
+            for segment in result.get("segments", [])
+        ]
+    }
+    if "chunks" in result:
+        payload["chunks"] = result["chunks"]
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_transcription(data: bytes) -> Dict:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _load_model(key, workers: int) -> Dict:
+    """Loader del registro: key = (motor, tamaño)."""
+    backend, model_size = key
+    engine = get_backend(backend)
+    print(f"🔄 Cargando modelo Whisper '{model_size}' ({engine.name})...")
+    with span("transcription.model_load", model_size=model_size, backend=engine.name):
+        model = engine.load(model_size, workers)
+    print(f"✅ Modelo Whisper '{model_size}' cargado ({engine.name})")
+    return {
+        "model": model,
+        "bytes": engine.model_bytes(model, model_size),
+        "slots": engine.slots(workers),
+        "scales_with_workers": not engine.fork_safe
+    }
+
+
+def _estimate_model_bytes(key, workers: int) -> int:
+    backend, model_size = key
+    return get_backend(backend).estimate_bytes(model_size, workers)
+
+
+# Modelos cargados (motor, tamaño) → modelo, LRU bajo presupuesto de RAM; los workers forkeados lo heredan
+_REGISTRY = ModelRegistry(loader=_load_model, estimate=_estimate_model_bytes)
+
+
+def _model_key(model_size: str, backend: Optional[str]):
+    return (get_backend(backend).name, model_size)
+
+
+def configure_model_registry(budget_bytes: int = 0, min_free_bytes: int = 0) -> None:
+    """Presupuesto de RAM para modelos (0 = sin límite) y memoria mínima libre en el sistema."""
+    _REGISTRY.configure(budget_bytes=budget_bytes, min_free_bytes=min_free_bytes)
+
 
-def load_whisper_model(model_size: str = "base"):
+def warm_up_models(models: List[str], default_backend: Optional[str] = None, workers: int = 1) -> None:
     """
-    Carga el modelo Whisper.
+    Precarga modelos, p.ej. ["base", "ctranslate2:small"] (motor opcional
+    delante del tamaño).
+    """
+    keys = []
+    for spec in models:
+        backend, _, model_size = spec.strip().rpartition(":")
+        keys.append((_model_key(model_size, backend or default_backend), workers))
+    _REGISTRY.warm_up(keys)
+
+
+def model_registry_stats() -> Dict:
+    return _REGISTRY.stats()
+
+
+def load_whisper_model(model_size: str = "base", backend: Optional[str] = None, workers: int = 1):
+    """
+    Modelo Whisper con el motor `backend` (None = el de por defecto), del
+    registro o cargándolo.
+    
+    `workers` es el número de llamadas concurrentes previstas: los motores
+    que se paralelizan con hilos (CTranslate2) cargan ese número de réplicas.
     
     Modelos disponibles:
     - tiny: ~39M params, más rápido, menos preciso
@@ -22,21 +179,17 @@ def load_whisper_model(model_size: str = "base"):
     - medium: ~769M params, muy buena calidad
     - large: ~1550M params, máxima calidad (muy lento sin GPU)
     """
-    global _MODEL, _MODEL_SIZE
-    
-    if _MODEL is None or _MODEL_SIZE != model_size:
-        print(f"🔄 Cargando modelo Whisper '{model_size}'...")
-        _MODEL = whisper.load_model(model_size)
-        _MODEL_SIZE = model_size
-        print(f"✅ Modelo Whisper '{model_size}' cargado")
-    
-    return _MODEL
+    return _REGISTRY.get(_model_key(model_size, backend), workers)
 
 
 def transcribe_audio(
     audio_path: str, 
     language: str = "es",
-    model_size: str = "base"
+    model_size: str = "base",
+    segmented: str = "never",
+    workers: Optional[int] = None,
+    segment_seconds: float = 120,
+    backend: Optional[str] = None
 ) -> Dict:
     """
     Transcribe un archivo de audio.
@@ -45,38 +198,420 @@ def transcribe_audio(
         audio_path: Ruta al archivo de audio
         language: Código de idioma (es, en, fr, etc.)
         model_size: Tamaño del modelo Whisper
+        segmented: "never", "always" o "auto" (por fragmentos si dura más de
+                   2 × segment_seconds)
+        workers: procesos para los fragmentos (por defecto la mitad de los núcleos)
+        segment_seconds: duración objetivo de cada fragmento
+        backend: motor de inferencia ("openai", "ctranslate2"; None = por defecto)
     
     Returns:
         {
             "text": str,  # Transcripción completa
             "segments": [...],  # Segmentos con timestamps
             "language": str  # Idioma detectado
+            "cached": bool  # (solo si hay caché) resultado servido desde la caché
         }
     """
-    model = load_whisper_model(model_size)
+    cache_key, cached = lookup_transcription(audio_path, language, model_size, segmented, segment_seconds, backend)
+    if cached is not None:
+        return cached
+    
+    result = _transcribe_uncached(audio_path, language, model_size, segmented, workers, segment_seconds, backend)
+    store_transcription(cache_key, result)
+    return result
+
+
+def lookup_transcription(audio_path: Optional[str], language: str, model_size: str,
+                         segmented: str = "never", segment_seconds: float = 120,
+                         backend: Optional[str] = None, audio_hash: Optional[str] = None):
+    """
+    Busca la transcripción en la caché. Devuelve (clave, resultado o None);
+    la clave es None si la caché está desactivada. Con `audio_hash` (SHA-256
+    ya calculado, p.ej. durante una subida en streaming) no se lee `audio_path`.
+    """
+    if _TRANSCRIPTION_CACHE is None or make_cache_key is None:
+        return None, None
+    
+    name = os.path.basename(audio_path) if audio_path else audio_hash[:12]
+    with span("transcription.cache_lookup", file=name):
+        options = {"segmented": segmented}
+        if segmented != "never":
+            options["segment_seconds"] = segment_seconds
+        cache_key = transcription_cache_key(audio_hash or audio_sha256(audio_path), model_size, language,
+                                            backend, **options)
+        cached = _TRANSCRIPTION_CACHE.get(cache_key)
+    
+    if cached is None:
+        return cache_key, None
+    result = decode_transcription(cached)
+    result["cached"] = True
+    print(f"⚡ Transcripción desde caché: {name}")
+    return cache_key, result
+
+
+def store_transcription(cache_key: Optional[str], result: Dict) -> None:
+    """Guarda un resultado bajo la clave de `lookup_transcription` (no hace nada sin caché)."""
+    if cache_key is not None and _TRANSCRIPTION_CACHE is not None:
+        _TRANSCRIPTION_CACHE.set(cache_key, encode_transcription(result))
+        result["cached"] = False
+
+
+def _transcribe_uncached(
+    audio_path: str,
+    language: str,
+    model_size: str,
+    segmented: str,
+    workers: Optional[int],
+    segment_seconds: float,
+    backend: Optional[str]
+) -> Dict:
+    engine = get_backend(backend)
     
     print(f"🎤 Transcribiendo: {os.path.basename(audio_path)}")
     
+    source = audio_path
+    if segmented != "never":
+        with span("transcription.load_audio", file=os.path.basename(audio_path)):
+            source = load_audio(audio_path)
+        if segmented == "always" or len(source) > 2 * segment_seconds * SAMPLE_RATE:
+            return collect_segments(
+                transcribe_audio_segments(source, language, model_size, workers, segment_seconds, backend),
+                language
+            )
+    
     # Transcribir
-    result = model.transcribe(
-        audio_path, 
-        language=language,
-        fp16=False  # Desactivar FP16 para compatibilidad CPU
-    )
+    with _REGISTRY.use(_model_key(model_size, backend)) as model, \
+            span("transcription.transcribe", file=os.path.basename(audio_path), model_size=model_size,
+                 backend=engine.name) as s:
+        result = engine.transcribe(model, source, language)
+        s["attributes"]["chars"] = len(result["text"])
     
     print(f"✅ Transcripción completada: {len(result['text'])} caracteres")
     
     return result
 
 
+def transcribe_audio_segments(
+    audio: Union[str, np.ndarray],
+    language: str = "es",
+    model_size: str = "base",
+    workers: Optional[int] = None,
+    segment_seconds: float = 120,
+    backend: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Transcribe una grabación por fragmentos cortados en silencios, en paralelo.
+    
+    Entrega cada fragmento en cuanto termina (no en orden):
+        {"chunk": i, "chunks": n, "offset": s, "text": str, "language": str,
+         "segments": [...]}   (timestamps ya absolutos)
+    """
+    if isinstance(audio, str):
+        with span("transcription.load_audio", file=os.path.basename(audio)):
+            audio = load_audio(audio)
+    
+    with span("transcription.vad", seconds=round(len(audio) / SAMPLE_RATE, 1)):
+        chunks = plan_segments(audio, target_seconds=segment_seconds, max_seconds=2 * segment_seconds)
+    total = len(chunks)
+    workers = max(1, min(workers or (os.cpu_count() or 1) // 2, total))
+    engine = get_backend(backend)
+    if engine.fork_safe and "fork" not in multiprocessing.get_all_start_methods():
+        workers = 1
+    print(f"✂️ {total} fragmentos de ~{segment_seconds:.0f}s, {workers} workers ({engine.name})")
+    
+    # Reservado durante toda la grabación: no se expulsa mientras los workers lo usan
+    with _REGISTRY.lease(_model_key(model_size, backend), workers):
+        if workers == 1:
+            for index, (start, end) in enumerate(chunks):
+                yield _chunk_event(*_transcribe_samples(index, start / SAMPLE_RATE, audio[start:end],
+                                                        language, model_size, backend), total)
+            return
+        
+        gc.freeze()
+        try:
+            # Los procesos forkeados reciben el audio de esta grabación al arrancar (copy-on-write);
+            # los hilos, una vista del fragmento
+            with _worker_pool(workers, engine, audio) as pool:
+                futures = [
+                    pool.submit(_transcribe_chunk, index, start, end, language, model_size, backend)
+                    if engine.fork_safe else
+                    pool.submit(_transcribe_samples, index, start / SAMPLE_RATE, audio[start:end],
+                                language, model_size, backend)
+                    for index, (start, end) in enumerate(chunks)
+                ]
+                try:
+                    for future in as_completed(futures):
+                        yield _chunk_event(*future.result(), total)
+                finally:
+                    # Si el consumidor deja de leer (o hay un error), no esperar al resto
+                    for future in futures:
+                        future.cancel()
+        finally:
+            gc.unfreeze()
+
+
+def _transcribe_chunk(index: int, start: int, end: int, language: str, model_size: str,
+                      backend: Optional[str] = None):
+    """Transcribe un fragmento del audio que recibió este worker forkeado al arrancar."""
+    return _transcribe_samples(index, start / SAMPLE_RATE, _WORKER_AUDIO[start:end], language, model_size, backend)
+
+
+def _transcribe_samples(index: int, offset: float, samples: np.ndarray, language: str, model_size: str,
+                        backend: Optional[str] = None):
+    """Transcribe un fragmento de PCM de 16 kHz que empieza en `offset` segundos."""
+    engine = get_backend(backend)
+    with _REGISTRY.use(_model_key(model_size, backend)) as model, \
+            span("transcription.chunk", chunk=index, seconds=round(len(samples) / SAMPLE_RATE, 1)):
+        result = engine.transcribe(model, samples, language)
+    return index, offset, result
+
+
+def transcribe_pcm_stream(
+    buffer: PCMBuffer,
+    language: str = "es",
+    model_size: str = "base",
+    workers: Optional[int] = None,
+    segment_seconds: float = 120,
+    backend: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Transcribe un PCMBuffer mientras se llena (subida en curso).
+    
+    Los fragmentos se cortan en silencios con el mismo criterio que
+    transcribe_audio_segments y se transcriben en paralelo en cuanto hay
+    audio suficiente; a los workers se les pasa el PCM del fragmento (no
+    pueden heredar audio que llega después del fork). Mismo formato de
+    evento que transcribe_audio_segments, con "chunks": None (el total no se
+    conoce hasta el final).
+    """
+    engine = get_backend(backend)
+    workers = max(1, workers or (os.cpu_count() or 1) // 2)
+    if engine.fork_safe and "fork" not in multiprocessing.get_all_start_methods():
+        workers = 1
+    rate = buffer.sample_rate
+    chunks = stream_segments(buffer, segment_seconds, 2 * segment_seconds)
+    
+    with _REGISTRY.lease(_model_key(model_size, backend), workers):
+        if workers == 1:
+            index = 0
+            for chunk in chunks:
+                if chunk is not None:
+                    start, end = chunk
+                    yield _chunk_event(*_transcribe_samples(index, start / rate, buffer.samples(start, end),
+                                                            language, model_size, backend), None)
+                    index += 1
+            return
+        
+        gc.freeze()
+        try:
+            with _worker_pool(workers, engine) as pool:
+                pending = set()
+                index = 0
+                try:
+                    for chunk in chunks:
+                        if chunk is not None:
+                            start, end = chunk
+                            pending.add(pool.submit(_transcribe_samples, index, start / rate,
+                                                    buffer.samples(start, end), language, model_size, backend))
+                            index += 1
+                        for future in [f for f in pending if f.done()]:
+                            pending.discard(future)
+                            yield _chunk_event(*future.result(), None)
+                    for future in as_completed(pending):
+                        yield _chunk_event(*future.result(), None)
+                finally:
+                    for future in pending:
+                        future.cancel()
+        finally:
+            gc.unfreeze()
+
+
+class LiveTranscription:
+    """
+    Transcripción en segundo plano de un StreamDecoder que sigue recibiendo bytes.
+    
+    Guarda los eventos ("segments", "result", "error") para que uno o varios
+    lectores los sigan con `events()` (p.ej. por SSE), aunque se conecten tarde.
+    `on_result(result, audio_hash)` se llama al terminar con éxito y
+    `on_error(mensaje)` si falla la decodificación o la transcripción.
+    
+    Con `lookup(audio_hash)`, en cuanto se han recibido todos los bytes (y se
+    conoce su SHA-256) se consulta la caché: si la grabación ya estaba
+    transcrita se detiene la transcripción en curso y el resultado es el de
+    la caché (con "cached": True).
+    """
+    
+    def __init__(self, decoder: StreamDecoder, language: str = "es", model_size: str = "base",
+                 workers: Optional[int] = None, segment_seconds: float = 120, backend: Optional[str] = None,
+                 on_result: Optional[Callable[[Dict, str], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None,
+                 lookup: Optional[Callable[[str], Optional[Dict]]] = None):
+        self.decoder = decoder
+        self.language = language
+        self.model_size = model_size
+        self.backend = backend
+        self.segment_seconds = segment_seconds
+        self.status = "transcribing"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self._events: List = []
+        self._condition = threading.Condition()
+        self._on_result = on_result
+        self._on_error = on_error
+        self._lookup = lookup
+        self._cached: Optional[Dict] = None
+        self._thread = threading.Thread(target=self._run, args=(workers,), daemon=True)
+        self._thread.start()
+        if lookup is not None:
+            threading.Thread(target=self._check_cache, daemon=True).start()
+    
+    def _emit(self, kind: str, payload: Dict, status: Optional[str] = None):
+        # El estado final se fija junto con su evento: un lector nunca ve "done" sin el resultado
+        with self._condition:
+            self._events.append((kind, payload))
+            if status:
+                self.status = status
+            self._condition.notify_all()
+    
+    def _check_cache(self):
+        self.decoder.input_complete.wait()
+        if self.decoder.aborted or self.done:
+            return
+        try:
+            cached = self._lookup(self.decoder.audio_hash)
+        except Exception as e:
+            print(f"⚠️ Error consultando la caché de transcripciones: {e}")
+            return
+        if cached is None:
+            return
+        with self._condition:
+            if self.done:
+                return
+            self._cached = cached
+        # _run deja de transcribir en el siguiente fragmento (o al fallar ffmpeg) y entrega el de la caché
+        self.decoder.abort()
+    
+    def _finish(self, result: Dict):
+        if self._on_result:
+            self._on_result(result, self.decoder.audio_hash)
+        self.result = result
+        self._emit("result", result, status="done")
+    
+    def _run(self, workers: Optional[int]):
+        try:
+            chunks = []
+            stream = transcribe_pcm_stream(self.decoder.buffer, self.language, self.model_size,
+                                           workers, self.segment_seconds, self.backend)
+            try:
+                for event in stream:
+                    if self._cached is not None:
+                        break
+                    chunks.append(event)
+                    self._emit("segments", event)
+            finally:
+                # Cancela los fragmentos pendientes si se corta antes del final
+                stream.close()
+            if self._cached is None:
+                self.decoder.wait()
+                result = collect_segments(chunks, self.language)
+                result["duration"] = round(self.decoder.buffer.seconds, 3)
+                self._finish(result)
+                return
+        except Exception as e:
+            if self._cached is None:
+                self._fail(e)
+                return
+        print(f"⚡ Transcripción desde caché al completar la subida ({self.decoder.audio_hash[:12]})")
+        self._finish(self._cached)
+    
+    def _fail(self, e: Exception):
+        print(f"❌ Error en transcripción en streaming: {e}")
+        self.decoder.abort()
+        self.error = str(e)
+        if self._on_error:
+            self._on_error(self.error)
+        self._emit("error", {"error": str(e)}, status="error")
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error")
+    
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        self._thread.join(timeout)
+        return self.result
+    
+    def events(self, since: int = 0, heartbeat: float = 15.0):
+        """
+        Eventos desde el número `since`, esperando los siguientes hasta el
+        final; entrega None cada `heartbeat` segundos sin novedades.
+        """
+        position = since
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._events) > position or self.done, heartbeat)
+                new = self._events[position:]
+                finished = self.done
+            if not new and not finished:
+                yield None
+                continue
+            for event in new:
+                yield event
+            position += len(new)
+            if finished and position >= len(self._events):
+                return
+
+
+def _chunk_event(index: int, offset: float, result: Dict, total: int) -> Dict:
+    return {
+        "chunk": index,
+        "chunks": total,
+        "offset": round(offset, 3),
+        "text": result["text"],
+        "language": result.get("language"),
+        "segments": offset_segments(result["segments"], offset)
+    }
+
+
+def collect_segments(events: Iterator[Dict], language: str = "es") -> Dict:
+    """Une los fragmentos de transcribe_audio_segments en un resultado como el de transcribe_audio."""
+    chunks = sorted(events, key=lambda event: event["chunk"])
+    segments = []
+    for chunk in chunks:
+        segments.extend(offset_segments(chunk["segments"], 0, first_id=len(segments)))
+    
+    result = {
+        "text": "".join(chunk["text"] for chunk in chunks),
+        "segments": segments,
+        "language": next((c["language"] for c in chunks if c["language"]), language),
+        "chunks": len(chunks)
+    }
+    print(f"✅ Transcripción completada: {len(result['text'])} caracteres ({len(chunks)} fragmentos)")
+    return result
+
+
 def transcribe_multiple(
     audio_files: List[str],
     language: str = "es",
-    model_size: str = "base"
+    model_size: str = "base",
+    workers: int = 1,
+    progress: Optional[Callable[[int, int, Dict], None]] = None,
+    segmented: str = "never",
+    segment_seconds: float = 120,
+    backend: Optional[str] = None
 ) -> List[Dict]:
     """
     Transcribe múltiples archivos de audio.
     
+    Args:
+        workers: procesos en paralelo (1 = secuencial). Requiere fork
+                 (Linux/macOS); si no está disponible se usa el modo secuencial.
+                 Con motores sin fork (CTranslate2) son hilos.
+        progress: callback(completados, total, resultado) tras cada archivo
+        segmented: "never", "auto" o "always" (ver transcribe_audio). Con
+                   fragmentos, los archivos se procesan uno a uno y los
+                   `workers` se reparten los fragmentos de cada archivo.
+        backend: motor de inferencia (ver transcribe_audio)
+    
     Returns:
         [
             {
@@ -87,30 +622,122 @@ def transcribe_multiple(
             },
             ...
         ]
+        (en el orden de `audio_files`)
     """
-    results = []
     total = len(audio_files)
+    engine = get_backend(backend)
+    can_pool = not engine.fork_safe or "fork" in multiprocessing.get_all_start_methods()
     
+    if segmented == "never" and min(workers, total) > 1 and can_pool:
+        return _transcribe_pool(audio_files, language, model_size, min(workers, total), progress, backend)
+    
+    segment_options = {"segmented": segmented, "workers": workers, "segment_seconds": segment_seconds,
+                       "backend": backend}
+    results = []
     for i, audio_file in enumerate(audio_files, 1):
         print(f"\n📁 Procesando {i}/{total}: {os.path.basename(audio_file)}")
+        entry = _transcribe_entry(audio_file, language, model_size, **segment_options)
+        results.append(entry)
+        if progress:
+            progress(i, total, entry)
+    
+    return results
+
+
+def _transcribe_entry(audio_file: str, language: str, model_size: str, **segment_options) -> Dict:
+    """Resultado de un archivo en el formato de transcribe_multiple (errores incluidos)."""
+    try:
+        result = transcribe_audio(audio_file, language, model_size, **segment_options)
         
+        return {
+            "filename": os.path.basename(audio_file),
+            "transcription": result["text"],
+            "segments": result["segments"],
+            "language": result.get("language", language),
+            "duration": result["segments"][-1]["end"] if result["segments"] else 0,
+            "cached": result.get("cached", False)
+        }
+    except Exception as e:
+        print(f"❌ Error transcribiendo {audio_file}: {e}")
+        return {
+            "filename": os.path.basename(audio_file),
+            "error": str(e),
+            "transcription": ""
+        }
+
+
+def _init_pool_worker(threads: int, audio: Optional[np.ndarray] = None):
+    """
+    Inicializa un worker forkeado: hilos de torch acotados para no sobresuscribir
+    la CPU y el audio que transcribirá por fragmentos (propio de este pool).
+    """
+    global _WORKER_AUDIO
+    import torch
+    torch.set_num_threads(threads)
+    _WORKER_AUDIO = audio
+
+
+def _fork_pool(workers: int, audio: Optional[np.ndarray] = None) -> ProcessPoolExecutor:
+    """
+    Pool de procesos forkeados (heredan los modelos cargados) con núcleos /
+    workers hilos cada uno. Con fork, `audio` llega al hijo sin serializarse.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_pool_worker,
+        initargs=(max(1, (os.cpu_count() or 1) // workers), audio)
+    )
+
+
+def _worker_pool(workers: int, engine, audio: Optional[np.ndarray] = None) -> Executor:
+    """Pool de procesos forkeados o, para motores con hilos nativos (CTranslate2), de hilos."""
+    if engine.fork_safe:
+        return _fork_pool(workers, audio)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _transcribe_pool(
+    audio_files: List[str],
+    language: str,
+    model_size: str,
+    workers: int,
+    progress: Optional[Callable[[int, int, Dict], None]],
+    backend: Optional[str] = None
+) -> List[Dict]:
+    """Transcribe en un pool de procesos forkeados que heredan el modelo cargado en el padre."""
+    total = len(audio_files)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    engine = get_backend(backend)
+    
+    print(f"⚡ Transcribiendo {total} archivos con {workers} workers × {threads} hilos ({engine.name})")
+    results: List[Optional[Dict]] = [None] * total
+    done = 0
+    
+    # Cargar (y reservar) antes del fork: los hijos heredan el modelo sin volver a leer los pesos
+    with _REGISTRY.lease(_model_key(model_size, backend), workers):
+        # Congelar los objetos existentes evita que el GC de los hijos toque (y copie) sus páginas
+        gc.freeze()
         try:
-            result = transcribe_audio(audio_file, language, model_size)
-            
-            results.append({
-                "filename": os.path.basename(audio_file),
-                "transcription": result["text"],
-                "segments": result["segments"],
-                "language": result.get("language", language),
-                "duration": result["segments"][-1]["end"] if result["segments"] else 0
-            })
-        except Exception as e:
-            print(f"❌ Error transcribiendo {audio_file}: {e}")
-            results.append({
-                "filename": os.path.basename(audio_file),
-                "error": str(e),
-                "transcription": ""
-            })
+            with _worker_pool(workers, engine) as pool:
+                futures = {
+                    pool.submit(_transcribe_entry, audio_file, language, model_size, backend=backend): index
+                    for index, audio_file in enumerate(audio_files)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        # El worker murió (p.ej. sin memoria): el resto del lote sigue
+                        entry = {"filename": os.path.basename(audio_files[index]), "error": str(e), "transcription": ""}
+                    results[index] = entry
+                    done += 1
+                    print(f"📁 {done}/{total} completado: {entry['filename']}")
+                    if progress:
+                        progress(done, total, entry)
+        finally:
+            gc.unfreeze()
     
     return results
 
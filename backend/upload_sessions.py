@@ -0,0 +1,204 @@
+"""
+Subidas reanudables por trozos para grabaciones muy grandes.
+
+Protocolo (inspirado en tus.io, sobre HTTP plano):
+
+1. `POST /uploads` con el tamaño total → `upload_id`, `offset: 0`.
+2. `PATCH /uploads/<id>` con la cabecera `Upload-Offset: <n>` y los bytes
+   siguientes en el cuerpo. Se añaden al final si `n` coincide con lo ya
+   recibido; si no, 409 con el offset correcto. Si la conexión se corta a
+   mitad de un trozo, lo que llegó cuenta.
+3. `GET /uploads/<id>` devuelve el offset actual para reanudar (tras un
+   corte del cliente o un reinicio del servidor).
+
+Los bytes se guardan en `<dir>/<id>.part` (solo anexar: el offset es el
+tamaño del archivo) y los metadatos en `<dir>/<id>.json` con escritura
+atómica. Al terminar se guarda el resultado de la transcripción y se borra el
+`.part`. Las subidas sin actividad durante `ttl_seconds` se eliminan.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    """El cliente envía bytes a partir de un offset distinto del recibido."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Offset incorrecto, el servidor tiene {offset} bytes")
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadStore:
+    """
+    Subidas en curso en un directorio.
+
+    Args:
+        directory: dónde guardar `.part` y metadatos
+        max_bytes: tamaño máximo de una subida (0 = sin límite)
+        ttl_seconds: subidas sin actividad más antiguas se eliminan en `expire()`
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 0, ttl_seconds: float = 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._upload_locks: Dict[str, threading.Lock] = {}
+
+    def _path(self, upload_id: str, suffix: str) -> str:
+        if not UPLOAD_ID_PATTERN.match(upload_id or ""):
+            raise UploadNotFound(upload_id)
+        return os.path.join(self.directory, f"{upload_id}{suffix}")
+
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def _save_meta(self, meta: Dict[str, Any]):
+        """Escritura atómica de los metadatos."""
+        meta["updated_at"] = datetime.now().isoformat()
+        path = self._path(meta["upload_id"], ".json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _load_meta(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(upload_id, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadNotFound(upload_id)
+
+    def _offset(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._path(upload_id, ".part"))
+        except OSError:
+            return 0
+
+    def create(self, size: int, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if size <= 0:
+            raise ValueError("El tamaño de la subida debe ser positivo")
+        if self.max_bytes and size > self.max_bytes:
+            raise UploadTooLarge(f"La subida supera el máximo de {self.max_bytes} bytes")
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        open(self._path(upload_id, ".part"), "wb").close()
+        meta = {
+            "upload_id": upload_id,
+            "size": size,
+            "status": "receiving",
+            "metadata": metadata or {},
+            "created_at": datetime.now().isoformat()
+        }
+        self._save_meta(meta)
+        return self.get(upload_id)
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        meta = self._load_meta(upload_id)
+        meta["offset"] = meta["size"] if meta["status"] != "receiving" else self._offset(upload_id)
+        meta["complete"] = meta["offset"] >= meta["size"]
+        return meta
+
+    def append(self, upload_id: str, offset: int, chunks: Iterable[bytes],
+               on_data=None, on_start=None) -> Dict[str, Any]:
+        """
+        Añade `chunks` a partir de `offset` (que debe coincidir con lo recibido).
+        `on_start()` se llama con la subida bloqueada antes de escribir y
+        `on_data(bytes)` recibe cada bloque ya escrito (p.ej. para
+        decodificarlo en streaming). Si la lectura de `chunks` falla, lo
+        escrito se conserva.
+        """
+        lock = self._upload_lock(upload_id)
+        if not lock.acquire(blocking=False):
+            # Otro PATCH de la misma subida sigue en curso
+            raise UploadOffsetMismatch(self._offset(upload_id))
+        try:
+            meta = self._load_meta(upload_id)
+            current = self._offset(upload_id)
+            if meta["status"] != "receiving" or offset != current:
+                raise UploadOffsetMismatch(current if meta["status"] == "receiving" else meta["size"])
+            if on_start:
+                on_start()
+            with open(self._path(upload_id, ".part"), "ab") as f:
+                try:
+                    for chunk in chunks:
+                        if current + len(chunk) > meta["size"]:
+                            raise UploadTooLarge("Se recibieron más bytes que el tamaño declarado")
+                        f.write(chunk)
+                        f.flush()
+                        current += len(chunk)
+                        if on_data:
+                            on_data(chunk)
+                finally:
+                    os.utime(self._path(upload_id, ".json"))
+            return self.get(upload_id)
+        finally:
+            lock.release()
+
+    def read(self, upload_id: str, block_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Bytes ya recibidos (para volver a decodificar tras un reinicio)."""
+        with open(self._path(upload_id, ".part"), "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                yield block
+
+    def update(self, upload_id: str, **fields) -> Dict[str, Any]:
+        meta = self._load_meta(upload_id)
+        meta.update(fields)
+        self._save_meta(meta)
+        return self.get(upload_id)
+
+    def finish(self, upload_id: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> Dict[str, Any]:
+        """Guarda el resultado (o el error) y libera los bytes de audio."""
+        meta = self.update(upload_id, status="error" if error else "done", result=result, error=error)
+        try:
+            os.remove(self._path(upload_id, ".part"))
+        except OSError:
+            pass
+        return meta
+
+    def delete(self, upload_id: str):
+        for suffix in (".part", ".json"):
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except OSError:
+                pass
+        with self._lock:
+            self._upload_locks.pop(upload_id, None)
+
+    def expire(self) -> int:
+        """Elimina las subidas sin actividad durante más de `ttl_seconds`."""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.directory):
+            upload_id, ext = os.path.splitext(name)
+            if ext != ".json" or not UPLOAD_ID_PATTERN.match(upload_id):
+                continue
+            try:
+                stale = os.path.getmtime(os.path.join(self.directory, name)) < cutoff
+            except OSError:
+                continue
+            if stale:
+                self.delete(upload_id)
+                removed += 1
+        return removed
@@ -0,0 +1,288 @@
+"""
+Métricas de validación calculadas localmente (NumPy) a partir de phase1_codes.
+
+Sustituye a los números que antes inventaba el LLM en la validación final:
+
+- Saturación: códigos nuevos por entrevista añadida, en el orden real y sobre
+  permutaciones aleatorias del orden (bandas p5-p95 y probabilidad de saturar).
+  Se considera alcanzada cuando las últimas `window` entrevistas aportan como
+  mucho `threshold` del codebook final.
+- Cobertura por dimensión: códigos distintos, aplicaciones y participantes
+  con al menos un código en cada dimensión.
+- Acuerdo entre ejecuciones de codificación (mismas entrevistas codificadas
+  varias veces): kappa de Cohen por pares y kappa de Fleiss sobre la presencia
+  de cada código en cada participante.
+
+Todo es determinista para una misma semilla.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+NO_DIMENSION = "Sin dimensión"
+
+
+def analysis_codes(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Códigos de un análisis individual (phase1_codes.codes o, en formatos antiguos, codes)."""
+    codes = (analysis.get("phase1_codes") or {}).get("codes")
+    if codes is None:
+        codes = analysis.get("codes", [])
+    return [c for c in codes if isinstance(c, dict) and c.get("code")]
+
+
+def normalize_code(label: str) -> str:
+    return re.sub(r"\s+", " ", str(label)).strip().lower()
+
+
+def incidence_matrix(analyses: Sequence[Dict[str, Any]]) -> Tuple[List[str], List[str], List[str], np.ndarray]:
+    """
+    Matriz participantes × códigos (bool) en el orden de `analyses`.
+
+    Returns:
+        (participantes, códigos normalizados, dimensión de cada código, matriz)
+    """
+    participants, codes, dimensions = [], [], []
+    index: Dict[str, int] = {}
+    rows: List[List[int]] = []
+    for i, analysis in enumerate(analyses):
+        participants.append(str(analysis.get("participant_id", f"#{i + 1}")))
+        row = []
+        for code in analysis_codes(analysis):
+            key = normalize_code(code["code"])
+            if key not in index:
+                index[key] = len(codes)
+                codes.append(key)
+                dimensions.append(str(code.get("dimension") or NO_DIMENSION))
+            row.append(index[key])
+        rows.append(row)
+
+    matrix = np.zeros((len(participants), len(codes)), dtype=bool)
+    for i, row in enumerate(rows):
+        matrix[i, row] = True
+    return participants, codes, dimensions, matrix
+
+
+def new_codes_per_position(matrix: np.ndarray, orders: np.ndarray) -> np.ndarray:
+    """
+    Códigos nuevos aportados en cada posición para uno o varios órdenes.
+
+    Args:
+        matrix: participantes × códigos (bool)
+        orders: (k, participantes) índices de participante en el orden de entrada
+
+    Returns:
+        (k, participantes) número de códigos que aparecen por primera vez en cada posición
+    """
+    seen = np.logical_or.accumulate(matrix[orders], axis=1)   # k × posiciones × códigos
+    cumulative = seen.sum(axis=2)
+    return np.diff(cumulative, axis=1, prepend=0)
+
+
+def _saturated(new_codes: np.ndarray, total: int, window: int, threshold: float) -> np.ndarray:
+    """Por cada curva: ¿las últimas `window` posiciones aportan <= threshold del total?"""
+    if total == 0 or new_codes.shape[-1] <= window:
+        return np.zeros(new_codes.shape[:-1], dtype=bool)
+    return new_codes[..., -window:].sum(axis=-1) <= threshold * total
+
+
+def saturation_analysis(matrix: np.ndarray, participants: Sequence[str], permutations: int = 200,
+                        window: int = 3, threshold: float = 0.05, seed: int = 0,
+                        batch_size: int = 64) -> Dict[str, Any]:
+    """Curvas de saturación en el orden de llegada y sobre permutaciones aleatorias."""
+    n, total = matrix.shape
+    if n == 0:
+        return {"achieved": False, "percentage": 0, "total_codes": 0, "interviews": 0}
+
+    observed = new_codes_per_position(matrix, np.arange(n)[None, :])[0]
+    achieved = bool(_saturated(observed, total, window, threshold))
+    found_before_window = int(observed[:-window].sum()) if n > window else 0
+
+    result = {
+        "achieved": achieved,
+        "percentage": round(100 * found_before_window / total, 1) if total else 0,
+        "criterion": {"window": window, "threshold": threshold},
+        "interviews": n,
+        "total_codes": total,
+        "observed": {
+            "order": list(participants),
+            "new_codes": observed.tolist(),
+            "cumulative_codes": np.cumsum(observed).tolist()
+        }
+    }
+
+    if permutations > 0 and n > 1:
+        rng = np.random.default_rng(seed)
+        curves = []
+        for start in range(0, permutations, batch_size):
+            k = min(batch_size, permutations - start)
+            orders = np.argsort(rng.random((k, n)), axis=1)
+            curves.append(new_codes_per_position(matrix, orders))
+        new_codes = np.concatenate(curves)
+        cumulative = np.cumsum(new_codes, axis=1)
+        result["permutations"] = {
+            "count": permutations,
+            "seed": seed,
+            "mean_new_codes": np.round(new_codes.mean(axis=0), 3).tolist(),
+            "cumulative_p5": np.percentile(cumulative, 5, axis=0).tolist(),
+            "cumulative_mean": np.round(cumulative.mean(axis=0), 3).tolist(),
+            "cumulative_p95": np.percentile(cumulative, 95, axis=0).tolist(),
+            "saturation_probability": round(float(_saturated(new_codes, total, window, threshold).mean()), 3)
+        }
+    return result
+
+
+def dimension_coverage(matrix: np.ndarray, dimensions: Sequence[str],
+                       analyses: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cobertura por dimensión: códigos distintos, aplicaciones y participantes cubiertos."""
+    n = matrix.shape[0]
+    applications: Dict[str, int] = {}
+    for analysis in analyses:
+        for code in analysis_codes(analysis):
+            dimension = str(code.get("dimension") or NO_DIMENSION)
+            applications[dimension] = applications.get(dimension, 0) + 1
+
+    names = sorted(set(dimensions))
+    dims = np.array(dimensions)
+    coverage = {}
+    for name in names:
+        columns = matrix[:, dims == name]
+        covered = int(columns.any(axis=1).sum())
+        coverage[name] = {
+            "codes": int(columns.shape[1]),
+            "applications": applications.get(name, 0),
+            "participants": covered,
+            "participant_coverage": round(covered / n, 3) if n else 0,
+            "codes_per_participant": round(float(columns.sum(axis=1).mean()), 2) if n else 0
+        }
+    return coverage
+
+
+def cohen_kappa(a: np.ndarray, b: np.ndarray) -> Optional[float]:
+    """Kappa de Cohen entre dos codificaciones binarias (mismas celdas)."""
+    a = np.asarray(a, dtype=bool).ravel()
+    b = np.asarray(b, dtype=bool).ravel()
+    if a.size == 0:
+        return None
+    observed = np.mean(a == b)
+    expected = a.mean() * b.mean() + (1 - a.mean()) * (1 - b.mean())
+    if expected == 1:
+        return 1.0 if observed == 1 else 0.0
+    return float((observed - expected) / (1 - expected))
+
+
+def fleiss_kappa(ratings: np.ndarray) -> Optional[float]:
+    """
+    Kappa de Fleiss para codificaciones binarias.
+
+    Args:
+        ratings: (codificadores, celdas) bool
+    """
+    ratings = np.asarray(ratings, dtype=bool)
+    raters, items = ratings.shape
+    if raters < 2 or items == 0:
+        return None
+    positive = ratings.sum(axis=0)
+    counts = np.stack([raters - positive, positive], axis=1)          # celdas × categorías
+    p_item = ((counts * (counts - 1)).sum(axis=1)) / (raters * (raters - 1))
+    p_category = counts.sum(axis=0) / (items * raters)
+    observed, expected = p_item.mean(), (p_category ** 2).sum()
+    if expected == 1:
+        return 1.0 if observed == 1 else 0.0
+    return float((observed - expected) / (1 - expected))
+
+
+def align_runs(runs: Sequence[Sequence[Dict[str, Any]]]) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Alinea varias ejecuciones de codificación sobre los participantes comunes
+    y la unión de códigos. Devuelve (participantes, códigos, matriz runs × P × C).
+    """
+    by_run = [{str(a.get("participant_id")): a for a in run} for run in runs]
+    participants = [pid for pid in by_run[0] if all(pid in run for run in by_run[1:])]
+    codes: List[str] = []
+    index: Dict[str, int] = {}
+    for run in by_run:
+        for pid in participants:
+            for code in analysis_codes(run[pid]):
+                key = normalize_code(code["code"])
+                if key not in index:
+                    index[key] = len(codes)
+                    codes.append(key)
+
+    tensor = np.zeros((len(runs), len(participants), len(codes)), dtype=bool)
+    for r, run in enumerate(by_run):
+        for p, pid in enumerate(participants):
+            tensor[r, p, [index[normalize_code(c["code"])] for c in analysis_codes(run[pid])]] = True
+    return participants, codes, tensor
+
+
+def agreement(runs: Sequence[Sequence[Dict[str, Any]]], min_kappa: float = 0.6) -> Dict[str, Any]:
+    """Acuerdo entre ejecuciones: kappa de Cohen por pares (y media) y kappa de Fleiss."""
+    participants, codes, tensor = align_runs(runs)
+    cells = tensor.reshape(tensor.shape[0], -1)
+    pairs = []
+    for i in range(len(runs)):
+        for j in range(i + 1, len(runs)):
+            kappa = cohen_kappa(cells[i], cells[j])
+            pairs.append({"runs": [i, j], "kappa": None if kappa is None else round(kappa, 4)})
+    valid = [p["kappa"] for p in pairs if p["kappa"] is not None]
+    mean_kappa = round(float(np.mean(valid)), 4) if valid else None
+    fleiss = fleiss_kappa(cells)
+    return {
+        "runs": len(runs),
+        "participants": len(participants),
+        "codes": len(codes),
+        "cohen_kappa_pairs": pairs,
+        "cohen_kappa_mean": mean_kappa,
+        "fleiss_kappa": None if fleiss is None else round(fleiss, 4),
+        "passed": mean_kappa is not None and mean_kappa >= min_kappa,
+        "threshold": min_kappa
+    }
+
+
+def compute_validation_metrics(analyses: Sequence[Dict[str, Any]],
+                               coding_runs: Optional[Dict[str, Sequence[Sequence[Dict[str, Any]]]]] = None,
+                               permutations: int = 200, window: int = 3, threshold: float = 0.05,
+                               min_kappa: float = 0.6, seed: int = 0) -> Dict[str, Any]:
+    """
+    Saturación, cobertura y consistencia a partir de los análisis de Fase 1.
+
+    Args:
+        coding_runs: codificaciones adicionales de las mismas entrevistas, por
+            tipo de prueba: {"intercoder": [run, ...], "intracoder": [run, ...]}
+            (p.ej. otro modelo / la misma configuración relanzada). El acuerdo
+            se calcula entre `analyses` y esas ejecuciones; las pruebas sin
+            ejecuciones quedan como no disponibles (`passed` y `score` None).
+    """
+    valid = [a for a in analyses if "error" not in a]
+    participants, codes, dimensions, matrix = incidence_matrix(valid)
+
+    result = {
+        "engine": "local",
+        "saturation": saturation_analysis(matrix, participants, permutations, window, threshold, seed),
+        "coverage": dimension_coverage(matrix, dimensions, valid),
+        "consistency_tests": {},
+        "agreement": {}
+    }
+
+    for test in ("intercoder", "intracoder"):
+        runs = [[a for a in run if "error" not in a] for run in (coding_runs or {}).get(test) or []]
+        if not runs:
+            # Sin ejecuciones repetidas no hay prueba: ni aprobada ni suspendida
+            result["consistency_tests"][test] = {
+                "passed": None, "score": None, "available": False,
+                "reason": "Se necesitan al menos dos ejecuciones de codificación"
+            }
+            continue
+        stats = agreement([valid, *runs], min_kappa)
+        result["agreement"][test] = stats
+        result["consistency_tests"][test] = {
+            "passed": stats["passed"],
+            "score": stats["cohen_kappa_mean"] if stats["cohen_kappa_mean"] is not None else 0,
+            "available": True,
+            "method": "cohen_kappa",
+            "fleiss_kappa": stats["fleiss_kappa"]
+        }
+    return result
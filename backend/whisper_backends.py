@@ -0,0 +1,172 @@
+"""
+Motores de inferencia Whisper intercambiables (CPU).
+
+- "openai": el modelo de referencia de `openai-whisper` en PyTorch (fp32,
+  `fp16=False`). Sus pesos se pueden compartir copy-on-write entre procesos
+  forkeados.
+- "ctranslate2": `faster-whisper` (CTranslate2) con pesos cuantizados a int8
+  por defecto; en CPU suele ser varias veces más rápido con un WER
+  equivalente. CTranslate2 mantiene su propio pool de hilos nativo, que no
+  sobrevive a un fork: el paralelismo se hace con hilos de Python (liberan el
+  GIL durante la inferencia) y `num_workers` réplicas del modelo.
+
+Ambos devuelven el formato de `whisper.transcribe`:
+    {"text": str, "segments": [{"id", "start", "end", "text", ...}], "language": str}
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import whisper
+    OPENAI_WHISPER_AVAILABLE = True
+except ImportError:
+    whisper = None
+    OPENAI_WHISPER_AVAILABLE = False
+
+try:
+    import faster_whisper
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    faster_whisper = None
+    FASTER_WHISPER_AVAILABLE = False
+
+if not (OPENAI_WHISPER_AVAILABLE or FASTER_WHISPER_AVAILABLE):
+    raise ImportError("Ningún motor Whisper instalado (openai-whisper o faster-whisper)")
+
+
+SAMPLE_RATE = 16000
+
+# Parámetros aproximados de cada tamaño (para estimar la RAM antes de cargar)
+PARAMETER_COUNTS = {
+    "tiny": 39e6, "base": 74e6, "small": 244e6, "medium": 769e6,
+    "large": 1550e6, "large-v1": 1550e6, "large-v2": 1550e6, "large-v3": 1550e6, "turbo": 809e6
+}
+
+# Bytes por parámetro según la cuantización de CTranslate2
+COMPUTE_TYPE_BYTES = {"int8": 1, "int8_float32": 1, "int8_float16": 1, "int8_bfloat16": 1,
+                      "int16": 2, "float16": 2, "bfloat16": 2, "float32": 4}
+
+
+def load_audio(path: str):
+    """Decodifica un archivo a PCM mono float32 de 16 kHz con el motor que esté instalado."""
+    if OPENAI_WHISPER_AVAILABLE:
+        return whisper.load_audio(path)
+    return faster_whisper.decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+class OpenAIWhisperBackend:
+    """Modelo de referencia PyTorch (fp32 en CPU)."""
+
+    name = "openai"
+    fork_safe = True
+
+    def cache_options(self) -> Dict[str, Any]:
+        return {"fp16": False}
+
+    def load(self, model_size: str, workers: int = 1):
+        return whisper.load_model(model_size)
+
+    def slots(self, workers: int = 1) -> int:
+        """Inferencias concurrentes por modelo: una (cada llamada ya usa todos los hilos de torch)."""
+        return 1
+
+    def estimate_bytes(self, model_size: str, workers: int = 1) -> int:
+        return int(PARAMETER_COUNTS.get(model_size, PARAMETER_COUNTS["large"]) * 4)
+
+    def model_bytes(self, model, model_size: str) -> int:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def transcribe(self, model, audio, language: str) -> Dict:
+        return model.transcribe(audio, language=language, fp16=False)
+
+
+class CTranslate2WhisperBackend:
+    """faster-whisper sobre CTranslate2, cuantizado (int8 por defecto)."""
+
+    name = "ctranslate2"
+    fork_safe = False
+
+    def __init__(self, compute_type: str = "int8", beam_size: int = 5):
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+
+    def cache_options(self) -> Dict[str, Any]:
+        return {"compute_type": self.compute_type, "beam_size": self.beam_size}
+
+    def load(self, model_size: str, workers: int = 1):
+        # `workers` réplicas para llamadas concurrentes desde varios hilos, núcleos repartidos entre ellas
+        return faster_whisper.WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=max(1, (os.cpu_count() or 1) // workers),
+            num_workers=workers
+        )
+
+    def slots(self, workers: int = 1) -> int:
+        """Una inferencia concurrente por réplica."""
+        return workers
+
+    def estimate_bytes(self, model_size: str, workers: int = 1) -> int:
+        # Las réplicas de CTranslate2 en CPU comparten los pesos
+        parameters = PARAMETER_COUNTS.get(model_size, PARAMETER_COUNTS["large"])
+        return int(parameters * COMPUTE_TYPE_BYTES.get(self.compute_type, 4))
+
+    def model_bytes(self, model, model_size: str) -> int:
+        return self.estimate_bytes(model_size)
+
+    def transcribe(self, model, audio, language: str) -> Dict:
+        segments, info = model.transcribe(audio, language=language, beam_size=self.beam_size)
+        # `segments` es un generador: la decodificación ocurre al recorrerlo
+        converted: List[Dict] = [
+            {
+                "id": i,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob
+            }
+            for i, segment in enumerate(segments)
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in converted),
+            "segments": converted,
+            "language": info.language
+        }
+
+
+BACKENDS = {}
+if OPENAI_WHISPER_AVAILABLE:
+    BACKENDS["openai"] = OpenAIWhisperBackend()
+if FASTER_WHISPER_AVAILABLE:
+    BACKENDS["ctranslate2"] = CTranslate2WhisperBackend()
+
+DEFAULT_BACKEND = "openai" if OPENAI_WHISPER_AVAILABLE else "ctranslate2"
+
+
+def available_backends() -> List[str]:
+    return list(BACKENDS)
+
+
+def configure_backends(default: Optional[str] = None, compute_type: Optional[str] = None) -> None:
+    """Fija el motor por defecto y el tipo de cuantización de CTranslate2."""
+    global DEFAULT_BACKEND
+    if compute_type and FASTER_WHISPER_AVAILABLE:
+        BACKENDS["ctranslate2"].compute_type = compute_type
+    if default:
+        DEFAULT_BACKEND = get_backend(default).name
+
+
+def get_backend(name: Optional[str] = None):
+    """Motor por nombre (None = el de por defecto). ValueError si no está instalado."""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Motor Whisper '{name}' no disponible (instalados: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
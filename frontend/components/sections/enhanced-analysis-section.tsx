@@ -77,8 +77,8 @@ interface PhenomFlowAnalysis {
             percentage: number
         }
         consistency_tests: {
-            intercoder: { passed: boolean; score: number }
-            intracoder: { passed: boolean; score: number }
+            intercoder: { passed: boolean | null; score: number | null; available?: boolean }
+            intracoder: { passed: boolean | null; score: number | null; available?: boolean }
         }
         checklist_score: number
     }
@@ -100,6 +100,8 @@ export function EnhancedAnalysisSection() {
     const [contextData, setContextData] = useState<any>(null)
     const [showContextForm, setShowContextForm] = useState(true)
     const [error, setError] = useState<string | null>(null)
+    const [liveCodes, setLiveCodes] = useState<Array<{ code: string; dimension?: string; verbatim?: string }>>([])
+    const [liveNucleus, setLiveNucleus] = useState<string>("")
 
     const handleContextSubmit = (data: any) => {
         setContextData(data)
@@ -115,11 +117,14 @@ export function EnhancedAnalysisSection() {
         setIsLoading(true)
         setError(null)
         setResult(null)
+        setLiveCodes([])
+        setLiveNucleus("")
 
         try {
             setLoadingStage("Enviando texto al backend...")
 
-            const response = await fetch("http://localhost:8000/analyze/enhanced", {
+            // Server-Sent Events: los códigos llegan a medida que el LLM los genera
+            const response = await fetch("http://localhost:8000/analyze/enhanced/stream", {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json",
@@ -130,15 +135,50 @@ export function EnhancedAnalysisSection() {
                 }),
             })
 
-            if (!response.ok) {
+            if (!response.ok || !response.body) {
                 const errorData = await response.json()
                 throw new Error(errorData.error || "Error en el servidor")
             }
 
             setLoadingStage("Procesando análisis fenomenológico...")
-            const data = await response.json()
 
-            setResult(data)
+            const reader = response.body.getReader()
+            const decoder = new TextDecoder()
+            let buffer = ""
+            let finalResult: PhenomFlowAnalysis | null = null
+
+            while (true) {
+                const { done, value } = await reader.read()
+                if (done) break
+                buffer += decoder.decode(value, { stream: true })
+
+                const events = buffer.split("\n\n")
+                buffer = events.pop() || ""
+
+                for (const rawEvent of events) {
+                    const eventName = rawEvent.match(/^event: (.*)$/m)?.[1]
+                    const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1]
+                    if (!eventName || dataLine === undefined) continue
+                    const payload = JSON.parse(dataLine)
+
+                    if (eventName === "code") {
+                        setLiveCodes((codes) => [...codes, payload])
+                        setLoadingStage("Recibiendo códigos...")
+                    } else if (eventName === "phenomenon_nucleus") {
+                        setLiveNucleus(payload)
+                    } else if (eventName === "result") {
+                        finalResult = payload
+                    } else if (eventName === "error") {
+                        throw new Error(payload.error || "Error en el servidor")
+                    }
+                }
+            }
+
+            if (!finalResult) {
+                throw new Error("La conexión terminó antes de recibir el análisis completo")
+            }
+
+            setResult(finalResult)
             setLoadingStage("")
         } catch (error: any) {
             console.error("Error analyzing text:", error)
@@ -398,13 +438,17 @@ export function EnhancedAnalysisSection() {
                     {/* Consistencia Intercoder */}
                     <div className="bg-foreground/5 p-4 rounded-lg text-center">
                         <div className="text-3xl font-bold mb-2">
-                            {result.validation.consistency_tests.intercoder.passed ? "✓" : "○"}
+                            {result.validation.consistency_tests.intercoder.passed === null
+                                ? "—"
+                                : result.validation.consistency_tests.intercoder.passed ? "✓" : "○"}
                         </div>
                         <div className="text-sm font-mono text-foreground/80">
                             Intercoder
                         </div>
                         <div className="text-xs text-foreground/50 mt-1">
-                            {(result.validation.consistency_tests.intercoder.score * 100).toFixed(0)}%
+                            {result.validation.consistency_tests.intercoder.score === null
+                                ? "sin réplicas"
+                                : `${(result.validation.consistency_tests.intercoder.score * 100).toFixed(0)}%`}
                         </div>
                     </div>
 
@@ -509,6 +553,28 @@ export function EnhancedAnalysisSection() {
                                 )}
                             </div>
 
+                            {/* Resultados parciales en streaming */}
+                            {isLoading && (liveCodes.length > 0 || liveNucleus) && (
+                                <div className="mt-4 p-4 bg-foreground/5 rounded-lg border-l-4 border-[#e19136] space-y-3">
+                                    {liveNucleus && (
+                                        <div className="text-sm text-foreground/80">{liveNucleus}</div>
+                                    )}
+                                    <div className="text-xs font-mono text-foreground/50">
+                                        {liveCodes.length} códigos recibidos
+                                    </div>
+                                    <div className="space-y-1 max-h-64 overflow-y-auto">
+                                        {liveCodes.map((code, i) => (
+                                            <div key={i} className="text-xs font-mono text-foreground/70">
+                                                <span className="text-[#e19136]">{code.dimension}</span> · {code.code}
+                                                {code.verbatim && (
+                                                    <span className="text-foreground/50"> — "{code.verbatim}"</span>
+                                                )}
+                                            </div>
+                                        ))}
+                                    </div>
+                                </div>
+                            )}
+
                             {/* Error message */}
                             {error && (
                                 <div className="mt-4 p-4 bg-red-500/10 border border-red-500/20 rounded-lg text-sm text-red-500">
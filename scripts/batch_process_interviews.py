@@ -1,18 +1,31 @@
-
 import os
 import sys
 import json
 import logging
+import argparse
+import threading
+from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 # Add project root to path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, "backend"))
 
 # Import backend modules
-from backend.service import analyze_individual_interview
+from backend.service import (
+    analyze_individual_interview, build_individual_prompt, parse_individual_response,
+    build_batch_request, batch_result_text, batch_result_truncated, phase1_single_request,
+    client, USE_CLAUDE, MODEL, LLM_CACHE,
+    INDIVIDUAL_SYSTEM_MESSAGE, PROMPT_PARTE_1, LLM_RATE_LIMITER, phase1_version
+)
+from backend.pipeline_dag import hash_inputs
+from backend.batch_jobs import (
+    submit_batch, wait_for_batch, iter_batch_results, load_job_state, save_job_state
+)
 from backend.document_parser import process_document, parse_docx
 from backend.protocol_parser import parse_protocol
 from dotenv import load_dotenv
@@ -27,18 +40,34 @@ logging.basicConfig(
     ]
 )
 
-def main():
-    # Load env vars
-    load_dotenv(os.path.join(project_root, ".env"))
+PROTOCOL_FILENAME = "Protocolo_Entrevista_Microfenomenologica_LIMENS.docx"
+MANIFEST_FILENAME = "manifest.json"
 
-    data_dir = os.path.join(project_root, "data", "entrevistas_limpias")
-    results_dir = os.path.join(project_root, "analysis_results")
-    os.makedirs(results_dir, exist_ok=True)
 
-    # 1. Load Protocol
-    protocol_path = os.path.join(data_dir, "Protocolo_Entrevista_Microfenomenologica_LIMENS.docx")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch processing of interview transcripts (Phase 1)")
+    parser.add_argument("--mode", choices=["sync", "batch"], default="sync",
+                        help="sync: one request per interview; batch: one provider batch job for all pending interviews")
+    parser.add_argument("--poll-interval", type=float, default=30,
+                        help="Initial polling interval for batch jobs (seconds)")
+    parser.add_argument("--max-poll-interval", type=float, default=600,
+                        help="Maximum polling interval for batch jobs (seconds)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "4")),
+                        help="Interviews analyzed in parallel in sync mode, and in batch mode for the ones sent "
+                             "through the sync path (all workers share one rate limiter)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess every interview even if its manifest entry is up to date")
+    parser.add_argument("--data-dir", default=os.path.join(project_root, "data", "entrevistas_limpias"),
+                        help="Folder with the .docx interviews (and the protocol)")
+    parser.add_argument("--results-dir", default=os.path.join(project_root, "analysis_results"),
+                        help="Folder where results.json, per-participant JSON and the manifest are written")
+    return parser.parse_args()
+
+
+def load_protocol(data_dir):
+    protocol_path = os.path.join(data_dir, PROTOCOL_FILENAME)
     protocol_data = None
-    
+
     if os.path.exists(protocol_path):
         logging.info(f"Loading protocol from {protocol_path}")
         try:
@@ -51,10 +80,13 @@ def main():
     else:
         logging.warning("Protocol file not found. Proceeding without protocol.")
 
-    # 1.5 Load Context
+    return protocol_data
+
+
+def load_context():
     context_path = os.path.join(project_root, "data", "demo", "context.json")
     context_data = None
-    
+
     if os.path.exists(context_path):
         logging.info(f"Loading context from {context_path}")
         try:
@@ -66,58 +98,343 @@ def main():
     else:
         logging.warning("Context file not found. Proceeding without context.")
 
-    # 2. List files to process
+    return context_data
+
+
+def list_interviews(data_dir):
     files = [f for f in os.listdir(data_dir) if f.endswith(".docx") or f.endswith(".doc")]
     # Exclude protocol itself if it was in the list
-    if "Protocolo_Entrevista_Microfenomenologica_LIMENS.docx" in files:
-        files.remove("Protocolo_Entrevista_Microfenomenologica_LIMENS.docx")
-    
+    if PROTOCOL_FILENAME in files:
+        files.remove(PROTOCOL_FILENAME)
+
     files.sort()
-    
+    return files
+
+
+def load_interview_text(data_dir, filename):
+    # process_document returns {raw_text, structure, analysis_ready_text, ...}
+    file_path = os.path.join(data_dir, filename)
+    file_type = "docx" if filename.endswith(".docx") else "doc"
+    doc_data = process_document(file_path, file_type)
+
+    # Use analysis_ready_text which filters participant text if structure found
+    return doc_data["analysis_ready_text"]
+
+
+def save_result(result_path, analysis_result):
+    # Write to a temp file and rename so a crash never leaves a half-written result
+    tmp_path = f"{result_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(analysis_result, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, result_path)
+
+
+class Manifest:
+    """
+    analysis_results/manifest.json: one entry per participant with the hash of
+    everything that determines its Phase 1 result (transcript, context,
+    protocol, prompt and model). An interview is reprocessed only when its
+    hash changed, its last run failed or its result file is missing.
+    Shared by the worker threads; every update is written atomically.
+    """
+
+    def __init__(self, results_dir):
+        self.results_dir = results_dir
+        self.path = os.path.join(results_dir, MANIFEST_FILENAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("entries", {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    def is_stale(self, participant_id, content_hash):
+        entry = self.entries.get(participant_id)
+        return (
+            entry is None
+            or entry.get("hash") != content_hash
+            or entry.get("status") != "ok"
+            or not os.path.exists(os.path.join(self.results_dir, f"{participant_id}.json"))
+        )
+
+    def record(self, participant_id, filename, content_hash, status, error=None):
+        with self.lock:
+            entry = {
+                "filename": filename,
+                "hash": content_hash,
+                "status": status,
+                "updated_at": datetime.now().isoformat()
+            }
+            if error:
+                entry["error"] = error
+            self.entries[participant_id] = entry
+            self._write()
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"prompt_version": prompt_version(), "entries": self.entries},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def prompt_version():
+    # Versión de la plantilla (PHASE1_PROMPT_VERSION) y configuración de chunking/reparación
+    # de JSON incluidas: cambiar cualquiera reprocesa las entrevistas, como los nodos del DAG
+    return phase1_version()
+
+
+def content_hash(interview_text, context_data, protocol_data):
+    return hash_inputs({
+        "text": interview_text,
+        "context": context_data,
+        "protocol": protocol_data,
+        **prompt_version()
+    })
+
+
+def process_interview(filename, data_dir, results_dir, context_data, protocol_data, manifest, force=False):
+    """Analyze one interview if its manifest entry is stale. Returns "skipped", "ok" or "error"."""
+    participant_id = os.path.splitext(filename)[0]
+    interview_text = load_interview_text(data_dir, filename)
+    digest = content_hash(interview_text, context_data, protocol_data)
+
+    if not force and not manifest.is_stale(participant_id, digest):
+        logging.info(f"Skipping {participant_id} (up to date)")
+        return "skipped"
+
+    logging.info(f"Processing {participant_id}...")
+    analysis_result = analyze_individual_interview(
+        text=interview_text,
+        participant_id=participant_id,
+        context=context_data,
+        protocol=protocol_data
+    )
+
+    if "error" in analysis_result:
+        # Keep the previous result (if any); the entry stays stale and is retried next run
+        manifest.record(participant_id, filename, digest, "error", error=str(analysis_result["error"]))
+        logging.error(f"Error processing {participant_id}: {analysis_result['error']}")
+        return "error"
+
+    save_result(os.path.join(results_dir, f"{participant_id}.json"), analysis_result)
+    manifest.record(participant_id, filename, digest, "ok")
+    logging.info(f"Successfully processed {participant_id}")
+    return "ok"
+
+
+def run_sync(files, data_dir, results_dir, context_data, protocol_data, workers=4, force=False):
+    """
+    Analyze stale interviews with a pool of worker threads. All workers go
+    through the backend's shared rate limiter (requests/min and tokens/min),
+    so adding workers raises throughput only up to the account limits.
+    """
+    manifest = Manifest(results_dir)
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+
+    logging.info(f"Running with {workers} workers"
+                 + (f" (rate limiter: {LLM_RATE_LIMITER.snapshot()})" if LLM_RATE_LIMITER is not None else ""))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(process_interview, filename, data_dir, results_dir,
+                        context_data, protocol_data, manifest, force): filename
+            for filename in files
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing Interviews"):
+            try:
+                counts[future.result()] += 1
+            except Exception as e:
+                # Continue with the other files even if one fails
+                counts["error"] += 1
+                logging.error(f"Error processing {futures[future]}: {str(e)}")
+
+    logging.info(f"Processed {counts['ok']}, skipped {counts['skipped']} up to date, {counts['error']} failed")
+
+
+def run_batch(files, data_dir, results_dir, context_data, protocol_data, args):
+    """
+    Submit every stale interview as one provider batch job, persist the job id
+    and write analysis_results/<pid>.json as the results are downloaded.
+    Re-running the script resumes polling an unfinished job instead of resubmitting.
+
+    A batch request is sent as-is: no chunking, token budget or continuation
+    when the output hits max_tokens. Interviews that need any of those go
+    through the synchronous path instead (in worker threads while the batch
+    job runs), and so do batch results that came back truncated. Every
+    interview gets its manifest entry as soon as its own result is written.
+    """
+    state_path = os.path.join(results_dir, "batch_job.json")
+    state = load_job_state(state_path)
+    manifest = Manifest(results_dir)
+    sync_files = []
+
+    if state and state.get("status") != "completed":
+        logging.info(f"Resuming batch job {state['job_id']} ({len(state['requests'])} interviews)")
+    else:
+        state = None
+        requests = []
+        request_map = {}
+        hashes = {}
+
+        for filename in files:
+            participant_id = os.path.splitext(filename)[0]
+            try:
+                interview_text = load_interview_text(data_dir, filename)
+            except Exception as e:
+                logging.error(f"Error reading {participant_id}: {str(e)}")
+                continue
+
+            digest = content_hash(interview_text, context_data, protocol_data)
+            if not args.force and not manifest.is_stale(participant_id, digest):
+                logging.info(f"Skipping {participant_id} (up to date)")
+                continue
+
+            if not phase1_single_request(interview_text, context_data, protocol_data):
+                logging.info(f"{participant_id} needs chunking or exceeds the Phase 1 token budget: "
+                             f"analyzing it synchronously instead of in the batch job")
+                sync_files.append(filename)
+                continue
+            hashes[participant_id] = {"hash": digest, "filename": filename}
+
+            # Provider custom_ids only allow [a-zA-Z0-9_-]; keep the real id in the job state
+            custom_id = f"interview-{len(requests):04d}"
+            request_map[custom_id] = participant_id
+            requests.append(build_batch_request(
+                custom_id,
+                prompt=build_individual_prompt(interview_text, participant_id, context_data, protocol_data),
+                system_message=INDIVIDUAL_SYSTEM_MESSAGE,
+                static_prefix=PROMPT_PARTE_1,
+                temperature=0.2,
+                max_tokens=16000,
+                json_mode=True
+            ))
+
+        if not requests and not sync_files:
+            logging.info("Nothing to submit: all interviews up to date.")
+            return
+
+        if requests:
+            job_id = submit_batch(client, USE_CLAUDE, requests)
+            state = {
+                "job_id": job_id,
+                "provider": "anthropic" if USE_CLAUDE else "openai",
+                "model": MODEL,
+                "status": "submitted",
+                "requests": request_map,
+                "hashes": hashes,
+                "written": []
+            }
+            save_job_state(state_path, state)
+            logging.info(f"Submitted batch job {job_id} with {len(requests)} interviews")
+
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+
+    def run_sync_interview(filename):
+        # Staleness was already checked: force the analysis
+        return process_interview(filename, data_dir, results_dir, context_data, protocol_data, manifest, True)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(run_sync_interview, filename): filename for filename in sync_files}
+
+        if state is not None:
+            for filename in collect_batch_results(state, state_path, results_dir, manifest, args):
+                futures[pool.submit(run_sync_interview, filename)] = filename
+
+        for future in as_completed(futures):
+            try:
+                counts[future.result()] += 1
+            except Exception as e:
+                counts["error"] += 1
+                logging.error(f"Error processing {futures[future]}: {str(e)}")
+
+    if futures:
+        logging.info(f"Synchronous fallback: {counts['ok']} processed, {counts['error']} failed")
+
+
+def collect_batch_results(state, state_path, results_dir, manifest, args):
+    """
+    Wait for the batch job and write each result (file + manifest entry) as it
+    is downloaded. Yields the filenames whose result was truncated by
+    max_tokens, to be re-analyzed through the synchronous path.
+    """
+    def on_status(status):
+        logging.info(f"Batch {state['job_id']}: {status['status']} {status['counts']}")
+
+    wait_for_batch(client, USE_CLAUDE, state["job_id"],
+                   poll_interval=args.poll_interval,
+                   max_poll_interval=args.max_poll_interval,
+                   on_status=on_status)
+
+    for custom_id, payload, error in iter_batch_results(client, USE_CLAUDE, state["job_id"]):
+        participant_id = state["requests"].get(custom_id, custom_id)
+        if participant_id in state["written"]:
+            continue
+
+        source = state.get("hashes", {}).get(participant_id, {})
+        if error:
+            logging.error(f"Batch request failed for {participant_id}: {error}")
+            if source:
+                manifest.record(participant_id, source["filename"], source["hash"], "error", error=str(error))
+            continue
+
+        if batch_result_truncated(payload) and source:
+            logging.warning(f"Batch result for {participant_id} hit max_tokens: re-analyzing it synchronously")
+            yield source["filename"]
+            continue
+
+        analysis_result = parse_individual_response(batch_result_text(payload, json_mode=True), participant_id)
+        if "error" in analysis_result:
+            logging.error(f"Unparseable batch result for {participant_id}: {analysis_result['error']}")
+            if source:
+                manifest.record(participant_id, source["filename"], source["hash"], "error",
+                                error=str(analysis_result["error"]))
+            continue
+
+        save_result(os.path.join(results_dir, f"{participant_id}.json"), analysis_result)
+        if source:
+            manifest.record(participant_id, source["filename"], source["hash"], "ok")
+
+        state["written"].append(participant_id)
+        save_job_state(state_path, state)
+        logging.info(f"Successfully processed {participant_id} (batch)")
+
+    state["status"] = "completed"
+    save_job_state(state_path, state)
+
+
+def main():
+    args = parse_args()
+
+    # Load env vars
+    load_dotenv(os.path.join(project_root, ".env"))
+
+    data_dir = args.data_dir
+    results_dir = args.results_dir
+    os.makedirs(results_dir, exist_ok=True)
+
+    # 1. Load Protocol
+    protocol_data = load_protocol(data_dir)
+
+    # 1.5 Load Context
+    context_data = load_context()
+
+    # 2. List files to process
+    files = list_interviews(data_dir)
     logging.info(f"Found {len(files)} interviews to process.")
 
     # 3. Process each interview
-    for filename in tqdm(files, desc="Processing Interviews"):
-        file_path = os.path.join(data_dir, filename)
-        participant_id = os.path.splitext(filename)[0]
-        
-        # Check if already processed
-        result_path = os.path.join(results_dir, f"{participant_id}.json")
-        if os.path.exists(result_path):
-            logging.info(f"Skipping {participant_id} (already processed)")
-            continue
-            
-        logging.info(f"Processing {participant_id}...")
-        
-        try:
-            # Parse document
-            # process_document returns {raw_text, structure, analysis_ready_text, ...}
-            file_type = "docx" if filename.endswith(".docx") else "doc"
-            doc_data = process_document(file_path, file_type)
-            
-            # Use analysis_ready_text which filters participant text if structure found
-            interview_text = doc_data["analysis_ready_text"]
-            
-            # Run analysis
-            # analyze_individual_interview(text, participant_id, context, protocol)
-            analysis_result = analyze_individual_interview(
-                text=interview_text,
-                participant_id=participant_id,
-                context=context_data,
-                protocol=protocol_data
-            )
-            
-            # Save result
-            with open(result_path, 'w', encoding='utf-8') as f:
-                json.dump(analysis_result, f, ensure_ascii=False, indent=2)
-                
-            logging.info(f"Successfully processed {participant_id}")
-            
-        except Exception as e:
-            logging.error(f"Error processing {participant_id}: {str(e)}")
-            # Continue to next file even if one fails
+    if args.mode == "batch":
+        run_batch(files, data_dir, results_dir, context_data, protocol_data, args)
+    else:
+        run_sync(files, data_dir, results_dir, context_data, protocol_data,
+                 workers=args.workers, force=args.force)
 
     logging.info("Batch processing complete.")
+    if LLM_CACHE is not None:
+        logging.info(f"LLM cache stats: {LLM_CACHE.stats()}")
 
 if __name__ == "__main__":
     main()
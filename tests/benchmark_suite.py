@@ -0,0 +1,409 @@
+"""
+End-to-end benchmark suite against the fake LLM server.
+
+Starts tests/fake_llm_server.py in-process (replaying recorded analyses with a
+configurable latency distribution and random 429s) and points the backend at
+it through ANTHROPIC_BASE_URL / OPENAI_BASE_URL. Each scenario runs in a fresh
+subprocess per concurrency level so peak memory is measured in isolation:
+
+- pipeline: each client runs `run_complete_pipeline` over its own study
+- batch:    `scripts/batch_process_interviews.py` (sync mode) with N workers
+- http:     N clients POSTing interviews to /analyze/enhanced
+
+For every (scenario, clients) cell it reports interviews per minute, p50/p95
+latency (per study, per interview or per request respectively), peak RSS,
+errors and the requests / injected 429s seen by the fake server. Results are
+saved as JSON (with the git commit and configuration) and compared against
+the previous run in the same folder.
+
+Usage:
+    python tests/benchmark_suite.py --clients 1,8,32 --per-client 4
+    python tests/benchmark_suite.py --scenarios http --latency lognormal --latency-median 2 --rate-limit-prob 0.05
+    python tests/benchmark_suite.py --compare .cache/benchmarks/a.json .cache/benchmarks/b.json
+"""
+
+import os
+import sys
+import json
+import glob
+import math
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+sys.path.append(os.path.join(PROJECT_ROOT, "scripts"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("pipeline", "batch", "http")
+INTERVIEWS_GLOB = os.path.join(PROJECT_ROOT, "data", "simulated_interviews", "formatted_interview_P*.txt")
+DEFAULT_RESULTS_DIR = os.path.join(PROJECT_ROOT, ".cache", "benchmarks")
+
+
+# -- helpers -------------------------------------------------------------------
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0-100); None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Peak resident memory of the current process in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def load_interviews(count):
+    """`count` interview texts, cycling over the simulated transcripts."""
+    paths = sorted(glob.glob(INTERVIEWS_GLOB))
+    if not paths:
+        raise SystemExit(f"No interviews found at {INTERVIEWS_GLOB}")
+    texts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_clients(clients, work):
+    """Runs `work(client_index)` in `clients` threads; returns wall-clock seconds."""
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+# -- scenarios (run inside a cell subprocess) -----------------------------------
+
+def cell_pipeline(clients, per_client, workdir):
+    import service
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    texts = load_interviews(clients * per_client)
+
+    def work(index):
+        transcripts = [
+            {"participant_id": f"C{index:02d}P{i:02d}", "text": texts[index * per_client + i]}
+            for i in range(per_client)
+        ]
+        started = time.perf_counter()
+        try:
+            result = service.run_complete_pipeline(transcripts, output_dir=os.path.join(workdir, f"client_{index}"))
+            failed = "error" in result
+        except Exception as e:
+            result, failed = {"error": str(e)}, True
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            if failed:
+                errors.append(result.get("error", "failed"))
+
+    seconds = run_clients(clients, work)
+    return {"interviews": clients * per_client, "seconds": seconds, "latencies": latencies, "errors": errors}
+
+
+def cell_batch(clients, per_client, workdir):
+    from docx import Document
+
+    data_dir = os.path.join(workdir, "interviews")
+    results_dir = os.path.join(workdir, "results")
+    os.makedirs(data_dir, exist_ok=True)
+    for i, text in enumerate(load_interviews(clients * per_client)):
+        document = Document()
+        for line in text.splitlines():
+            document.add_paragraph(line)
+        document.save(os.path.join(data_dir, f"P{i + 1:03d}.docx"))
+
+    sys.argv = ["batch_process_interviews.py", "--workers", str(clients), "--force",
+                "--data-dir", data_dir, "--results-dir", results_dir]
+    import batch_process_interviews as batch
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    process_interview = batch.process_interview
+
+    def timed_process_interview(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = process_interview(*args, **kwargs)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            if outcome == "error":
+                errors.append(f"{args[0]}: analysis failed (see manifest.json)")
+        return outcome
+
+    batch.process_interview = timed_process_interview
+    started = time.perf_counter()
+    batch.main()
+    return {"interviews": clients * per_client, "seconds": time.perf_counter() - started,
+            "latencies": latencies, "errors": errors}
+
+
+def cell_http(clients, per_client, workdir):
+    from werkzeug.serving import make_server
+    import service
+
+    server = make_server("127.0.0.1", 0, service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/analyze/enhanced"
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    texts = load_interviews(clients * per_client)
+
+    def work(index):
+        for i in range(per_client):
+            body = json.dumps({"text": texts[index * per_client + i]}).encode("utf-8")
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=3600) as response:
+                    failed = "error" in json.loads(response.read())
+                error = "error in response" if failed else None
+            except Exception as e:
+                error = str(e)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                if error:
+                    errors.append(error)
+
+    try:
+        seconds = run_clients(clients, work)
+    finally:
+        server.shutdown()
+    return {"interviews": clients * per_client, "seconds": seconds, "latencies": latencies, "errors": errors}
+
+
+CELLS = {"pipeline": cell_pipeline, "batch": cell_batch, "http": cell_http}
+
+
+def run_cell(args):
+    """Entry point of a cell subprocess: runs one scenario and writes its raw result."""
+    measured = CELLS[args.cell](args.cell_clients, args.per_client, args.cell_workdir)
+    measured["peak_rss_mb"] = peak_rss_mb()
+    measured["errors"] = measured["errors"][:20]
+    with open(args.cell_output, "w", encoding="utf-8") as f:
+        json.dump(measured, f)
+
+
+# -- orchestration ---------------------------------------------------------------
+
+def fake_server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def cell_env(args, base_url, workdir, clients):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONUNBUFFERED": "1",
+        "LLM_CACHE_ENABLED": "false",
+        "LLM_RATE_LIMIT_RPM": str(args.rpm),
+        "LLM_RATE_LIMIT_PATH": os.path.join(workdir, "rate_limits.db"),
+        "TOKEN_CALIBRATION_PATH": os.path.join(workdir, "token_calibration.json"),
+        "TOKEN_ESTIMATES_LOG": os.path.join(workdir, "token_estimates.jsonl"),
+        "JOBS_ENABLED": "false",
+        "TRACE_DUMP_DIR": ""
+    })
+    if args.provider == "anthropic":
+        env.update({"USE_CLAUDE": "true", "ANTHROPIC_BASE_URL": base_url, "ANTHROPIC_API_KEY": "fake-key"})
+    else:
+        env.update({"USE_CLAUDE": "false", "OPENAI_BASE_URL": f"{base_url}/v1", "OPENAI_API_KEY": "fake-key"})
+    env.setdefault("LLM_CONCURRENCY_MAX", str(max(16, clients)))
+    return env
+
+
+def measure(args, scenario, clients, base_url):
+    workdir = tempfile.mkdtemp(prefix=f"phenomflow_bench_{scenario}_{clients}_")
+    output = os.path.join(workdir, "cell.json")
+    log_path = os.path.join(workdir, "cell.log")
+    command = [sys.executable, os.path.abspath(__file__), "--cell", scenario,
+               "--cell-clients", str(clients), "--per-client", str(args.per_client),
+               "--cell-workdir", workdir, "--cell-output", output]
+
+    before = fake_server_stats(base_url)
+    try:
+        with open(log_path, "w", encoding="utf-8") as log:
+            completed = subprocess.run(command, cwd=PROJECT_ROOT, env=cell_env(args, base_url, workdir, clients),
+                                       stdout=log, stderr=subprocess.STDOUT, timeout=args.timeout)
+        after = fake_server_stats(base_url)
+        if completed.returncode != 0 or not os.path.exists(output):
+            with open(log_path, encoding="utf-8") as log:
+                tail = log.read()[-2000:]
+            return {"scenario": scenario, "clients": clients, "failed": True,
+                    "error": f"exit code {completed.returncode}", "log_tail": tail}
+        with open(output, encoding="utf-8") as f:
+            measured = json.load(f)
+    except subprocess.TimeoutExpired:
+        return {"scenario": scenario, "clients": clients, "failed": True, "error": f"timeout after {args.timeout}s"}
+    finally:
+        if not args.keep_workdirs:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    seconds = measured["seconds"]
+    return {
+        "scenario": scenario,
+        "clients": clients,
+        "interviews": measured["interviews"],
+        "seconds": round(seconds, 3),
+        "interviews_per_minute": round(measured["interviews"] / seconds * 60, 2) if seconds else None,
+        "latency_p50": percentile(measured["latencies"], 50),
+        "latency_p95": percentile(measured["latencies"], 95),
+        "peak_rss_mb": measured["peak_rss_mb"],
+        "errors": len(measured["errors"]),
+        "error_samples": measured["errors"][:3],
+        "llm_requests": after["requests"] - before["requests"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"]
+    }
+
+
+def print_results(results):
+    header = f"{'scenario':<10} {'clients':>7} {'int/min':>9} {'p50 s':>8} {'p95 s':>8} {'RSS MB':>8} {'errors':>6} {'429s':>5}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("failed"):
+            print(f"{r['scenario']:<10} {r['clients']:>7}   FAILED: {r['error']}")
+            continue
+        print(f"{r['scenario']:<10} {r['clients']:>7} {fmt(r['interviews_per_minute']):>9} "
+              f"{fmt(r['latency_p50']):>8} {fmt(r['latency_p95']):>8} {fmt(r['peak_rss_mb']):>8} "
+              f"{r['errors']:>6} {r['rate_limited']:>5}")
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def compare(baseline_path, current_path):
+    """Prints throughput / latency / memory deltas between two saved runs."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+
+    print(f"\nComparison: {baseline.get('git_commit')} ({baseline['timestamp']}) -> "
+          f"{current.get('git_commit')} ({current['timestamp']})")
+    previous = {(r["scenario"], r["clients"]): r for r in baseline["results"] if not r.get("failed")}
+    metrics = ("interviews_per_minute", "latency_p50", "latency_p95", "peak_rss_mb")
+    print(f"{'scenario':<10} {'clients':>7} " + " ".join(f"{m:>24}" for m in metrics))
+    for r in current["results"]:
+        old = previous.get((r["scenario"], r["clients"]))
+        if old is None or r.get("failed"):
+            continue
+        cells = []
+        for metric in metrics:
+            if r.get(metric) is None or not old.get(metric):
+                cells.append(f"{'-':>24}")
+            else:
+                change = (r[metric] - old[metric]) / old[metric] * 100
+                cells.append(f"{fmt(old[metric]) + ' -> ' + fmt(r[metric]) + f' ({change:+.0f}%)':>24}")
+        print(f"{r['scenario']:<10} {r['clients']:>7} " + " ".join(cells))
+
+
+def save_run(results_dir, run):
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(results_dir, f"{stamp}_{run.get('git_commit') or 'nogit'}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_args():
+    from fake_llm_server import add_latency_args
+
+    parser = argparse.ArgumentParser(description="Benchmark suite against the fake LLM server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--clients", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--per-client", type=int, default=4,
+                        help="Interviews per client (pipeline: study size; http: sequential requests)")
+    parser.add_argument("--provider", choices=["anthropic", "openai"], default="anthropic")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="LLM_RATE_LIMIT_RPM for the backend (0 = no client-side limit)")
+    parser.add_argument("--timeout", type=float, default=1800, help="Timeout of each cell (seconds)")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Only compare two saved runs")
+    parser.add_argument("--keep-workdirs", action="store_true", help="Keep per-cell temp folders and logs")
+    add_latency_args(parser)
+    # Internal: a single cell, run in its own process
+    parser.add_argument("--cell", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--cell-clients", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cell-workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--cell-output", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.cell:
+        return run_cell(args)
+    if args.compare:
+        return compare(*args.compare)
+
+    from fake_llm_server import FakeHandler, make_server, latency_kwargs
+
+    FakeHandler.quiet = True
+    server = make_server(port=0, **latency_kwargs(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Fake LLM server on {base_url} (latency={args.latency}, median={args.latency_median}s, "
+          f"429 prob={args.rate_limit_prob})")
+
+    results = []
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario: {scenario}")
+        for clients in [int(c) for c in args.clients.split(",")]:
+            print(f"→ {scenario} x{clients} ...", flush=True)
+            results.append(measure(args, scenario, clients, base_url))
+    server.shutdown()
+
+    previous = sorted(glob.glob(os.path.join(args.results_dir, "*.json")))
+    run = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if not k.startswith("cell") and k != "compare"},
+        "results": results
+    }
+    path = save_run(args.results_dir, run)
+
+    print()
+    print_results(results)
+    print(f"\nSaved to {path}")
+    if previous:
+        compare(previous[-1], path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Transcript chunking respects max_chars even with huge single turns.
+
+Builds a transcript whose participant answers in one 100k-character turn
+(monologue or failed diarization) between two short interviewer turns, splits
+it with `chunking.split_transcript_into_chunks` and checks that:
+
+- every chunk is at most max_chars long;
+- every sentence of the long turn appears in some chunk, uncut;
+- continuation pieces keep the speaker label.
+
+Exits non-zero on failure.
+
+Usage:
+    python tests/chunking_check.py
+    python tests/chunking_check.py --turn-chars 250000 --max-chars 20000 --overlap-turns 2
+"""
+
+import os
+import sys
+import random
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+
+from chunking import split_transcript_into_chunks  # noqa: E402
+
+WORDS = ["siento", "el", "pecho", "una", "presión", "que", "sube", "hacia", "la", "garganta",
+         "y", "luego", "se", "queda", "ahí", "como", "un", "nudo", "caliente", "respiro"]
+
+
+def long_turn_sentences(turn_chars, rng):
+    sentences = []
+    total = 0
+    index = 0
+    while total < turn_chars:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        sentence = f"[{index}] {words.capitalize()}."
+        sentences.append(sentence)
+        total += len(sentence) + 1
+        index += 1
+    return sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check chunk sizes for transcripts with very long turns")
+    parser.add_argument("--turn-chars", type=int, default=100000)
+    parser.add_argument("--max-chars", type=int, default=40000)
+    parser.add_argument("--overlap-turns", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sentences = long_turn_sentences(args.turn_chars, random.Random(args.seed))
+    transcript = "\n".join([
+        "Entrevistador: ¿Qué notas en el cuerpo en ese momento?",
+        "Participante: " + " ".join(sentences),
+        "Entrevistador: ¿Y después?",
+        "Participante: Se va disolviendo poco a poco.",
+    ])
+
+    chunks = split_transcript_into_chunks(transcript, max_chars=args.max_chars,
+                                          overlap_turns=args.overlap_turns)
+    failures = []
+
+    oversized = [len(c) for c in chunks if len(c) > args.max_chars]
+    if oversized:
+        failures.append(f"{len(oversized)} chunks over max_chars ({max(oversized)} > {args.max_chars})")
+
+    missing = [s for s in sentences if not any(s in c for c in chunks)]
+    if missing:
+        failures.append(f"{len(missing)} sentences cut or lost, e.g. {missing[0][:60]!r}")
+
+    unlabeled = [i for i, c in enumerate(chunks) if not c.startswith(("Entrevistador:", "Participante:"))]
+    if unlabeled:
+        failures.append(f"chunks without a speaker label: {unlabeled}")
+
+    if "Se va disolviendo" not in chunks[-1]:
+        failures.append("last turn missing from the last chunk")
+
+    print(f"{len(transcript)} chars, longest turn {len(' '.join(sentences))} chars → "
+          f"{len(chunks)} chunks (max {max(len(c) for c in chunks)}, limit {args.max_chars})")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if not failures:
+        print("ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+Fake local server compatible with the Anthropic / OpenAI APIs.
+
+Lets us exercise the backend end to end without spending API money:
+- Message Batches / Batch API (`scripts/batch_process_interviews.py --mode batch`)
+- Synchronous `POST /v1/messages` and `POST /v1/chat/completions`, with a
+  configurable latency distribution and random 429 injection
+
+Phase 1 responses are replayed from recorded analyses in
+analysis_results/results.json; synthesis and validation prompts get small
+canned JSON documents with the participants named in the prompt.
+`GET /stats` reports request counts and injected 429s.
+
+Usage:
+    python tests/fake_llm_server.py --port 8765 --batch-delay 5
+    python tests/fake_llm_server.py --latency lognormal --latency-median 2 --rate-limit-prob 0.05
+
+    # Anthropic (Message Batches)
+    ANTHROPIC_API_KEY=fake ANTHROPIC_BASE_URL=http://127.0.0.1:8765 \
+        python scripts/batch_process_interviews.py --mode batch --poll-interval 1
+
+    # OpenAI (Batch API)
+    USE_CLAUDE=false OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 \
+        python scripts/batch_process_interviews.py --mode batch --poll-interval 1
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_RECORDINGS = os.path.join(PROJECT_ROOT, "analysis_results", "results.json")
+
+
+def load_recordings(path):
+    """Recorded Phase 1 analyses used as canned responses."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        recordings = [json.dumps(r["result"], ensure_ascii=False) for r in data if "result" in r]
+    except (OSError, ValueError, KeyError):
+        recordings = []
+    return recordings or [json.dumps({"phenomenon_nucleus": "fake", "phase1_codes": {"codes": []}})]
+
+
+class LatencyModel:
+    """
+    Per-request latency in seconds.
+
+    distribution: "fixed" (always `median`), "uniform" (0.5x-1.5x median) or
+    "lognormal" (median * lognormal(0, sigma)); plus, with probability
+    `tail_prob`, an extra `tail_seconds` straggler delay.
+    """
+
+    def __init__(self, distribution="fixed", median=0.0, sigma=0.5, tail_prob=0.0, tail_seconds=0.0, seed=0):
+        self.distribution = distribution
+        self.median = median
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_seconds = tail_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        with self.lock:
+            if self.distribution == "lognormal":
+                latency = self.median * self.rng.lognormvariate(0, self.sigma)
+            elif self.distribution == "uniform":
+                latency = self.median * self.rng.uniform(0.5, 1.5)
+            else:
+                latency = self.median
+            if self.tail_prob and self.rng.random() < self.tail_prob:
+                latency += self.tail_seconds
+        return latency
+
+
+class FakeState:
+    def __init__(self, recordings, batch_delay, latency=None, rate_limit_prob=0.0, retry_after=1.0, seed=0):
+        self.recordings = recordings
+        self.batch_delay = batch_delay
+        self.latency = latency or LatencyModel()
+        self.rate_limit_prob = rate_limit_prob
+        self.retry_after = retry_after
+        self.rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+        self.files = {}     # OpenAI uploaded files: id -> bytes
+        self.batches = {}   # id -> {"provider", "created", "requests", ...}
+        self.stats = {"requests": 0, "rate_limited": 0, "by_kind": {}}
+
+    def response_text(self, key):
+        """Deterministic choice of recording for a request."""
+        return self.recordings[zlib.crc32(key.encode("utf-8")) % len(self.recordings)]
+
+    def is_done(self, batch):
+        return time.time() - batch["created"] >= self.batch_delay
+
+    def should_rate_limit(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            limited = self.rate_limit_prob > 0 and self.rng.random() < self.rate_limit_prob
+            if limited:
+                self.stats["rate_limited"] += 1
+        return limited
+
+    def canned_response(self, system, prompt):
+        """Response text for a synchronous request, chosen by the kind of prompt."""
+        kind = classify_request(system, prompt)
+        with self.lock:
+            self.stats["by_kind"][kind] = self.stats["by_kind"].get(kind, 0) + 1
+
+        if kind == "validation":
+            return json.dumps({
+                "saturation": {"achieved": True, "percentage": 90},
+                "consistency_tests": {"intercoder": {"passed": True, "score": 0.82},
+                                      "intracoder": {"passed": True, "score": 0.88}},
+                "checklist_score": 40
+            })
+        if kind == "synthesis":
+            participants = prompt_participants(prompt)
+            return json.dumps({
+                "codebook": {"CORPORAL": {"Sensaciones": {"Tensión": [
+                    {"code": "Tensión corporal", "participants": participants, "evidence": ["(fake)"]}
+                ]}}},
+                "experiential_structures": [
+                    {"structure_id": "E1", "structure_name": "Estructura simulada", "participants": participants}
+                ]
+            }, ensure_ascii=False)
+        if kind == "incremental":
+            return json.dumps({"codebook_patch": [], "new_structures": [], "structure_updates": [],
+                               "structure_assignments": [], "reassigned_participants": []})
+        return self.response_text(prompt)
+
+
+def classify_request(system, prompt):
+    system = system.lower()
+    if "validation expert" in system:
+        return "validation"
+    if "incremental patch" in system:
+        return "incremental"
+    if "synthesis" in system:
+        return "synthesis"
+    return "phase1"
+
+
+def prompt_participants(prompt):
+    """Participant ids named in a synthesis (PARTICIPANTE Pxx:) or reduce (PARTICIPANTES: ...) prompt."""
+    found = re.findall(r"PARTICIPANTE (\S+):", prompt)
+    for line in re.findall(r"PARTICIPANTES(?: DE ESTE SHARD)?: (.+)", prompt):
+        found.extend(pid.strip() for pid in line.split(","))
+    seen = []
+    for pid in found:
+        if pid and pid not in seen:
+            seen.append(pid)
+    return seen
+
+
+def request_text(payload):
+    """(system, prompt) of an Anthropic or OpenAI request body."""
+    def text_of(content):
+        if isinstance(content, list):
+            return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+        return content or ""
+
+    system = text_of(payload.get("system"))
+    prompt = ""
+    for message in payload.get("messages", []):
+        if message.get("role") == "system":
+            system += text_of(message.get("content"))
+        elif message.get("role") == "user":
+            prompt += text_of(message.get("content"))
+    return system, prompt
+
+
+def anthropic_message(text, model):
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 1000, "output_tokens": len(text) // 4}
+    }
+
+
+def anthropic_rate_limit_error():
+    return {"type": "error", "error": {"type": "rate_limit_error", "message": "Fake rate limit (injected)"}}
+
+
+def openai_rate_limit_error():
+    return {"error": {"type": "rate_limit_exceeded", "code": "rate_limit_exceeded",
+                      "message": "Fake rate limit (injected)", "param": None}}
+
+
+def openai_completion(text, model):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": len(text) // 4,
+                  "total_tokens": 1000 + len(text) // 4}
+    }
+
+
+def iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    state = None  # set in main()
+
+    quiet = False
+
+    def log_message(self, fmt, *args):
+        if self.quiet:
+            return
+        sys.stderr.write(f"[fake-llm] {fmt % args}\n")
+
+    # -- helpers --------------------------------------------------------------
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_jsonl(self, lines):
+        data = ("\n".join(json.dumps(l, ensure_ascii=False) for l in lines) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _base_url(self):
+        host = self.headers.get("Host") or f"127.0.0.1:{self.server.server_address[1]}"
+        return f"http://{host}"
+
+    # -- Anthropic Message Batches ---------------------------------------------
+
+    def _anthropic_batch(self, batch):
+        done = self.state.is_done(batch)
+        n = len(batch["requests"])
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if done else "in_progress",
+            "request_counts": {"processing": 0 if done else n, "succeeded": n if done else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": iso(batch["created"]),
+            "expires_at": iso(batch["created"] + 86400),
+            "ended_at": iso(time.time()) if done else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self._base_url()}/v1/messages/batches/{batch['id']}/results" if done else None
+        }
+
+    # -- OpenAI Batch API ------------------------------------------------------
+
+    def _openai_batch(self, batch):
+        done = self.state.is_done(batch)
+        n = len(batch["requests"])
+        return {
+            "id": batch["id"],
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "status": "completed" if done else "in_progress",
+            "output_file_id": batch["output_file_id"] if done else None,
+            "error_file_id": None,
+            "created_at": int(batch["created"]),
+            "request_counts": {"total": n, "completed": n if done else 0, "failed": 0}
+        }
+
+    # -- Synchronous messages / chat completions -------------------------------
+
+    def _sync_completion(self, body, openai):
+        payload = json.loads(body)
+        if payload.get("stream"):
+            return self._send_json({"error": {"type": "invalid_request_error",
+                                              "message": "Streaming is not supported by the fake server"}},
+                                   status=400)
+
+        time.sleep(self.state.latency.sample())
+
+        if self.state.should_rate_limit():
+            headers = {"retry-after": str(self.state.retry_after)}
+            error = openai_rate_limit_error() if openai else anthropic_rate_limit_error()
+            return self._send_json(error, status=429, headers=headers)
+
+        system, prompt = request_text(payload)
+        text = self.state.canned_response(system, prompt)
+        model = payload.get("model", "fake")
+        response = openai_completion(text, model) if openai else anthropic_message(text, model)
+        return self._send_json(response, headers={"request-id": f"req_{uuid.uuid4().hex[:16]}"})
+
+    # -- routing -----------------------------------------------------------------
+
+    def do_POST(self):
+        body = self._body()
+
+        if self.path.rstrip("/") == "/v1/messages":
+            return self._sync_completion(body, openai=False)
+
+        if self.path.rstrip("/") == "/v1/chat/completions":
+            return self._sync_completion(body, openai=True)
+
+        if self.path.rstrip("/") == "/v1/messages/batches":
+            payload = json.loads(body)
+            batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+            batch = {"id": batch_id, "provider": "anthropic", "created": time.time(),
+                     "requests": payload.get("requests", [])}
+            with self.state.lock:
+                self.state.batches[batch_id] = batch
+            return self._send_json(self._anthropic_batch(batch))
+
+        if self.path.rstrip("/") == "/v1/files":
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+            )
+            content = b""
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    content = part.get_payload(decode=True)
+            file_id = f"file-{uuid.uuid4().hex[:24]}"
+            with self.state.lock:
+                self.state.files[file_id] = content
+            return self._send_json({"id": file_id, "object": "file", "bytes": len(content),
+                                    "created_at": int(time.time()), "filename": "batch.jsonl",
+                                    "purpose": "batch", "status": "processed"})
+
+        if self.path.rstrip("/") == "/v1/batches":
+            payload = json.loads(body)
+            with self.state.lock:
+                content = self.state.files.get(payload["input_file_id"], b"")
+            requests = [json.loads(l) for l in content.decode("utf-8").splitlines() if l.strip()]
+
+            output_lines = []
+            for r in requests:
+                text = self.state.response_text(r["custom_id"])
+                output_lines.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+                    "custom_id": r["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                 "body": openai_completion(text, r["body"].get("model", "gpt-4o"))},
+                    "error": None
+                }, ensure_ascii=False))
+            output_file_id = f"file-{uuid.uuid4().hex[:24]}"
+
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            batch = {"id": batch_id, "provider": "openai", "created": time.time(), "requests": requests,
+                     "input_file_id": payload["input_file_id"], "output_file_id": output_file_id}
+            with self.state.lock:
+                self.state.files[output_file_id] = ("\n".join(output_lines) + "\n").encode("utf-8")
+                self.state.batches[batch_id] = batch
+            return self._send_json(self._openai_batch(batch))
+
+        self._send_json({"error": {"type": "not_found", "message": self.path}}, status=404)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.state.lock:
+                return self._send_json(json.loads(json.dumps(self.state.stats)))
+
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)(/results)?", self.path)
+        if match:
+            batch = self.state.batches.get(match.group(1))
+            if batch is None:
+                return self._send_json({"error": {"type": "not_found_error"}}, status=404)
+            if not match.group(2):
+                return self._send_json(self._anthropic_batch(batch))
+
+            lines = []
+            for r in batch["requests"]:
+                text = self.state.response_text(r["custom_id"])
+                lines.append({"custom_id": r["custom_id"],
+                              "result": {"type": "succeeded",
+                                         "message": anthropic_message(text, r["params"].get("model", "fake"))}})
+            return self._send_jsonl(lines)
+
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match:
+            batch = self.state.batches.get(match.group(1))
+            if batch is None:
+                return self._send_json({"error": {"message": "not found"}}, status=404)
+            return self._send_json(self._openai_batch(batch))
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match:
+            content = self.state.files.get(match.group(1))
+            if content is None:
+                return self._send_json({"error": {"message": "not found"}}, status=404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        self._send_json({"error": {"type": "not_found", "message": self.path}}, status=404)
+
+
+def make_server(port=8765, batch_delay=5.0, recordings_path=DEFAULT_RECORDINGS, handler=FakeHandler,
+                latency=None, rate_limit_prob=0.0, retry_after=1.0, seed=0):
+    handler.state = FakeState(load_recordings(recordings_path), batch_delay, latency=latency,
+                              rate_limit_prob=rate_limit_prob, retry_after=retry_after, seed=seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_latency_args(parser):
+    """Latency / 429 options shared with tests/benchmark_suite.py."""
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed",
+                        help="Latency distribution of synchronous requests")
+    parser.add_argument("--latency-median", type=float, default=0.0, help="Median latency (seconds)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal sigma")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="Fraction of straggler requests")
+    parser.add_argument("--tail-seconds", type=float, default=0.0, help="Extra latency of stragglers")
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0,
+                        help="Probability of answering a synchronous request with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after header of injected 429s")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def latency_kwargs(args):
+    return {
+        "latency": LatencyModel(args.latency, args.latency_median, args.latency_sigma,
+                                args.tail_prob, args.tail_seconds, seed=args.seed),
+        "rate_limit_prob": args.rate_limit_prob,
+        "retry_after": args.retry_after,
+        "seed": args.seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic/OpenAI server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=5.0,
+                        help="Seconds before a submitted batch is reported as finished")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    add_latency_args(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.batch_delay, args.recordings, **latency_kwargs(args))
+    print(f"Fake LLM server listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
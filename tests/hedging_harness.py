@@ -0,0 +1,133 @@
+"""
+Mock-provider harness for the hedged LLM router.
+
+Simulates two providers with heavy-tailed latency (lognormal body plus a
+small fraction of multi-minute stragglers, scaled down by --time-scale) and
+replays the same request stream with and without hedging, reporting
+p50/p95/p99 and the extra load caused by hedged duplicates.
+
+Usage:
+    python tests/hedging_harness.py --requests 400 --concurrency 16
+    python tests/hedging_harness.py --tail-prob 0.05 --tail-seconds 240 --time-scale 0.002
+"""
+
+import os
+import sys
+import random
+import asyncio
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+
+from llm_router import HedgedRouter  # noqa: E402
+
+
+class MockProvider:
+    """Async provider whose latency follows a lognormal body plus a heavy tail."""
+
+    def __init__(self, name, median, sigma, tail_prob, tail_seconds, time_scale, rng):
+        self.name = name
+        self.median = median
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_seconds = tail_seconds
+        self.time_scale = time_scale
+        self.rng = rng
+        self.started = 0
+        self.cancelled = 0
+
+    def sample(self):
+        latency = self.median * self.rng.lognormvariate(0, self.sigma)
+        if self.rng.random() < self.tail_prob:
+            latency += self.tail_seconds * self.rng.uniform(0.5, 1.5)
+        return latency
+
+    async def call(self):
+        self.started += 1
+        latency = self.sample()
+        try:
+            await asyncio.sleep(latency * self.time_scale)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return latency
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def run_scenario(args, hedging):
+    rng = random.Random(args.seed)
+    providers = {
+        "primary": MockProvider("primary", args.primary_median, args.sigma, args.tail_prob,
+                                args.tail_seconds, args.time_scale, rng),
+        "secondary": MockProvider("secondary", args.secondary_median, args.sigma, args.tail_prob,
+                                  args.tail_seconds, args.time_scale, rng)
+    }
+    router = HedgedRouter(
+        providers=["primary", "secondary"] if hedging else ["primary"],
+        hedge_quantile=args.hedge_quantile,
+        min_samples=args.min_samples
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    async def one_request():
+        async with semaphore:
+            started = loop.time()
+            await router.run(lambda name: providers[name].call(), key="phase1")
+            # Back to "simulated seconds" so numbers read like real API latencies
+            latencies.append((loop.time() - started) / args.time_scale)
+
+    await asyncio.gather(*(one_request() for _ in range(args.requests)))
+
+    calls = sum(p.started for p in providers.values())
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies),
+        "extra_calls_pct": 100.0 * (calls - args.requests) / args.requests,
+        "stats": router.snapshot()["stats"]
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure hedged-request tail latency against mock providers")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--primary-median", type=float, default=40.0, help="Simulated seconds")
+    parser.add_argument("--secondary-median", type=float, default=50.0, help="Simulated seconds")
+    parser.add_argument("--sigma", type=float, default=0.35)
+    parser.add_argument("--tail-prob", type=float, default=0.03, help="Fraction of straggler calls")
+    parser.add_argument("--tail-seconds", type=float, default=240.0, help="Extra latency of stragglers")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95)
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--time-scale", type=float, default=0.001,
+                        help="Wall-clock seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print(f"{'scenario':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'extra calls':>12}")
+    for hedging in (False, True):
+        result = asyncio.run(run_scenario(args, hedging))
+        name = "hedged" if hedging else "baseline"
+        print(f"{name:<12} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} "
+              f"{result['max']:>8.1f} {result['extra_calls_pct']:>11.1f}%")
+        if hedging:
+            print(f"router stats: {result['stats']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+The incremental synthesis prompt is never sent trimmed.
+
+Builds a previous synthesis with many codes and long structure descriptions,
+replaces `service.call_llm` with a recorder and lowers the synthesis token
+budget so that:
+
+1. the full compact synthesis does not fit but the minimal one does: the
+   prompt sent must contain every previous code, no structure prose and no
+   trim marker;
+2. not even the minimal synthesis fits: TokenBudgetExceeded is raised and
+   nothing is sent.
+
+Exits non-zero on failure. Needs the backend dependencies (Flask, the LLM SDK)
+importable, but makes no network calls.
+
+Usage:
+    python tests/incremental_synthesis_budget_check.py
+    python tests/incremental_synthesis_budget_check.py --codes 400
+"""
+
+import os
+import sys
+import json
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+
+import service  # noqa: E402
+from synthesis_delta import compact_synthesis  # noqa: E402
+
+TRIM_MARKER = "CONTENIDO RECORTADO"
+
+
+def previous_synthesis(codes):
+    return {
+        "participants": [f"P{i:02d}" for i in range(1, 11)],
+        "codebook": {
+            "CORPORALIDAD": {
+                "Sensaciones": [
+                    {"code": f"CODE-{i:04d}", "participants": [f"P{i % 10 + 1:02d}"],
+                     "evidence": ["cita " * 40]}
+                    for i in range(codes)
+                ]
+            }
+        },
+        "experiential_structures": [
+            {"structure_id": f"E{i}", "structure_name": f"Estructura {i}",
+             "description": "prosa descriptiva de la estructura " * 200,
+             "participants": [f"P{i:02d}"]}
+            for i in range(1, 6)
+        ]
+    }
+
+
+def new_analysis():
+    return {"participant_id": "P11", "phenomenon_nucleus": "núcleo", "markdown_table": "| a | b |"}
+
+
+def prompt_tokens(previous, minimal, analyses):
+    previous_json = json.dumps(compact_synthesis(previous, minimal=minimal),
+                               ensure_ascii=False, indent=None if minimal else 1)
+    summary = "\n\n".join(service._synthesis_participant_summary(a) for a in analyses)
+    prompt = service._incremental_prompt(previous_json, len(previous["participants"]), summary, len(analyses))
+    return service.estimate_prompt_tokens(prompt, service.INCREMENTAL_SYSTEM_MESSAGE, service.PROMPT_PARTE_2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that incremental synthesis prompts are never trimmed")
+    parser.add_argument("--codes", type=int, default=200)
+    args = parser.parse_args()
+
+    if service.TOKEN_ESTIMATOR is None:
+        print("token_budget not available: nothing to check")
+        sys.exit(1)
+
+    previous = previous_synthesis(args.codes)
+    analyses = [new_analysis()]
+    full = prompt_tokens(previous, False, analyses)
+    minimal = prompt_tokens(previous, True, analyses)
+    assert minimal < full, (minimal, full)
+
+    sent = []
+
+    def record(prompt, **kwargs):
+        sent.append(prompt)
+        return json.dumps({"codebook_patch": [], "structure_assignments": [
+            {"participant_id": "P11", "structure_id": "E1"}]})
+
+    service.call_llm = record
+    failures = []
+
+    # 1. Only the minimal version fits
+    service.TOKEN_BUDGETS["synthesis"] = (full + minimal) // 2
+    result = service.perform_incremental_synthesis(previous, analyses)
+    prompt = sent[-1] if sent else ""
+    missing = [f"CODE-{i:04d}" for i in range(args.codes) if f"CODE-{i:04d}" not in prompt]
+    if not sent:
+        failures.append("minimal fit: nothing was sent")
+    if missing:
+        failures.append(f"minimal fit: {len(missing)} previous codes missing from the prompt")
+    if TRIM_MARKER in prompt:
+        failures.append("minimal fit: prompt was trimmed")
+    if "prosa descriptiva" in prompt:
+        failures.append("minimal fit: structure prose still in the prompt")
+    if "error" in result:
+        failures.append(f"minimal fit: {result['error']}")
+    print(f"{'FAIL' if failures else 'ok  '} fits after dropping structure prose "
+          f"(~{full} → ~{minimal} tokens, budget {service.TOKEN_BUDGETS['synthesis']})")
+
+    # 2. Not even the minimal version fits
+    before, failed_before = len(sent), len(failures)
+    service.TOKEN_BUDGETS["synthesis"] = minimal // 2
+    try:
+        service.perform_incremental_synthesis(previous, analyses)
+        failures.append("over budget: no TokenBudgetExceeded")
+    except service.TokenBudgetExceeded:
+        pass
+    if len(sent) != before:
+        failures.append("over budget: a prompt was sent")
+    print(f"{'FAIL' if len(failures) > failed_before else 'ok  '} rejected when even the minimal synthesis does not fit")
+
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Importing the servers must not start job workers.
+
+Submits one job of each kind registered by `service.py` and `main.py` into a
+fresh SQLite queue, imports each module in a subprocess pointed at that file
+(JOBS_DB_PATH), waits longer than a worker poll and checks that every job is
+still queued with no attempts. Exits non-zero if any job was claimed.
+
+Usage:
+    python tests/job_queue_import_check.py
+    python tests/job_queue_import_check.py --modules service --wait 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(PROJECT_ROOT, "backend")
+sys.path.append(BACKEND_DIR)
+
+from job_queue import JobQueue  # noqa: E402
+
+KINDS = {
+    "service": ["analyze", "analyze_enhanced", "demo_generate"],
+    "main": ["fastapi.analyze", "fastapi.demo_generate"],
+}
+
+
+def check_import(module, wait):
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    queue = JobQueue(path)
+    for kind in KINDS[module]:
+        queue.register(kind, lambda payload, job: None)  # Only to allow submit(); this queue is never started
+    job_ids = [queue.submit(kind, {"text": "U1: hola"}) for kind in KINDS[module]]
+
+    script = f"import time, {module}; time.sleep({wait})"
+    env = dict(os.environ, JOBS_DB_PATH=path)
+    process = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        print(process.stderr[-2000:], file=sys.stderr)
+        return [f"import {module} failed (exit {process.returncode})"]
+
+    failures = []
+    for job_id in job_ids:
+        job = queue.get(job_id)
+        if job["status"] != "queued" or job["attempts"]:
+            failures.append(f"{module}: job {job['kind']} -> {job['status']} (attempts={job['attempts']})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that importing the servers leaves queued jobs untouched")
+    parser.add_argument("--modules", default="service,main")
+    parser.add_argument("--wait", type=float, default=3, help="Seconds the importing process stays alive")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules.split(","):
+        started = time.perf_counter()
+        found = check_import(module, args.wait)
+        failures.extend(found)
+        print(f"{'FAIL' if found else 'ok  '} import {module} ({time.perf_counter() - started:.1f}s)")
+
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
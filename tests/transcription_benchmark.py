@@ -0,0 +1,79 @@
+"""
+Transcription throughput benchmark: serial path vs. forked process pool.
+
+Transcribes the same set of local audio files once per worker count (1 =
+the serial `transcribe_multiple` path) and reports files per hour, audio
+hours per wall-clock hour and the speed-up over the serial run. Inputs can
+be repeated with --repeat to build a batch from a few sample recordings.
+With --segmented each file is split at silences and its segments are
+decoded in parallel instead (long-recording latency vs. core count).
+
+Usage:
+    python tests/transcription_benchmark.py data/audio/*.wav --workers 1,4,8 --model-size base
+    python tests/transcription_benchmark.py sample.mp3 --repeat 16 --workers 1,16
+    python tests/transcription_benchmark.py interview_2h.wav --segmented --workers 1,4,8,16
+"""
+
+import os
+import sys
+import time
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+
+from transcription import transcribe_multiple, load_whisper_model  # noqa: E402
+
+
+def run(files, language, model_size, workers, segmented=False, segment_seconds=120, backend=None):
+    started = time.perf_counter()
+    if segmented:
+        results = transcribe_multiple(files, language, model_size, workers=workers,
+                                      segmented="always", segment_seconds=segment_seconds, backend=backend)
+    else:
+        results = transcribe_multiple(files, language, model_size, workers=workers, backend=backend)
+    seconds = time.perf_counter() - started
+    audio_seconds = sum(r.get("duration", 0) for r in results)
+    return {
+        "workers": workers,
+        "seconds": seconds,
+        "files_per_hour": len(files) / seconds * 3600,
+        "audio_hours_per_hour": audio_seconds / seconds,
+        "errors": sum(1 for r in results if "error" in r)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper transcription throughput benchmark")
+    parser.add_argument("files", nargs="+", help="Audio files to transcribe")
+    parser.add_argument("--workers", default=f"1,{max(2, (os.cpu_count() or 2) // 4)}",
+                        help="Comma-separated worker counts (1 = serial path)")
+    parser.add_argument("--model-size", default="base")
+    parser.add_argument("--language", default="es")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the input list N times")
+    parser.add_argument("--segmented", action="store_true",
+                        help="Split each file at silences and decode its segments in parallel")
+    parser.add_argument("--segment-seconds", type=float, default=120)
+    parser.add_argument("--backend", help="Inference backend (openai, ctranslate2; default: openai if installed)")
+    args = parser.parse_args()
+
+    files = args.files * args.repeat
+    # Load outside the timed runs so every configuration starts with a warm model
+    # (with thread-based backends, as many model replicas as the largest worker count)
+    load_whisper_model(args.model_size, args.backend, max(int(w) for w in args.workers.split(",")))
+
+    rows = [run(files, args.language, args.model_size, int(w), args.segmented, args.segment_seconds, args.backend)
+            for w in args.workers.split(",")]
+    baseline = next((r for r in rows if r["workers"] == 1), rows[0])
+
+    mode = "segmented" if args.segmented else "per-file"
+    print(f"\n{len(files)} files, model={args.model_size}, backend={args.backend or 'default'}, "
+          f"mode={mode}, cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'seconds':>9} {'files/h':>9} {'audio h/h':>10} {'speed-up':>9} {'errors':>6}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['seconds']:>9.1f} {r['files_per_hour']:>9.1f} "
+              f"{r['audio_hours_per_hour']:>10.2f} {baseline['seconds'] / r['seconds']:>8.2f}x {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
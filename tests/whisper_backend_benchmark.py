@@ -0,0 +1,123 @@
+"""
+Whisper inference backend benchmark: real-time factor and WER per model size.
+
+Transcribes one fixed local sample with every (backend, model_size)
+combination and compares the hypothesis with a reference transcript:
+
+- RTF = transcription wall-clock seconds / audio seconds (lower is faster;
+  model loading is timed separately and excluded).
+- WER = word-level edit distance / reference words, after lower-casing and
+  stripping punctuation and accents.
+
+The sample is decoded once; each configuration is warmed up on the first
+seconds of audio before the timed run. Results can be written as JSON with
+--output to compare machines or library versions.
+
+Usage:
+    python tests/whisper_backend_benchmark.py sample.wav --reference sample.txt
+    python tests/whisper_backend_benchmark.py sample.wav --reference sample.txt \
+        --backends openai,ctranslate2 --model-sizes tiny,base,small --compute-type int8
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import unicodedata
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend"))
+
+from whisper_backends import SAMPLE_RATE, available_backends, configure_backends, get_backend, load_audio  # noqa: E402
+
+
+def normalize_words(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def run(backend_name, model_size, audio, reference, language, warmup_seconds):
+    engine = get_backend(backend_name)
+    started = time.perf_counter()
+    model = engine.load(model_size)
+    load_seconds = time.perf_counter() - started
+
+    if warmup_seconds > 0:
+        engine.transcribe(model, audio[:int(warmup_seconds * SAMPLE_RATE)], language)
+
+    started = time.perf_counter()
+    result = engine.transcribe(model, audio, language)
+    seconds = time.perf_counter() - started
+    audio_seconds = len(audio) / SAMPLE_RATE
+    return {
+        "backend": engine.name,
+        "options": engine.cache_options(),
+        "model_size": model_size,
+        "load_seconds": round(load_seconds, 2),
+        "seconds": round(seconds, 2),
+        "rtf": round(seconds / audio_seconds, 4),
+        "wer": round(word_error_rate(reference, result["text"]), 4) if reference is not None else None,
+        "chars": len(result["text"])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper backend RTF/WER benchmark")
+    parser.add_argument("audio", help="Fixed local audio sample")
+    parser.add_argument("--reference", help="Reference transcript (text file) for WER")
+    parser.add_argument("--backends", default=",".join(available_backends()),
+                        help=f"Comma-separated backends (installed: {', '.join(available_backends())})")
+    parser.add_argument("--model-sizes", default="tiny,base,small")
+    parser.add_argument("--compute-type", default="int8", help="CTranslate2 quantization (int8, int8_float32, float32)")
+    parser.add_argument("--language", default="es")
+    parser.add_argument("--warmup-seconds", type=float, default=5)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    configure_backends(compute_type=args.compute_type)
+    audio = load_audio(args.audio)
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = f.read()
+
+    rows = []
+    for model_size in args.model_sizes.split(","):
+        for backend_name in args.backends.split(","):
+            print(f"… {backend_name} / {model_size}", file=sys.stderr)
+            rows.append(run(backend_name, model_size, audio, reference, args.language, args.warmup_seconds))
+
+    print(f"\n{os.path.basename(args.audio)}: {len(audio) / SAMPLE_RATE:.1f}s audio, cpus={os.cpu_count()}")
+    print(f"{'model':>8} {'backend':>12} {'load s':>7} {'seconds':>8} {'RTF':>7} {'WER':>7} {'vs first':>9}")
+    for model_size in args.model_sizes.split(","):
+        group = [r for r in rows if r["model_size"] == model_size]
+        for r in group:
+            wer = f"{r['wer']:.3f}" if r["wer"] is not None else "-"
+            print(f"{model_size:>8} {r['backend']:>12} {r['load_seconds']:>7.1f} {r['seconds']:>8.1f} "
+                  f"{r['rtf']:>7.3f} {wer:>7} {group[0]['seconds'] / r['seconds']:>8.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"audio": args.audio, "audio_seconds": len(audio) / SAMPLE_RATE,
+                       "cpus": os.cpu_count(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()